@@ -0,0 +1,87 @@
+"""قياس إنتاجية كتابة السجلات: اتصال لكل عملية مقابل الكاتب الخلفي (WAL + group commit)
+
+الاستخدام:
+    python benchmarks/bench_db_writes.py --rows 5000 --threads 8
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix='bench_db_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+
+INSERT_SQL = '''INSERT INTO api_usage
+    (api_key, user_id, endpoint, status_code, response_time, tokens_used, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+
+def row(i):
+    return ('sk-bench***', i, 'chat/completions', 200, 1.5, 100, datetime.now().isoformat())
+
+
+def legacy_write(db_path, i):
+    # السلوك القديم: اتصال جديد ومعاملة لكل صف
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(INSERT_SQL, row(i))
+
+
+def run_threads(threads, rows, target):
+    per_thread = rows // threads
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            target(offset + i)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def report(name, rows, elapsed, latencies):
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{name:<14} {rows / elapsed:>10.0f} rows/s   caller p99 {p99:>8.3f} ms   total {elapsed:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    legacy_db = 'legacy.db'
+    app.DatabaseManager(legacy_db).close()
+    with sqlite3.connect(legacy_db) as conn:
+        conn.execute('PRAGMA journal_mode=DELETE')
+    elapsed, latencies = run_threads(args.threads, args.rows, lambda i: legacy_write(legacy_db, i))
+    report('per-row', args.rows, elapsed, latencies)
+
+    manager = app.DatabaseManager('write_behind.db')
+    start = time.perf_counter()
+    _, latencies = run_threads(args.threads, args.rows, lambda i: manager.log_api_usage(*row(i)[:-1]))
+    manager.writer.flush()
+    elapsed = time.perf_counter() - start
+    report('write-behind', args.rows, elapsed, latencies)
+    print(f"writer stats: {manager.writer.stats}")
+    manager.close()
+
+
+if __name__ == '__main__':
+    main()
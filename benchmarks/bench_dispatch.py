@@ -0,0 +1,124 @@
+"""كلفة توجيه التحديث: مرشحات func= المتتالية مقابل جداول ConversationRouter
+
+البوتان بلا شبكة (threaded=False) ومعالجاتهما فارغة، فيُقاس التوجيه وحده:
+- المرشحات القديمة: أوامر ثم مقارنات نص القائمة ثم is_awaiting_description ثم بادئات الأزرار
+- الجداول: مرشح واحد لكل نوع تحديث ثم بحث واحد في القاموس (وقراءة واحدة للحالة)
+يُطبع الزمن لكل تحديث وعدد قراءات حالة المستخدم (كل قراءة تأخذ القفل).
+
+الاستخدام:
+    python benchmarks/bench_dispatch.py --updates 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_dispatch_'))
+
+import telebot  # noqa: E402
+from telebot.types import Update  # noqa: E402
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_telegram import make_callback_update, make_message_update  # noqa: E402
+
+app.logger.disabled = True
+USERS = 200
+MENU = ["🌐 إنشاء موقع ويب", "🚀 مشاريعي", "📊 إحصائياتي"]
+CALLBACKS = ['quality_basic', 'type_restaurant', 'project_dl_7', 'projects_before_9', 'similar_use']
+
+
+def noop(*args):
+    return None
+
+
+def legacy_bot():
+    """نفس ترتيب المرشحات قبل جداول التوجيه"""
+    bot = telebot.TeleBot('1:bench', threaded=False)
+
+    def is_awaiting_description(message):
+        user_state = app.state_manager.get_user_state(message.from_user.id)
+        return bool(user_state) and user_state['action'] == 'awaiting_description'
+
+    bot.message_handler(commands=['start', 'help'])(noop)
+    for text in MENU:
+        bot.message_handler(func=lambda msg, text=text: msg.text == text)(noop)
+    # المعالج القديم كان يقرأ الحالة مرة ثانية بعد المرشح
+    bot.message_handler(func=is_awaiting_description)(
+        lambda message: app.state_manager.get_user_state(message.from_user.id))
+    for prefix in ('projects_before_', 'project_dl_', 'type_', 'quality_', 'similar_'):
+        bot.callback_query_handler(func=lambda call, prefix=prefix: call.data.startswith(prefix))(noop)
+    return bot
+
+
+def router_bot():
+    bot = telebot.TeleBot('1:bench', threaded=False)
+    router = app.ConversationRouter()
+    router.command('start', 'help')(noop)
+    router.menu_item(*MENU)(noop)
+    router.state('awaiting_description', 'awaiting_quality', 'generating')(noop)
+    router.callback('projects', 'project', 'type', 'quality', 'similar')(noop)
+    bot.message_handler(content_types=['text'])(router.dispatch_message)
+    bot.callback_query_handler(func=lambda call: True)(router.dispatch_callback)
+    return bot
+
+
+def make_updates(count):
+    """مزيج المسار: أوصاف نصية وضغطات أزرار وأزرار القائمة وأوامر"""
+    updates = []
+    for i in range(count):
+        user_id = 1 + i % USERS
+        roll = random.random()
+        if roll < 0.4:
+            raw = make_message_update(user_id, f"موقع مطعم رقم {i} بتصميم عصري وصفحة حجز")
+        elif roll < 0.8:
+            raw = make_callback_update(user_id, random.choice(CALLBACKS))
+        elif roll < 0.95:
+            raw = make_message_update(user_id, random.choice(MENU))
+        else:
+            raw = make_message_update(user_id, '/start')
+        updates.append(Update.de_json({'update_id': i + 1, **raw}))
+    return updates
+
+
+def measure(bot, updates, reads):
+    reads[0] = 0
+    start = time.perf_counter()
+    for update in updates:
+        bot.process_new_updates([update])
+    return (time.perf_counter() - start) / len(updates) * 1e6, reads[0] / len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    app.job_scheduler.shutdown()
+    for user_id in range(1, USERS + 1):
+        app.state_manager.set_user_state(user_id, {'action': 'awaiting_description', 'project_type': 'restaurant'})
+
+    reads = [0]
+    get_user_state = app.state_manager.get_user_state
+
+    def counted_get_user_state(user_id):
+        reads[0] += 1
+        return get_user_state(user_id)
+
+    app.state_manager.get_user_state = counted_get_user_state
+    updates = make_updates(args.updates)
+    bots = {'func filters': legacy_bot(), 'router tables': router_bot()}
+    for bot in bots.values():
+        measure(bot, updates[:1000], reads)  # إحماء
+
+    for name, bot in bots.items():
+        per_update, reads_per_update = measure(bot, updates, reads)
+        print(f"{name:14s} {per_update:6.1f}us per update, {reads_per_update:.2f} state reads per update")
+
+
+if __name__ == '__main__':
+    main()
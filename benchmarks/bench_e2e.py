@@ -0,0 +1,170 @@
+"""اختبار حمل شامل: N مستخدم يمرون بالمسار الكامل ضد خوادم DeepSeek و Telegram محلية
+
+كل مستخدم: "🌐 إنشاء موقع ويب" ← نوع الموقع ← الوصف ← الجودة ← استلام ملف المشروع.
+الخادمان المحليان في عمليتين منفصلتين، والبوت في هذه العملية بوقت التشغيل المختار.
+يُطبع: مهام/دقيقة، p50/p95/p99 لزمن المسار الكامل ولزمن المهمة (من اختيار الجودة
+حتى sendDocument)، ردود 429 من Telegram، والذاكرة القصوى.
+
+الاستخدام:
+    python benchmarks/bench_e2e.py --users 50 --latency 3 --distribution lognormal
+    python benchmarks/bench_e2e.py --users 50 --runtime asyncio --rate-limits
+    python benchmarks/bench_e2e.py --users 30 --distinct 3 --no-cache
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_e2e_'))
+
+import telebot  # noqa: E402
+from telebot import asyncio_helper  # noqa: E402
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import FakeDeepSeekProcess  # noqa: E402
+from fake_telegram import FakeTelegramProcess, make_callback_update, make_message_update  # noqa: E402
+
+PROJECT_TYPES = list(app.UIManager.TYPE_NAMES)  # أنواع لوحة المفاتيح الفعلية فقط
+QUALITIES = ['basic', 'advanced', 'pro', 'premium']
+USER_OFFSET = 1000
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def start_bot(runtime, telegram):
+    # الإرسال عبر TeleBot المتزامن في الوضعين؛ asyncio يستقبل التحديثات فقط
+    telebot.apihelper.API_URL = telegram.api_url
+    if runtime == 'asyncio':
+        asyncio_helper.API_URL = telegram.api_url
+        thread = threading.Thread(target=asyncio.run, args=(app.run_asyncio_runtime(),), daemon=True)
+    else:
+        thread = threading.Thread(
+            target=app.bot.polling,
+            kwargs={'non_stop': True, 'interval': 0, 'timeout': 5, 'long_polling_timeout': 1},
+            daemon=True
+        )
+    thread.start()
+    return thread
+
+
+def run_user(telegram, index, timeout, results, distinct=0):
+    """مسار مستخدم واحد؛ كل خطوة تنتظر رد البوت على الخطوة السابقة"""
+    user_id = USER_OFFSET + index
+    # وصف مختلف لكل مستخدم حتى لا يُخدم من التخزين المؤقت، إلا إذا حُدد عدد الطلبات المختلفة
+    variant = index % distinct if distinct else index
+    project_type = PROJECT_TYPES[variant % len(PROJECT_TYPES)]
+    quality = QUALITIES[variant % len(QUALITIES)] if distinct else random.choice(QUALITIES)
+    description = f"موقع رقم {variant} بتصميم عصري وألوان هادئة وصفحة تواصل ونموذج حجز"
+    steps = [
+        (make_message_update(user_id, "🌐 إنشاء موقع ويب"), 'sendMessage', 1),
+        (make_callback_update(user_id, f"type_{project_type}"), 'editMessageText', 1),
+        (make_message_update(user_id, description), 'sendMessage', 2),
+    ]
+
+    started = time.perf_counter()
+    for update, method, count in steps:
+        telegram.push_updates([update])
+        if not telegram.wait_for(method, count, chat_id=user_id, timeout=timeout):
+            results.append({'ok': False, 'step': method})
+            return
+
+    submitted = time.perf_counter()
+    telegram.push_updates([make_callback_update(user_id, f"quality_{quality}")])
+    ok = telegram.wait_for('sendDocument', 1, chat_id=user_id, timeout=timeout)
+    finished = time.perf_counter()
+    results.append({
+        'ok': ok,
+        'step': 'sendDocument',
+        'flow': finished - started,
+        'job': finished - submitted,
+        'finished': finished
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--ramp', type=float, default=10.0, help='مدة بدء جميع المستخدمين (ثوانٍ)')
+    parser.add_argument('--runtime', choices=['threaded', 'asyncio'], default='threaded')
+    parser.add_argument('--latency', type=float, default=3.0)
+    parser.add_argument('--distribution', default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--no-stream', action='store_true')
+    parser.add_argument('--telegram-delay', type=float, default=0.02)
+    parser.add_argument('--rate-limits', action='store_true', help='تطبيق حدود Telegram (429)')
+    parser.add_argument('--keys', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120, help='أقصى انتظار لكل خطوة (ثوانٍ)')
+    parser.add_argument('--distinct', type=int, default=0, help='عدد الطلبات المختلفة (0: طلب مختلف لكل مستخدم)')
+    parser.add_argument('--no-cache', action='store_true', help='تعطيل تخزين المشاريع المؤقت')
+    args = parser.parse_args()
+
+    deepseek = FakeDeepSeekProcess(args.latency, args.error_rate, args.distribution)
+    telegram = FakeTelegramProcess(args.telegram_delay, rate_limits=args.rate_limits)
+
+    app.Config.DEEPSEEK_API_URL = deepseek.url
+    app.Config.DEEPSEEK_API_KEYS = [f'sk-bench-{i}' for i in range(args.keys)]
+    app.Config.STREAM_RESPONSES = not args.no_stream
+    app.Config.CACHE_ENABLED = not args.no_cache
+    # الأوصاف المولدة متقاربة والمستخدمون المحاكون لا يجيبون على اقتراح المشروع المشابه
+    app.Config.SIMILAR_ENABLED = False
+    # المستخدمون المحاكون لا يصطدمون بحد المستخدم؛ حدود المفاتيح تبقى كما في Config
+    app.state_manager.rate_limits = app.TokenBucketLimiter(1000, 1000 / 3600)
+    app.ai_service = app.AIService()
+
+    try:
+        start_bot(args.runtime, telegram)
+        results = []
+        drivers = []
+        started = time.perf_counter()
+        for index in range(args.users):
+            target_time = started + args.ramp * index / max(1, args.users)
+            time.sleep(max(0.0, target_time - time.perf_counter()))
+            driver = threading.Thread(target=run_user, args=(telegram, index, args.timeout, results, args.distinct), daemon=True)
+            driver.start()
+            drivers.append(driver)
+        for driver in drivers:
+            driver.join()
+
+        completed = [result for result in results if result['ok']]
+        failed = [result for result in results if not result['ok']]
+        elapsed = (max(result['finished'] for result in completed) - started) if completed else float('nan')
+        stats = telegram.stats()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        print(f"runtime={args.runtime} users={args.users} latency={args.distribution}({args.latency}s) "
+              f"stream={not args.no_stream} error_rate={args.error_rate} rate_limits={args.rate_limits}")
+        print(f"completed {len(completed)}/{args.users} in {elapsed:.1f}s "
+              f"-> {len(completed) / elapsed * 60:.1f} jobs/min")
+        for name in ('flow', 'job'):
+            values = [result[name] for result in completed]
+            print(f"{name:5s} p50 {percentile(values, 0.50):6.2f}s  p95 {percentile(values, 0.95):6.2f}s  "
+                  f"p99 {percentile(values, 0.99):6.2f}s")
+        if failed:
+            steps = {}
+            for result in failed:
+                steps[result['step']] = steps.get(result['step'], 0) + 1
+            print(f"failed (stuck waiting for): {steps}")
+        coalesced = sum(app.app_metrics.coalesced_requests.values.values())
+        print(f"upstream calls saved by coalescing: {coalesced}")
+        print(f"telegram calls: {stats['calls']}")
+        print(f"telegram 429s: {stats['rejected']}")
+        print(f"peak RSS: {peak_rss:.1f} MB")
+    finally:
+        deepseek.stop()
+        telegram.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""أثر الطلبات الاحتياطية (hedging) على زمن الذيل
+
+خادم DeepSeek محلي تتأخر فيه نسبة من الطلبات قبل أول بايت (خادم خلفي بطيء)،
+ثم تُشغَّل نفس المهام مرة دون تحوط ومرة معه. يُطبع p50/p95/p99 لزمن المهمة،
+ونسبة الطلبات المكررة ونتائجها.
+
+الاستخدام:
+    python benchmarks/bench_hedging.py --jobs 200 --stall-rate 0.05 --stall 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_hedging_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import FakeDeepSeekProcess  # noqa: E402
+
+app.logger.disabled = True
+DESCRIPTION = 'موقع مطعم بالألوان الأحمر والأسود مع قائمة طعام وحجز طاولات'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def hedge_outcomes():
+    return {key[0]: value for key, value in app.app_metrics.hedged_requests.values.items()}
+
+
+def run(hedge, jobs, concurrency):
+    app.Config.HEDGE_ENABLED = hedge
+    service = app.AIService()
+    before = hedge_outcomes()
+
+    def job(i):
+        start = time.perf_counter()
+        service.generate_project(DESCRIPTION, 'restaurant', user_id=i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(job, range(jobs)))
+    elapsed = time.perf_counter() - start
+    stats = service.hedge_policy.get_stats()
+    # طلبات خاسرة ما زالت تحجز مفاتيحها بعد انتهاء كل المهام
+    in_flight = sum(health['in_flight'] for health in service.key_pool.snapshot().values())
+    service.close()
+
+    after = hedge_outcomes()
+    outcomes = {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)}
+    print(f"hedge={'on ' if hedge else 'off'} jobs={jobs} time={elapsed:.1f}s "
+          f"p50={percentile(latencies, 0.50):.2f}s p95={percentile(latencies, 0.95):.2f}s "
+          f"p99={percentile(latencies, 0.99):.2f}s max={max(latencies):.2f}s "
+          f"delay={stats['delay']:.2f}s hedges={outcomes} leftover_in_flight={in_flight}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=2.0)
+    parser.add_argument('--distribution', default='lognormal')
+    parser.add_argument('--stall-rate', type=float, default=0.05)
+    parser.add_argument('--stall', type=float, default=20.0)
+    parser.add_argument('--no-stream', action='store_true')
+    args = parser.parse_args()
+
+    api = FakeDeepSeekProcess(args.latency, distribution=args.distribution,
+                              stall_rate=args.stall_rate, stall=args.stall)
+    app.Config.DEEPSEEK_API_URL = api.url
+    app.Config.DEEPSEEK_API_KEYS = [f'sk-bench-{i}' for i in range(4)]
+    app.Config.KEY_REQUESTS_PER_MIN = args.jobs * 10
+    app.Config.KEY_TOKENS_PER_MIN = args.jobs * 100000
+    app.Config.STREAM_RESPONSES = not args.no_stream
+    app.job_scheduler.shutdown()
+    try:
+        for hedge in (False, True):
+            run(hedge, args.jobs, args.concurrency)
+    finally:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""مقارنة استخراج JSON: التعبير النمطي الجشع القديم مقابل ProjectJSONExtractor
+
+المدونة الافتراضية مولَّدة بأشكال الردود المعتادة للنموذج (نص قبل/بعد، كتل ```json،
+أقواس في JS/CSS، أسطر خام داخل النصوص، ذيل مقطوع) بحجم استجابة كاملة تقريباً.
+يمكن تمرير ردود حقيقية محفوظة كملفات .txt عبر --corpus.
+
+الاستخدام:
+    python benchmarks/bench_json_extract.py --repeat 200
+    python benchmarks/bench_json_extract.py --corpus responses/
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_json_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import SAMPLE_PROJECT  # noqa: E402
+
+app.logger.disabled = True
+
+
+def legacy_extract(content):
+    """السلوك السابق لـ extract_and_validate_json"""
+    match = re.search(r'\{.*\}', content, re.DOTALL)
+    if not match:
+        raise app.JSONExtractionError("No JSON found in response")
+    data = json.loads(match.group())
+    for key in ('html', 'css'):
+        if key not in data:
+            raise app.JSONValidationError(f"Missing required key: {key}")
+    return data
+
+
+def large_project():
+    """مشروع بحجم استجابة كاملة (~14 ألف حرف) مليء بالأقواس"""
+    project = dict(SAMPLE_PROJECT)
+    project['css'] += ''.join(f'\n.card-{i} {{ padding: {i}px; }}' for i in range(250))
+    project['js'] += ''.join(f'\nfunction handler{i}(e) {{ if (e) {{ return {i}; }} }}' for i in range(150))
+    return project
+
+
+def build_corpus():
+    project = large_project()
+    body = json.dumps(project, ensure_ascii=False, indent=2)
+    raw_newlines = body.replace('\\n', '\n')
+    return {
+        'plain': body,
+        'fenced': f"إليك المشروع:\n```json\n{body}\n```\n",
+        'prose_after': f"{body}\n\nملاحظة: يمكنك تعديل الدالة {{init}} حسب الحاجة.",
+        'prose_braces_before': f"البنية {{html, css, js}} كما طلبت:\n{body}",
+        'raw_newlines': raw_newlines,
+        'trailing_comma': body[:-2] + ',\n}',
+        'truncated': body[:int(len(body) * 0.9)],
+    }
+
+
+def load_corpus(directory):
+    return {os.path.basename(path): open(path, encoding='utf-8').read()
+            for path in sorted(glob.glob(os.path.join(directory, '*.txt')))}
+
+
+def measure(extract, content, repeat):
+    ok = True
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            extract(content)
+        except Exception:
+            ok = False
+    return ok, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--corpus')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus()
+    extractor = app.ProjectJSONExtractor()
+    totals = {'legacy': 0, 'extractor': 0}
+
+    print(f"{'case':22s} {'size':>7s} {'legacy':>14s} {'extractor':>14s}")
+    for name, content in corpus.items():
+        legacy_ok, legacy_ms = measure(legacy_extract, content, args.repeat)
+        new_ok, new_ms = measure(extractor.extract, content, args.repeat)
+        totals['legacy'] += legacy_ok
+        totals['extractor'] += new_ok
+        print(f"{name:22s} {len(content):7d} "
+              f"{'ok' if legacy_ok else 'FAIL':>4s} {legacy_ms:7.3f}ms "
+              f"{'ok' if new_ok else 'FAIL':>4s} {new_ms:7.3f}ms")
+
+    print(f"\nparsed: legacy {totals['legacy']}/{len(corpus)}, "
+          f"extractor {totals['extractor']}/{len(corpus)}")
+
+
+if __name__ == '__main__':
+    main()
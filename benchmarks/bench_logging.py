@@ -0,0 +1,126 @@
+"""كلفة التسجيل على الخيط المستدعي: FileHandler مباشر مقابل طابور QueueHandler
+
+- direct: المعالجات القديمة (basicConfig مع FileHandler) تكتب الملف داخل خيط المعالج
+- stall: نفس المقارنة مع قرص يتوقف --stall-ms كل 500 سجل (تدوير أو fsync)؛ يُطبع p99 وأقصى زمن للمستدعي
+- queue: BoundedQueueHandler يضع السجل في الطابور و QueueListener يكتب في الخلفية
+- sampled: track_user_activity مع LOG_ACTIVITY_SAMPLE_RATE
+- filtered: سجل DEBUG مُرشَّح بصيغة f-string مقابل وسائط % الكسولة
+الطرفية (StreamHandler) غير مضمّنة كي لا يطغى الإخراج على القياس.
+
+الاستخدام:
+    python benchmarks/bench_logging.py --records 50000
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.chdir(tempfile.mkdtemp(prefix='bench_logging_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+
+FORMAT = '%(asctime)s | %(levelname)-8s | %(name)-20s | %(message)s'
+
+
+def per_call(func, count):
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+class StallingFileHandler(logging.FileHandler):
+    """قرص بطيء أحياناً: توقف قصير كل STALL_EVERY سجل"""
+    
+    STALL_EVERY = 500
+    
+    def __init__(self, filename, stall):
+        super().__init__(filename, encoding='utf-8')
+        self.stall = stall
+        self.setFormatter(logging.Formatter(FORMAT))
+        self.written = 0
+    
+    def emit(self, record):
+        self.written += 1
+        if self.written % self.STALL_EVERY == 0:
+            time.sleep(self.stall)
+        super().emit(record)
+
+
+def latencies(func, count):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[int(count * 0.99)] * 1e6, samples[-1] * 1e6
+
+
+def use_handler(handler):
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--stall-ms', type=float, default=50)
+    args = parser.parse_args()
+    count = args.records
+    app.job_scheduler.shutdown()
+    logger = app.logger
+
+    def log_line(i):
+        logger.info("User %s performed %s: %s", i, 'project_created', {'type': 'restaurant'})
+
+    direct = logging.FileHandler('direct.log', encoding='utf-8')
+    direct.setFormatter(logging.Formatter(FORMAT))
+    use_handler(direct)
+    print(f"direct FileHandler   {per_call(log_line, count):6.2f}us per record")
+    direct.close()
+
+    file_handler = logging.FileHandler('queued.log', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+    queued = app.BoundedQueueHandler(app.queue.Queue(count + 1))
+    queued.addFilter(app.LogContextFilter())
+    listener = logging.handlers.QueueListener(queued.queue, file_handler)
+    use_handler(queued)
+    listener.start()
+    print(f"queue (caller side)  {per_call(log_line, count):6.2f}us per record")
+    start = time.perf_counter()
+    listener.stop()
+    print(f"  background drain   {(time.perf_counter() - start) * 1e3:6.0f}ms for {count} records, dropped {queued.dropped}")
+
+    use_handler(StallingFileHandler('stall_direct.log', args.stall_ms / 1000))
+    p99, worst = latencies(log_line, count)
+    print(f"stall direct         p99 {p99:6.1f}us, max {worst / 1e3:5.1f}ms")
+    queued = app.BoundedQueueHandler(app.queue.Queue(count + 1))
+    listener = logging.handlers.QueueListener(queued.queue, StallingFileHandler('stall_queued.log', args.stall_ms / 1000))
+    use_handler(queued)
+    listener.start()
+    p99, worst = latencies(log_line, count)
+    listener.stop()
+    print(f"stall queue          p99 {p99:6.1f}us, max {worst / 1e3:5.1f}ms")
+    
+    use_handler(app.BoundedQueueHandler(app.queue.Queue(1)))  # الطابور ممتلئ دائماً: كلفة الإسقاط
+    for rate in (1.0, 0.1):
+        app.Config.LOG_ACTIVITY_SAMPLE_RATE = rate
+        cost = per_call(lambda i: app.track_user_activity(i, 'button_press', None), count)
+        print(f"activity sample={rate:<4} {cost:6.2f}us per event")
+
+    payload = {'html': 'x' * 2000}
+    eager = per_call(lambda i: logger.debug(f"Response for {i}: {payload}"), count)
+    lazy = per_call(lambda i: logger.debug("Response for %s: %s", i, payload), count)
+    print(f"filtered DEBUG f-string {eager:6.2f}us, lazy {lazy:6.2f}us per call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""قياس عرض "مشاريعي" وتخزين المحتوى على جدول projects كبير
+
+يملأ قاعدة مؤقتة بصفوف وصفية (دون محتوى) ثم يقيس:
+- صفحة المستخدم بترقيم keyset (list_projects) مقابل LIMIT/OFFSET لصفحة عميقة
+- حجم المحتوى بعد الضغط والتكرار
+
+الاستخدام:
+    python benchmarks/bench_projects_listing.py --rows 1000000 --heavy-user-rows 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_projects_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import SAMPLE_PROJECT  # noqa: E402
+
+HEAVY_USER = 1
+
+
+def populate(db, rows, heavy_rows, users):
+    conn = db.writer._connect()
+    now = '2025-01-01T00:00:00'
+    types = list(app.UIManager.TYPE_NAMES)
+
+    def generate():
+        for i in range(rows):
+            user_id = HEAVY_USER if i % (rows // heavy_rows) == 0 else random.randint(2, users)
+            yield (user_id, random.choice(types), 'وصف', 'جودة: احترافي', 'x' * 64,
+                   'مكتمل', random.randint(40, 100), now, now)
+
+    start = time.perf_counter()
+    with conn:
+        conn.executemany('''INSERT INTO projects
+                            (user_id, project_type, description, requirements, blob_hash,
+                             status, quality_score, created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', generate())
+    conn.close()
+    return time.perf_counter() - start
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--heavy-user-rows', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db = app.db_manager
+    elapsed = populate(db, args.rows, args.heavy_user_rows, args.users)
+    print(f"inserted {args.rows} rows in {elapsed:.1f}s")
+
+    page = app.Config.PROJECTS_PAGE_SIZE
+    heavy_rows = db.fetch_one('SELECT COUNT(*) FROM projects WHERE user_id = ?', (HEAVY_USER,))[0]
+    deep_offset = heavy_rows - page * 2
+    first_ms, _ = timed(lambda: db.list_projects(HEAVY_USER), args.repeat)
+
+    # نفس الصفحة العميقة بالطريقتين
+    before_id = db.fetch_one('''SELECT id FROM projects WHERE user_id = ?
+                                ORDER BY id DESC LIMIT 1 OFFSET ?''', (HEAVY_USER, deep_offset - 1))[0]
+    keyset_ms, keyset_rows = timed(lambda: db.list_projects(HEAVY_USER, before_id), args.repeat)
+    offset_ms, offset_rows = timed(lambda: db.fetch_all(
+        '''SELECT id, project_type, quality_score, created_at FROM projects
+           WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?''',
+        (HEAVY_USER, page, deep_offset)), args.repeat)
+    assert keyset_rows == offset_rows
+    print(f"user with {heavy_rows} projects: first page {first_ms:.3f}ms, "
+          f"page at offset {deep_offset}: keyset {keyset_ms:.3f}ms vs OFFSET {offset_ms:.3f}ms")
+
+    raw = json.dumps(SAMPLE_PROJECT, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    _, codec, data, raw_size = db.encode_project(SAMPLE_PROJECT)
+    encode_ms, _ = timed(lambda: db.encode_project(SAMPLE_PROJECT), args.repeat)
+    decode_ms, _ = timed(lambda: db.decode_project(codec, data), args.repeat)
+    print(f"sample project: {raw_size}B -> {len(data)}B {codec} ({len(data) / len(raw):.0%}), "
+          f"encode {encode_ms:.3f}ms, decode {decode_ms:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""بناء جسم الطلب وإصابة ذاكرة السياق: الموجّه القديم مقابل PromptTemplate
+
+- زمن بناء الجسم لكل مهمة (القديم: f-string ثم تسلسل JSON في كل محاولة)
+- نسبة رموز المدخلات المخدومة من ذاكرة السياق في خادم DeepSeek المحلي
+  (يحاكي التخزين بوحدات بادئة ثابتة مثل DeepSeek)
+
+الاستخدام:
+    python benchmarks/bench_prompts.py --requests 200
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_prompts_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import FakeDeepSeekProcess  # noqa: E402
+
+app.logger.disabled = True
+WORDS = ['مطعم', 'متجر', 'حجز', 'قائمة', 'ألوان', 'عصري', 'تواصل', 'معرض', 'خدمات', 'مدونة', 'عروض', 'فريق']
+
+
+def legacy_payload(description, requirements):
+    """السلوك السابق: الوصف في بداية رسالة المستخدم والجسم يُبنى من جديد"""
+    user_prompt = f"""
+PROJECT REQUEST:
+{description}
+
+ADDITIONAL REQUIREMENTS:
+{requirements or "Standard professional implementation"}
+
+{app.AIService.INSTRUCTIONS}
+"""
+    return {
+        "model": "deepseek-coder",
+        "messages": [
+            {"role": "system", "content": app.AIService.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 4000,
+        "top_p": 0.9,
+        "stream": False
+    }
+
+
+def make_jobs(count):
+    types = list(app.UIManager.TYPE_NAMES)
+    qualities = [f"جودة: {name}" for name in app.UIManager.QUALITY_NAMES.values()]
+    combos = itertools.cycle(itertools.product(types, qualities))
+    return [(' '.join(random.choices(WORDS, k=12)) + f' {i}', *next(combos)) for i in range(count)]
+
+
+def build_timing(service, jobs, retries):
+    start = time.perf_counter()
+    for description, project_type, requirements in jobs:
+        for _ in range(retries):
+            json.dumps(legacy_payload(description, requirements)).encode('utf-8')
+    legacy_us = (time.perf_counter() - start) / len(jobs) * 1e6
+
+    start = time.perf_counter()
+    for description, project_type, requirements in jobs:
+        service.get_template('project', project_type, requirements).render(description)
+    template_us = (time.perf_counter() - start) / len(jobs) * 1e6
+    return legacy_us, template_us
+
+
+def cache_share(send, jobs):
+    prompt = cached = 0
+    for job in jobs:
+        usage = send(*job)
+        prompt += usage['prompt_tokens']
+        cached += app.AIService.cached_tokens(usage)
+    return cached / prompt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app.Config.STREAM_RESPONSES = False
+    app.job_scheduler.shutdown()
+    service = app.AIService()
+    jobs = make_jobs(args.requests)
+
+    legacy_us, template_us = build_timing(service, jobs * 10, app.Config.MAX_RETRIES)
+    print(f"body build per job ({app.Config.MAX_RETRIES} attempts): legacy {legacy_us:.1f}us, "
+          f"template {template_us:.1f}us")
+
+    legacy_api = FakeDeepSeekProcess(latency=0)
+    template_api = FakeDeepSeekProcess(latency=0)
+    try:
+        session = requests.Session()
+
+        def send_legacy(description, project_type, requirements):
+            response = session.post(legacy_api.url, json=legacy_payload(description, requirements))
+            return response.json()['usage']
+
+        def send_template(description, project_type, requirements):
+            body, _ = service.get_template('project', project_type, requirements).render(description)
+            return session.post(template_api.url, data=body).json()['usage']
+
+        legacy_share = cache_share(send_legacy, jobs)
+        template_share = cache_share(send_template, jobs)
+        print(f"prompt tokens served from prefix cache over {len(jobs)} requests: "
+              f"legacy {legacy_share:.0%}, template {template_share:.0%}")
+    finally:
+        legacy_api.stop()
+        template_api.stop()
+
+
+if __name__ == '__main__':
+    main()
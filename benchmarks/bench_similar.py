@@ -0,0 +1,86 @@
+"""فهرس الأوصاف المتشابهة: زمن البحث ودقته مع نمو جدول المشاريع
+
+- يملأ قاعدة مؤقتة بمشاريع بأوصاف عشوائية من نفس المفردات (أسوأ حالة لـ LSH)
+- يقيس زمن find() لوصف مُعاد صياغته (إصابة) ولوصف عشوائي (غالباً إخفاق)
+- يطبع التشابه المقدّر لأزواج إعادة صياغة وأزواج مختلفة
+
+الاستخدام:
+    python benchmarks/bench_similar.py --projects 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.chdir(tempfile.mkdtemp(prefix='bench_similar_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+
+app.logger.disabled = True
+WORDS = ['مطعم', 'متجر', 'حجز', 'قائمة', 'ألوان', 'عصري', 'تواصل', 'معرض', 'خدمات', 'مدونة',
+         'عروض', 'فريق', 'طاولات', 'أحمر', 'أزرق', 'صور', 'دورات', 'طلاب']
+PAIRS = [
+    ("موقع مطعم بالألوان الأحمر والأسود مع قائمة طعام وحجز طاولات",
+     "موقع لمطعم بالألوان الأحمر والاسود مع قائمة الطعام و حجز الطاولات", True),
+    ("موقع شخصي لمصمم جرافيك يعرض أعمالي مع صفحة تواصل",
+     "موقع شخصي لمصممة جرافيك لعرض أعمالي وصفحة للتواصل", True),
+    ("موقع مطعم بالألوان الأحمر والأسود مع قائمة طعام وحجز طاولات",
+     "موقع مطعم بالألوان الأزرق والأبيض مع معرض صور وصفحة تواصل", False),
+    ("موقع مطعم بالألوان الأحمر والأسود مع قائمة طعام وحجز طاولات",
+     "متجر إلكتروني لبيع الملابس مع سلة مشتريات ودفع إلكتروني", False),
+]
+PROJECT = {'html': '<!DOCTYPE html><html></html>', 'css': 'body {}', 'js': '', 'documentation': ''}
+
+
+def timed(func, queries):
+    start = time.perf_counter()
+    results = [func(query) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--projects', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    app.job_scheduler.shutdown()
+    db, index = app.db_manager, app.description_index
+
+    start = time.perf_counter()
+    for i in range(args.projects):
+        description = ' '.join(random.choices(WORDS, k=10)) + f' {i}'
+        db.save_project(i % 100, 'restaurant', description, {**PROJECT, 'n': i}, 'مكتمل', 90)
+        if i % 500 == 0:
+            db.writer.flush()  # الطابور محدود ويُسقط الكتابات عند امتلائه
+    for i, (stored, _, _) in enumerate(PAIRS):
+        db.save_project(1, 'restaurant', stored, {**PROJECT, 'pair': i}, 'مكتمل', 90)
+    db.writer.flush()
+    insert_us = (time.perf_counter() - start) / (args.projects + len(PAIRS)) * 1e6
+    assert db.writer.stats['dropped'] == 0
+    print(f"indexed {args.projects + len(PAIRS)} projects, {insert_us:.0f}us per save_project (write-behind)")
+
+    for stored, query, similar in PAIRS:
+        signature = app.DescriptionIndex.signature
+        score = app.DescriptionIndex.similarity(signature(stored), signature(query))
+        found = index.find('restaurant', query)
+        print(f"expected {'similar' if similar else 'different':9s} estimate {score:.2f} "
+              f"found={found is not None}")
+
+    rephrased = [PAIRS[0][1]] * args.lookups
+    unrelated = [' '.join(random.choices(WORDS, k=10)) for _ in range(args.lookups)]
+    signature_us, _ = timed(app.DescriptionIndex.signature, rephrased)
+    hit_us, hits = timed(lambda query: index.find('restaurant', query), rephrased)
+    miss_us, misses = timed(lambda query: index.find('restaurant', query), unrelated)
+    print(f"signature {signature_us:.0f}us, find hit {hit_us:.0f}us ({sum(map(bool, hits))}/{len(hits)}), "
+          f"find random {miss_us:.0f}us ({sum(map(bool, misses))}/{len(misses)} matched)")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
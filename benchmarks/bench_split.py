@@ -0,0 +1,86 @@
+"""وضع الإنشاء split مقابل الطلب الواحد
+
+زمن الخادم المحلي يتناسب مع طول المخرجات (--tokens-per-second)، فيظهر أثر توزيع
+html/css/js على طلبات متوازية. يُطبع p50/p95 لزمن المهمة ونتائج وضع split.
+
+الاستخدام:
+    python benchmarks/bench_split.py --jobs 12 --tokens-per-second 50 --scale 12
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.chdir(tempfile.mkdtemp(prefix='bench_split_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_deepseek import FakeDeepSeekProcess  # noqa: E402
+
+app.logger.disabled = True
+DESCRIPTION = 'موقع مطعم بالألوان الأحمر والأسود مع قائمة طعام وحجز طاولات'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def split_outcomes():
+    return {key[0]: value for key, value in app.app_metrics.split_generations.values.items()}
+
+
+def run(mode, jobs, concurrency):
+    app.Config.GENERATION_MODE = mode
+    service = app.AIService()
+    before = split_outcomes()
+    scores = []
+
+    def job(i):
+        start = time.perf_counter()
+        project = service.generate_project(DESCRIPTION, 'restaurant', user_id=i)
+        scores.append(app.calculate_quality_score(project))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(job, range(jobs)))
+    elapsed = time.perf_counter() - start
+    service.close()
+
+    after = split_outcomes()
+    outcomes = {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)}
+    print(f"mode={mode:6s} jobs={jobs} time={elapsed:.1f}s p50={percentile(latencies, 0.50):.2f}s "
+          f"p95={percentile(latencies, 0.95):.2f}s quality={sum(scores) / len(scores):.0f} split={outcomes}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=12)
+    parser.add_argument('--concurrency', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.5, help='زمن ثابت لكل طلب قبل التوليد')
+    parser.add_argument('--tokens-per-second', type=float, default=50)
+    parser.add_argument('--scale', type=float, default=12, help='حجم المشروع مقارنة بالعينة')
+    parser.add_argument('--keys', type=int, default=3)
+    args = parser.parse_args()
+
+    api = FakeDeepSeekProcess(args.latency, tokens_per_second=args.tokens_per_second, scale=args.scale)
+    app.Config.DEEPSEEK_API_URL = api.url
+    app.Config.DEEPSEEK_API_KEYS = [f'sk-bench-{i}' for i in range(args.keys)]
+    app.Config.KEY_REQUESTS_PER_MIN = args.jobs * 10
+    app.Config.KEY_TOKENS_PER_MIN = args.jobs * 100000
+    app.Config.REQUEST_TIMEOUT = 300
+    app.job_scheduler.shutdown()
+    try:
+        for mode in ('single', 'split'):
+            run(mode, args.jobs, args.concurrency)
+    finally:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
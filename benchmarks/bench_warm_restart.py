@@ -0,0 +1,80 @@
+"""كلفة اللقطات والاستعادة الكسولة لإعادة التشغيل الدافئ
+
+- snapshot: كتابة N جلسة متغيرة (مع رصيد المعدل) إلى session_snapshots عبر الكاتب الخلفي
+- boot: restore_all عند الإقلاع (قراءة كل الصفوف غير المنتهية دفعة واحدة قبل استقبال التحديثات)
+- access: get_user_state بعد الإقلاع من الذاكرة فقط (لا قراءة SQLite في مسار الطلب)
+يُطبع حجم اللقطة لكل جلسة.
+
+الاستخدام:
+    python benchmarks/bench_warm_restart.py --sessions 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.chdir(tempfile.mkdtemp(prefix='bench_warm_restart_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+
+app.logger.disabled = True
+UI_TYPE = app.UIManager.TYPE_NAMES['restaurant']
+
+
+def fill_sessions(manager, count):
+    for user_id in range(1, count + 1):
+        manager.check_rate_limit(user_id)
+        manager.set_user_state(user_id, {
+            'action': 'awaiting_quality',
+            'project_category': 'website',
+            'project_type': 'restaurant',
+            'type_name': UI_TYPE,
+            'description': f"موقع مطعم رقم {user_id} بتصميم عصري مع قائمة طعام وحجز طاولات"
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=20000)
+    args = parser.parse_args()
+    count = args.sessions
+    app.job_scheduler.shutdown()
+    db = app.db_manager
+
+    fill_sessions(app.state_manager, count)
+    start = time.perf_counter()
+    saved, _ = app.session_snapshots.snapshot()
+    collected = time.perf_counter() - start
+    db.writer.flush()
+    written = time.perf_counter() - start
+    page_size = db.fetch_one('PRAGMA page_size')[0]
+    pages = db.fetch_one("SELECT SUM(pgsize) FROM dbstat WHERE name = 'session_snapshots'")
+    size = pages[0] if pages and pages[0] else db.fetch_one('PRAGMA page_count')[0] * page_size
+    print(f"snapshot {saved} sessions: collect {collected * 1e3:.0f}ms, written {written * 1e3:.0f}ms, "
+          f"{size / saved:.0f} bytes/session")
+    start = time.perf_counter()
+    app.session_snapshots.snapshot()
+    print(f"snapshot with nothing changed: {(time.perf_counter() - start) * 1e6:.0f}us")
+
+    # إقلاع جديد: مدير حالة فارغ يُملأ من نفس قاعدة البيانات
+    manager = app.StateManager()
+    snapshots = app.SessionSnapshots(db, manager)
+    start = time.perf_counter()
+    restored = snapshots.restore_all()
+    boot = time.perf_counter() - start
+    print(f"boot: restore_all {boot * 1e3:.0f}ms for {restored} sessions "
+          f"({boot / max(restored, 1) * 1e6:.1f}us/session)")
+
+    users = random.sample(range(1, count + 1), min(2000, count))
+    start = time.perf_counter()
+    found = sum(manager.get_user_state(user_id) is not None for user_id in users)
+    access = (time.perf_counter() - start) / len(users)
+    print(f"access after boot {access * 1e6:.2f}us ({found}/{len(users)} restored)")
+
+
+if __name__ == '__main__':
+    main()
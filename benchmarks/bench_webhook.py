@@ -0,0 +1,101 @@
+"""مقارنة استقبال التحديثات: polling مقابل webhook مع خادم Telegram محلي
+
+كل تحديث رسالة /start من مستخدم مختلف، ويُقاس الزمن حتى وصول جميع ردود sendMessage.
+
+الاستخدام:
+    python benchmarks/bench_webhook.py --updates 2000 --delay 0.02
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp(prefix='bench_webhook_'))
+
+import telebot  # noqa: E402
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+from fake_telegram import FakeTelegramProcess, make_message_update  # noqa: E402
+
+
+def run_polling(api, count, user_offset):
+    before = api.count_calls('sendMessage')
+    api.push_updates([make_message_update(user_offset + i, '/start') for i in range(count)])
+
+    start = time.perf_counter()
+    thread = threading.Thread(
+        target=app.bot.polling,
+        kwargs={'non_stop': True, 'interval': 0, 'timeout': 5, 'long_polling_timeout': 1},
+        daemon=True
+    )
+    thread.start()
+    api.wait_for_calls('sendMessage', before + count)
+    elapsed = time.perf_counter() - start
+    app.bot.stop_polling()
+    thread.join(5)
+    return elapsed, None
+
+
+def run_webhook(api, count, user_offset, clients):
+    server = app.WebhookServer(app.bot, '127.0.0.1', 0, '/hook', 'bench-secret')
+    server.start()
+    url = f'http://127.0.0.1:{server.port}/hook'
+    before = api.count_calls('sendMessage')
+    acks = []
+    lock = threading.Lock()
+
+    def client(worker):
+        session = requests.Session()
+        headers = {'X-Telegram-Bot-Api-Secret-Token': 'bench-secret', 'Content-Type': 'application/json'}
+        local = []
+        for i in range(worker, count, clients):
+            body = json.dumps({**make_message_update(user_offset + i, '/start'), 'update_id': i + 1})
+            sent = time.perf_counter()
+            response = session.post(url, data=body, headers=headers)
+            local.append(time.perf_counter() - sent)
+            assert response.status_code == 200
+        with lock:
+            acks.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    api.wait_for_calls('sendMessage', before + count)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    acks.sort()
+    return elapsed, acks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--delay', type=float, default=0.02, help='simulated Bot API latency per call (s)')
+    parser.add_argument('--clients', type=int, default=20, help='concurrent webhook deliveries')
+    args = parser.parse_args()
+
+    api = FakeTelegramProcess(response_delay=args.delay)
+    telebot.apihelper.API_URL = api.api_url
+
+    elapsed, _ = run_polling(api, args.updates, 1_000_000)
+    print(f"polling   {args.updates / elapsed:>8.0f} updates/s   total {elapsed:.2f} s")
+
+    elapsed, acks = run_webhook(api, args.updates, 2_000_000, args.clients)
+    p50 = acks[len(acks) // 2] * 1000
+    p99 = acks[int(len(acks) * 0.99) - 1] * 1000
+    print(f"webhook   {args.updates / elapsed:>8.0f} updates/s   total {elapsed:.2f} s   "
+          f"ack p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+    api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""خادم محلي يحاكي DeepSeek chat/completions لأغراض القياس
+
+يدعم الاستجابة العادية والمتدفقة (SSE) مع توزيع زمن استجابة ومعدل أخطاء قابلين للضبط.
+
+    api = FakeDeepSeekAPI(latency=2.0).start()
+    Config.DEEPSEEK_API_URL = api.url
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_PROJECT = {
+    'html': '<!DOCTYPE html>\n<html lang="ar" dir="rtl">\n<head>\n<meta charset="UTF-8">\n'
+            '<meta name="viewport" content="width=device-width, initial-scale=1.0">\n'
+            '<title>مطعم</title>\n<link rel="stylesheet" href="style.css">\n</head>\n<body>\n'
+            '<header class="site-header"><nav id="main-nav"><ul><li><a href="#menu">القائمة</a></li></ul></nav></header>\n'
+            '<main><section id="menu" class="menu-grid"></section></main>\n'
+            '<footer class="site-footer">© 2025</footer>\n<script src="script.js"></script>\n</body>\n</html>',
+    'css': ':root { --primary: #c0392b; }\n.site-header { display: flex; }\n'
+           '.menu-grid { display: grid; transition: opacity .3s; }\n'
+           '@media (max-width: 768px) { .menu-grid { grid-template-columns: 1fr; } }',
+    'js': 'document.addEventListener("DOMContentLoaded", () => {\n  try {\n'
+          '    document.getElementById("menu").classList.add("ready");\n'
+          '  } catch (error) {\n    console.error(error);\n  }\n});',
+    'documentation': 'افتح index.html في المتصفح.'
+}
+
+SAMPLE_SPEC = {
+    'title': 'مطعم',
+    'palette': {'primary': '#c0392b', 'secondary': '#2c3e50', 'background': '#ffffff', 'text': '#222222'},
+    'typography': 'Cairo, sans-serif',
+    'sections': [{'id': 'menu', 'purpose': 'قائمة الطعام'}],
+    'ids': ['main-nav', 'menu'],
+    'classes': ['site-header', 'menu-grid', 'site-footer', 'ready'],
+    'interactions': ['إضافة الصنف ready إلى #menu عند التحميل'],
+    'documentation': SAMPLE_PROJECT['documentation']
+}
+# طلبات وضع split تُعرف من موجّه النظام
+SPLIT_MARKERS = (
+    ('ONLY the HTML', 'html'),
+    ('ONLY the CSS', 'css'),
+    ('ONLY the JavaScript', 'js'),
+    ('design specification', 'spec'),
+)
+
+
+def padded_project(scale):
+    """SAMPLE_PROJECT مكبّراً بأسطر تعليق (scale مرة تقريباً) دون تغيير المعرّفات والأصناف"""
+    if scale <= 1:
+        return SAMPLE_PROJECT
+    padding = 'x' * 60
+    lines = int(len(json.dumps(SAMPLE_PROJECT)) * (scale - 1) / 3 / 70)
+    return dict(
+        SAMPLE_PROJECT,
+        html=SAMPLE_PROJECT['html'] + ''.join(f'\n<!-- {i} {padding} -->' for i in range(lines)),
+        css=SAMPLE_PROJECT['css'] + ''.join(f'\n/* {i} {padding} */' for i in range(lines)),
+        js=SAMPLE_PROJECT['js'] + ''.join(f'\n// {i} {padding}' for i in range(lines))
+    )
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # إغلاق العميل لاتصالات keep-alive
+            super().handle_error(request, client_address)
+
+
+class FakeDeepSeekAPI:
+    LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal', 'exponential')
+
+    def __init__(self, host='127.0.0.1', port=0, latency=1.0, error_rate=0.0,
+                 chunk_size=64, content=None, distribution='fixed', sigma=0.5, max_latency=None,
+                 stall_rate=0.0, stall=0.0, tokens_per_second=None, scale=1):
+        if distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"unknown latency distribution: {distribution}")
+        self.latency = latency  # إجمالي زمن الاستجابة (ثوانٍ)؛ الوسيط في lognormal والمتوسط في غيره
+        self.distribution = distribution
+        self.sigma = sigma  # تشتت lognormal
+        self.max_latency = max_latency
+        self.error_rate = error_rate  # نسبة الردود 503
+        self.stall_rate = stall_rate  # نسبة الطلبات التي تتأخر قبل أول بايت (خادم خلفي بطيء)
+        self.stall = stall
+        self.chunk_size = chunk_size
+        self.tokens_per_second = tokens_per_second  # يضيف زمناً يتناسب مع طول المخرجات
+        self.project = padded_project(scale)
+        self.content = content or json.dumps(self.project, ensure_ascii=False)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.cached_prefixes = set()  # بصمات البادئات التي رآها الخادم (محاكاة ذاكرة السياق)
+        self.httpd = _FakeHTTPServer((host, port), self._make_handler())
+
+    def content_for(self, body):
+        """المحتوى المناسب للطلب: مشروع JSON كامل، أو مواصفات/ملف واحد في وضع split"""
+        messages = body.get('messages') or [{}]
+        system_prompt = messages[0].get('content') or ''
+        for marker, part in SPLIT_MARKERS:
+            if marker in system_prompt:
+                return json.dumps(SAMPLE_SPEC, ensure_ascii=False) if part == 'spec' else self.project[part]
+        return self.content
+
+    CACHE_UNIT = 256  # حجم وحدة البادئة المخزنة (حروف؛ DeepSeek يخزن بوحدات 64 رمزاً)
+
+    def usage_for(self, body, content):
+        """حقل usage مع رموز المدخلات المخدومة من ذاكرة السياق: أطول بادئة سبق إرسالها"""
+        prompt = ''.join(message.get('content') or '' for message in body.get('messages') or [])
+        boundaries = range(self.CACHE_UNIT, len(prompt) + 1, self.CACHE_UNIT)
+        digests = [hashlib.sha1(prompt[:end].encode('utf-8')).digest() for end in boundaries]
+        with self.lock:
+            hit = 0
+            for end, digest in zip(boundaries, digests):
+                if digest not in self.cached_prefixes:
+                    break
+                hit = end
+            self.cached_prefixes.update(digests)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_cache_hit_tokens': hit // 4,
+            'prompt_cache_miss_tokens': prompt_tokens - hit // 4
+        }
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fake-deepseek', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def sample_latency(self):
+        if self.distribution == 'uniform':
+            value = random.uniform(0, 2 * self.latency)
+        elif self.distribution == 'lognormal':
+            value = random.lognormvariate(math.log(self.latency), self.sigma)
+        elif self.distribution == 'exponential':
+            value = random.expovariate(1 / self.latency)
+        else:
+            value = self.latency
+        return min(value, self.max_latency) if self.max_latency else value
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                with api.lock:
+                    api.requests += 1
+
+                content = api.content_for(body)
+                latency = api.sample_latency()
+                if api.tokens_per_second:
+                    latency += len(content) / 4 / api.tokens_per_second
+                if random.random() < api.stall_rate:
+                    time.sleep(api.stall)
+                if random.random() < api.error_rate:
+                    time.sleep(latency / 10)
+                    self._send_json(503, {'error': {'message': 'overloaded'}}, {'Retry-After': '1'})
+                    return
+
+                usage = api.usage_for(body, content)
+                if body.get('stream'):
+                    include_usage = (body.get('stream_options') or {}).get('include_usage')
+                    self._stream(latency, content, usage if include_usage else None)
+                else:
+                    time.sleep(latency)
+                    self._send_json(200, {
+                        'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                        'usage': usage
+                    })
+
+            def _stream(self, latency, content, usage=None):
+                chunks = [content[i:i + api.chunk_size]
+                          for i in range(0, len(content), api.chunk_size)]
+                delay = latency / (len(chunks) + 1)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                time.sleep(delay)
+                for chunk in chunks:
+                    event = {'choices': [{'delta': {'content': chunk}}]}
+                    self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                    time.sleep(delay)
+                if usage:
+                    self._write_chunk(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, text):
+                data = text.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeDeepSeekProcess:
+    """تشغيل FakeDeepSeekAPI في عملية منفصلة حتى لا ينافس العميل المقاس على المعالج"""
+
+    def __init__(self, latency=1.0, error_rate=0.0, distribution='fixed', sigma=0.5, max_latency=None,
+                 stall_rate=0.0, stall=0.0, tokens_per_second=None, scale=1):
+        command = [sys.executable, os.path.abspath(__file__), '--port', '0',
+                   '--latency', str(latency), '--error-rate', str(error_rate),
+                   '--distribution', distribution, '--sigma', str(sigma),
+                   '--stall-rate', str(stall_rate), '--stall', str(stall), '--scale', str(scale)]
+        if max_latency:
+            command += ['--max-latency', str(max_latency)]
+        if tokens_per_second:
+            command += ['--tokens-per-second', str(tokens_per_second)]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        self.url = self.process.stdout.readline().strip()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--distribution', choices=FakeDeepSeekAPI.LATENCY_DISTRIBUTIONS, default='fixed')
+    parser.add_argument('--sigma', type=float, default=0.5)
+    parser.add_argument('--max-latency', type=float)
+    parser.add_argument('--stall-rate', type=float, default=0.0)
+    parser.add_argument('--stall', type=float, default=0.0)
+    parser.add_argument('--tokens-per-second', type=float)
+    parser.add_argument('--scale', type=float, default=1)
+    args = parser.parse_args()
+
+    api = FakeDeepSeekAPI(args.host, args.port, args.latency, args.error_rate,
+                          distribution=args.distribution, sigma=args.sigma, max_latency=args.max_latency,
+                          stall_rate=args.stall_rate, stall=args.stall,
+                          tokens_per_second=args.tokens_per_second, scale=args.scale)
+    print(api.url, flush=True)
+    try:
+        api.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
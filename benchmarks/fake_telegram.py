@@ -0,0 +1,358 @@
+"""خادم محلي يحاكي Telegram Bot API لأغراض القياس
+
+يسجل استدعاءات الإرسال ويقدم التحديثات عبر getUpdates، ويطبق حدود Telegram
+(رسالة/ثانية لكل محادثة و30/ثانية إجمالاً) بردود 429 عند التفعيل.
+الاستخدام داخل نفس العملية:
+
+    api = FakeTelegramAPI().start()
+    telebot.apihelper.API_URL = api.api_url
+
+أو في عملية منفصلة (لا يتنافس مع البوت على GIL):
+
+    api = FakeTelegramProcess(response_delay=0.02)
+    telebot.apihelper.API_URL = api.api_url
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _RateBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """أخذ رمز أو إرجاع مدة الانتظار بالثواني"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTelegramAPI:
+    LIMITED_METHODS = ('sendMessage', 'sendDocument', 'sendPhoto', 'editMessageText')
+
+    def __init__(self, host='127.0.0.1', port=0, response_delay=0.0, rate_limits=False,
+                 chat_rate=1.0, chat_burst=3, global_rate=30.0):
+        self.response_delay = response_delay  # زمن شبكة مُحاكى لكل استدعاء
+        self.rate_limits = rate_limits
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = _RateBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+        self.rejected = {}
+        self.updates = deque()
+        self.next_update_id = 1
+        self.calls = []
+        self.counts = {}  # (method, chat_id أو None) -> عدد
+        self.message_ids = 0
+        self.cond = threading.Condition()
+        self.httpd = _FakeHTTPServer((host, port), self._make_handler())
+
+    @property
+    def api_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fake-telegram', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def push_update(self, update):
+        """إضافة تحديث لطابور getUpdates وإرجاعه مع update_id"""
+        with self.cond:
+            update = {**update, 'update_id': self.next_update_id}
+            self.next_update_id += 1
+            self.updates.append(update)
+            self.cond.notify_all()
+            return update
+
+    def calls_for(self, method):
+        with self.cond:
+            return [call for call in self.calls if call['method'] == method]
+
+    def count_calls(self, method, chat_id=None):
+        with self.cond:
+            return self._count(method, chat_id)
+
+    def wait_for_calls(self, method, count, timeout=60, chat_id=None):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self._count(method, chat_id) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return True
+
+    def stats(self):
+        with self.cond:
+            calls = {method: count for (method, chat_id), count in self.counts.items() if chat_id is None}
+            return {'calls': calls, 'rejected': dict(self.rejected)}
+
+    def _count(self, method, chat_id):
+        return self.counts.get((method, None if chat_id is None else str(chat_id)), 0)
+
+    def _check_rate(self, method, chat_id):
+        """مدة retry_after إذا تجاوز الطلب حدود Telegram، وإلا 0"""
+        if not self.rate_limits or method not in self.LIMITED_METHODS:
+            return 0
+        now = time.monotonic()
+        with self.cond:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = _RateBucket(self.chat_rate, self.chat_burst)
+            wait = bucket.take(now) or self.global_bucket.take(now)
+            if wait:
+                self.rejected[method] = self.rejected.get(method, 0) + 1
+            return wait
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 100))
+        timeout = float(params.get('timeout', 0))
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.updates and self.updates[0]['update_id'] < offset:
+                self.updates.popleft()
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self.cond.wait(min(remaining, 0.5))
+            return list(self.updates)[:limit]
+
+    def _record(self, method, params, body_size):
+        with self.cond:
+            self.message_ids += 1
+            self.calls.append({
+                'method': method,
+                'params': params,
+                'body_size': body_size,
+                'time': time.monotonic()
+            })
+            for key in ((method, None), (method, params.get('chat_id'))):
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.cond.notify_all()
+            return self.message_ids
+
+    def _result_for(self, method, params, message_id):
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        if method in ('deleteWebhook', 'setWebhook', 'answerCallbackQuery'):
+            return True
+        chat_id = int(params.get('chat_id', 0) or 0)
+        return {
+            'message_id': int(params.get('message_id', message_id) or message_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text', '')
+        }
+
+    def _control(self, path, params, body):
+        """نقاط تحكم للعميل الخارجي: إضافة تحديثات وعدّ الاستدعاءات"""
+        if path == '/_control/updates':
+            return [self.push_update(update) for update in json.loads(body)]
+        if path == '/_control/calls':
+            return {'count': self.count_calls(params.get('method'), params.get('chat_id'))}
+        if path == '/_control/wait':
+            return {'ok': self.wait_for_calls(params.get('method'), int(params.get('count', 1)),
+                                              float(params.get('timeout', 60)), params.get('chat_id'))}
+        if path == '/_control/stats':
+            return self.stats()
+        return None
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                url = urlparse(self.path)
+                method = url.path.rsplit('/', 1)[-1]
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                params.update(_form_params(self.headers.get('Content-Type', ''), body))
+
+                if url.path.startswith('/_control/'):
+                    self._send({'ok': True, 'result': api._control(url.path, params, body)})
+                    return
+
+                if api.response_delay:
+                    time.sleep(api.response_delay)
+
+                retry_after = api._check_rate(method, params.get('chat_id'))
+                if retry_after:
+                    self._send({
+                        'ok': False,
+                        'error_code': 429,
+                        'description': f'Too Many Requests: retry after {math.ceil(retry_after)}',
+                        'parameters': {'retry_after': math.ceil(retry_after)}
+                    }, status=429)
+                    return
+
+                message_id = 0
+                if method != 'getUpdates':
+                    message_id = api._record(method, params, len(body))
+                self._send({'ok': True, 'result': api._result_for(method, params, message_id)})
+
+            def _send(self, payload, status=200):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _form_params(content_type, body):
+    """حقول النموذج النصية (عميل asyncio يرسل المعاملات في الجسم لا في الرابط)"""
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return {key: values[-1] for key, values in parse_qs(body.decode('utf-8')).items()}
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+        return {
+            part.get_param('name', header='content-disposition'): part.get_content()
+            for part in message.iter_parts()
+            if not part.get_filename() and part.get_content_maintype() == 'text'
+        }
+    return {}
+
+
+def make_message_update(user_id, text, message_id=1):
+    """تحديث رسالة نصية من مستخدم في محادثة خاصة"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+    return {
+        'message': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+            'text': text,
+            **({'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]}
+               if text.startswith('/') else {})
+        }
+    }
+
+
+def make_callback_update(user_id, data, message_id=1):
+    """تحديث ضغط زر inline"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+    return {
+        'callback_query': {
+            'id': f'{user_id}-{message_id}-{data}',
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': True, 'first_name': 'bench'},
+                'text': '...'
+            }
+        }
+    }
+
+
+class FakeTelegramProcess:
+    """تشغيل FakeTelegramAPI في عملية منفصلة مع واجهة تحكم بسيطة"""
+
+    def __init__(self, response_delay=0.0, rate_limits=False):
+        command = [sys.executable, os.path.abspath(__file__), '--port', '0', '--delay', str(response_delay)]
+        if rate_limits:
+            command.append('--rate-limits')
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        self.base_url = self.process.stdout.readline().strip()
+        self.api_url = self.base_url + '/bot{0}/{1}'
+
+    def _call(self, path, payload=None, timeout=30):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        with urlopen(Request(self.base_url + path, data=data), timeout=timeout) as response:
+            return json.loads(response.read())['result']
+
+    def push_updates(self, updates):
+        return self._call('/_control/updates', updates)
+
+    def count_calls(self, method, chat_id=None):
+        query = f'method={method}' + (f'&chat_id={chat_id}' if chat_id is not None else '')
+        return self._call(f'/_control/calls?{query}')['count']
+
+    def wait_for(self, method, count, chat_id=None, timeout=120):
+        """انتظار من جهة الخادم (دون استطلاع) حتى يصل عدد الاستدعاءات المطلوب"""
+        query = f'method={method}&count={count}&timeout={timeout}'
+        if chat_id is not None:
+            query += f'&chat_id={chat_id}'
+        return self._call(f'/_control/wait?{query}', timeout=timeout + 5)['ok']
+
+    def stats(self):
+        return self._call('/_control/stats')
+
+    def wait_for_calls(self, method, count, timeout=120, interval=0.05):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.count_calls(method) >= count:
+                return True
+            time.sleep(interval)
+        return False
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--rate-limits', action='store_true')
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(args.host, args.port, args.delay, rate_limits=args.rate_limits)
+    host, port = api.httpd.server_address[:2]
+    print(f"http://{host}:{port}", flush=True)
+    api.httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
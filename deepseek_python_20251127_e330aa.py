@@ -3,12 +3,35 @@ import requests
 import json
 import os
 import logging
+import logging.handlers
 import sqlite3
-import tempfile
+import io
+import copy
+import zipfile
 import random
 import time
 import re
 import threading
+import queue
+import atexit
+import itertools
+import operator
+import hashlib
+import unicodedata
+import sys
+import hmac
+import bisect
+import zlib
+import secrets
+import asyncio
+import signal
+import socket
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import parsedate_to_datetime
+from array import array
+from collections import deque, OrderedDict
+from contextlib import closing, nullcontext
 from datetime import datetime, timedelta
 from telebot.types import (
     InlineKeyboardMarkup, 
@@ -16,19 +39,20 @@ from telebot.types import (
     ReplyKeyboardMarkup,
     InputFile
 )
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-# 🎯 إعداد احترافي للتسجيل
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)-20s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler('ai_creator.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, FIRST_EXCEPTION
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+try:
+    import zstandard
+except ImportError:  # ضغط zstd اختياري؛ zlib هو الافتراضي
+    zstandard = None
+
+try:
+    from telebot.async_telebot import AsyncTeleBot
+except ImportError:  # وضع asyncio اختياري (يتطلب aiohttp)
+    AsyncTeleBot = None
 
 # 🔧 إعدادات متقدمة
 class Config:
@@ -43,137 +67,2461 @@ class Config:
     REQUEST_TIMEOUT = 60
     MAX_RETRIES = 3
     RATE_LIMIT_PER_USER = 10  # طلبات لكل مستخدم في الساعة
+    SESSION_TTL = 30 * 60  # انتهاء الجلسات الخاملة (ثوانٍ)
+    MAX_SESSIONS = 100000  # الحد الأقصى للجلسات في الذاكرة (طرد LRU)
+    SESSION_LOCK_STRIPES = 32  # عدد الأقفال المقسّمة حسب user_id
+    SESSION_SWEEP_INTERVAL = 60  # فاصل تنظيف الجلسات المنتهية (ثوانٍ)
+    SNAPSHOT_ENABLED = True  # حفظ الجلسات ومهام الإنشاء في SQLite لإعادة تشغيل دافئة
+    SNAPSHOT_INTERVAL = 30  # فاصل حفظ الجلسات المتغيرة (ثوانٍ)
+    KEY_REQUESTS_PER_MIN = 60  # حد الطلبات لكل مفتاح API في الدقيقة
+    KEY_TOKENS_PER_MIN = 200000  # حد الرموز (tokens) لكل مفتاح API في الدقيقة
+    STREAM_RESPONSES = True  # استقبال الاستجابة بشكل متدفق (SSE)
+    PROGRESS_EDIT_INTERVAL = 2.0  # أقل فاصل (ثوانٍ) بين تعديلات رسالة التقدم
+    EXPECTED_RESPONSE_CHARS = 14000  # الحجم المتوقع تقريباً لاستجابة كاملة
+    GENERATION_WORKERS_PER_KEY = 2  # عدد مهام الإنشاء المتزامنة لكل مفتاح API
+    MAX_QUEUED_JOBS = 200  # الحد الأقصى لمهام الإنشاء المنتظرة
+    MAX_QUEUED_JOBS_PER_USER = 2
+    DELIVERY_MODE = 'zip'  # zip: أرشيف واحد | files: ملف لكل جزء
+    FILE_SEND_INTERVAL = 1.0  # فاصل الإرسال بين الملفات في وضع files (ثوانٍ)
+    TELEGRAM_MAX_RETRIES = 5  # إعادة محاولات استدعاء Telegram بعد رد 429
+    TELEGRAM_MAX_RETRY_AFTER = 60  # أقصى انتظار (ثوانٍ) لقيمة retry_after قبل التخلي
+    CACHE_ENABLED = True
+    CACHE_TTL = 24 * 3600  # صلاحية المشروع المخزّن (ثوانٍ)
+    CACHE_MEMORY_ENTRIES = 128  # عدد المشاريع في ذاكرة LRU
+    CACHE_MAX_ENTRIES = 5000  # الحد الأقصى للمشاريع في جدول التخزين
+    CACHE_PRUNE_EVERY = 100  # تنظيف الجدول بعد كل هذا العدد من الإضافات
+    SIMILAR_ENABLED = True  # اقتراح مشروع سابق بوصف شبه مطابق قبل الإنشاء
+    SIMILAR_THRESHOLD = 0.5  # أدنى تشابه (Jaccard مقدّر لمقاطع الأحرف) لعرض الاقتراح
+    SIMILAR_SHINGLE_SIZE = 3  # طول مقاطع الأحرف في الوصف الموحد
+    SIMILAR_BANDS = 20  # عدد نطاقات LSH (خانات MinHash = النطاقات × الصفوف)
+    SIMILAR_ROWS = 3  # خانات MinHash في كل نطاق
+    SIMILAR_MAX_CANDIDATES = 50  # أقصى عدد مرشحين تُقارن توقيعاتهم (الأحدث أولاً)
+    KEY_HEALTH_WINDOW = 20  # عدد آخر الطلبات المستخدمة لحساب معدل الأخطاء
+    KEY_MIN_SAMPLES = 5  # أقل عدد طلبات قبل الحكم بمعدل الأخطاء
+    KEY_FAILURE_THRESHOLD = 3  # أخطاء متتالية تفتح الدائرة
+    KEY_ERROR_RATE_THRESHOLD = 0.5
+    KEY_COOLDOWN = 30  # مهلة الدائرة المفتوحة قبل تجربة المفتاح (ثوانٍ)
+    KEY_MAX_COOLDOWN = 600
+    KEY_LATENCY_ALPHA = 0.2  # معامل المتوسط المتحرك لزمن الاستجابة
+    KEY_MAX_WAIT = 30  # أقصى انتظار لتوفر مفتاح قبل الفشل (ثوانٍ)
+    RETRY_BACKOFF_BASE = 1.0
+    RETRY_BACKOFF_CAP = 20.0
+    GENERATION_MODE = 'single'  # single: طلب واحد للمشروع | split: مواصفات ثم html/css/js بالتوازي
+    SPLIT_MAX_TOKENS = {'spec': 800, 'html': 2500, 'css': 2000, 'js': 1500}
+    SPLIT_MIN_SELECTOR_COVERAGE = 0.5  # أقل نسبة من محددات CSS الموجودة في HTML/JS
+    HEDGE_ENABLED = False  # طلب احتياطي على مفتاح آخر إذا تأخر أول بايت (يزيد تكلفة الطلبات المتأخرة)
+    HEDGE_PERCENTILE = 0.95  # العتبة: هذا المئين من زمن أول بايت في الطلبات الأخيرة
+    HEDGE_MIN_DELAY = 1.0  # أقل عتبة (ثوانٍ)
+    HEDGE_INITIAL_DELAY = 10.0  # العتبة قبل جمع عينات كافية (ثوانٍ)
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_WINDOW = 200  # عدد الطلبات الأخيرة لحساب العتبة والميزانية
+    HEDGE_BUDGET = 0.1  # أقصى نسبة من الطلبات يُرسل لها طلب احتياطي
+    HTTP_POOL_SIZE = 10  # عدد الاتصالات المفتوحة لكل مفتاح API
+    HTTP_CONNECT_RETRIES = 2  # إعادة المحاولة على مستوى النقل (أخطاء الاتصال فقط)
+    HTTP_RETRY_BACKOFF = 0.3
+    DB_PATH = 'ai_creator.db'
+    UPDATE_MODE = 'polling'  # polling | webhook
+    RUNTIME = 'threaded'  # threaded | asyncio: استقبال التحديثات عبر AsyncTeleBot (يتطلب aiohttp؛ polling فقط)
+    BOT_WORKER_THREADS = 8  # عمال معالجة التحديثات
+    WEBHOOK_URL = ""  # العنوان العام (https://example.com)؛ فارغ = خادم محلي دون تسجيل
+    WEBHOOK_LISTEN = '0.0.0.0'
+    WEBHOOK_PORT = 8443
+    WEBHOOK_PATH = '/telegram/webhook'
+    WEBHOOK_SECRET = ""  # فارغ = يُولَّد عند التسجيل
+    WEBHOOK_MAX_CONNECTIONS = 40
+    WEBHOOK_MAX_BODY = 1024 * 1024
+    DB_WRITE_QUEUE_SIZE = 10000  # الحد الأقصى للعمليات المنتظرة في طابور الكتابة
+    DB_WRITE_BATCH_SIZE = 500  # عدد العمليات في المعاملة الواحدة
+    DB_WRITE_FLUSH_INTERVAL = 0.05  # مهلة تجميع العمليات قبل الكتابة (ثوانٍ)
+    PROJECT_COMPRESSION = 'zlib'  # zlib | zstd (يتطلب zstandard)
+    PROJECT_COMPRESSION_LEVEL = 6
+    PROJECTS_PAGE_SIZE = 5  # عدد المشاريع في صفحة "مشاريعي"
+    METRICS_ENABLED = True
+    METRICS_LISTEN = '127.0.0.1'  # المقاييس للمراقبة المحلية فقط
+    METRICS_PORT = 9464
+    LOG_FILE = 'ai_creator.log'
+    LOG_LEVEL = 'INFO'
+    LOG_FORMAT = 'text'  # text | json (سطر JSON لكل سجل مع user_id و job_id)
+    LOG_ROTATION = 'size'  # size | time
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # حجم الملف قبل التدوير (size)
+    LOG_ROTATE_WHEN = 'midnight'  # موعد التدوير (time)
+    LOG_BACKUP_COUNT = 5  # عدد الملفات القديمة المحفوظة
+    LOG_QUEUE_SIZE = 10000  # السجلات المنتظرة قبل الإسقاط؛ المستدعي لا ينتظر الكتابة أبداً
+    LOG_ACTIVITY_SAMPLE_RATE = 1.0  # نسبة أحداث النشاط المسجلة (0.1 = عُشرها)
+
+# 🎯 إعداد احترافي للتسجيل: طابور غير حاجب وخيط كتابة واحد مع تدوير الملف
+log_context = contextvars.ContextVar('log_context', default={})
+
+class LogContextFilter(logging.Filter):
+    """إضافة user_id و job_id من سياق المهمة الجارية (أو من extra) لكل سجل"""
+    
+    def filter(self, record):
+        context = log_context.get()
+        for field in ('user_id', 'job_id'):
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler بطابور محدود: عند امتلائه يُسقط السجل ويُحصى بدلاً من حجب المستدعي"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # دمج الوسائط فقط؛ التنسيق الكامل والتتبع (exc_info) يبقيان لخيط الكتابة
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JSONLinesFormatter(logging.Formatter):
+    """سطر JSON لكل سجل مع الحقول المنظمة"""
+    
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'user_id': getattr(record, 'user_id', None),
+            'job_id': getattr(record, 'job_id', None),
+        }
+        if getattr(record, 'event', None):
+            entry['event'] = record.event
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def configure_logging():
+    """تهيئة التسجيل: المستدعي يضع السجل في طابور فقط، و QueueListener يكتب الملف والطرفية"""
+    if Config.LOG_ROTATION == 'time':
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            Config.LOG_FILE, when=Config.LOG_ROTATE_WHEN, backupCount=Config.LOG_BACKUP_COUNT, encoding='utf-8')
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            Config.LOG_FILE, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT, encoding='utf-8')
+    
+    text_formatter = logging.Formatter(
+        '%(asctime)s | %(levelname)-8s | %(name)-20s | %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    file_handler.setFormatter(
+        JSONLinesFormatter(datefmt='%Y-%m-%dT%H:%M:%S') if Config.LOG_FORMAT == 'json' else text_formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(text_formatter)
+    
+    queue_handler = BoundedQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(LogContextFilter())
+    root = logging.getLogger()
+    root.setLevel(Config.LOG_LEVEL)
+    root.addHandler(queue_handler)
+    
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)  # يُفرغ الطابور عند الإيقاف
+    return queue_handler
+
+log_handler = configure_logging()
+logger = logging.getLogger(__name__)
 
 # 🚀 تهيئة البوت مع إعدادات متقدمة
-bot = telebot.TeleBot(Config.BOT_TOKEN, parse_mode="HTML")
+bot = telebot.TeleBot(Config.BOT_TOKEN, parse_mode="HTML", num_threads=Config.BOT_WORKER_THREADS)
+
+# 📈 نظام المقاييس (صيغة Prometheus النصية)
+class _Metric:
+    """أساس المقاييس: قيم منفصلة لكل مجموعة قيم تسميات (labels)"""
+    
+    metric_type = 'untyped'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{self._escape(value)}"' for name, value in pairs) + '}'
+    
+    @staticmethod
+    def _escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self.lock:
+            samples = list(self.values.items())
+        for key, value in samples:
+            lines.extend(self._render_sample(key, value))
+        return lines
+    
+    def _render_sample(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+class Counter(_Metric):
+    metric_type = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = None
+    
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+    
+    def set_function(self, function):
+        """قراءة القيمة عند التصدير فقط (مثل عمق الطابور)؛ مع التسميات ترجع الدالة {قيم التسميات: القيمة}"""
+        self.function = function
+    
+    def render(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.warning("Gauge %s callback failed: %s", self.name, e)
+                value = {} if self.labelnames else float('nan')
+            if self.labelnames:
+                value = {
+                    tuple(map(str, key if isinstance(key, tuple) else (key,))): sample
+                    for key, sample in value.items()
+                }
+            with self.lock:
+                if self.labelnames:
+                    self.values = value
+                else:
+                    self.values[()] = value
+        return super().render()
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def time(self, **labels):
+        """مدير سياق يقيس زمن الكتلة: with histogram.time(phase='x'): ..."""
+        return _HistogramTimer(self, labels)
+    
+    def _render_sample(self, key, value):
+        counts, total, count = value[0][:], value[1], value[2]
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+class _HistogramTimer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class MetricsRegistry:
+    """سجل المقاييس داخل العملية وتصديرها بصيغة Prometheus"""
+    
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=None):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def _register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+class AppMetrics:
+    """المقاييس المستخدمة في مسار الإنشاء"""
+    
+    def __init__(self, registry):
+        self.upstream_latency = registry.histogram(
+            'deepseek_request_duration_seconds', 'DeepSeek chat/completions latency per key', ('key', 'status'))
+        self.upstream_retries = registry.counter(
+            'deepseek_retries_total', 'Failed DeepSeek attempts that led to a retry or give-up', ('reason',))
+        self.json_extractions = registry.counter(
+            'json_extraction_total', 'Project JSON extraction outcomes', ('result',))
+        self.phase_latency = registry.histogram(
+            'generation_phase_duration_seconds', 'Duration of each generation pipeline phase', ('phase',))
+        self.queue_depth = registry.gauge('generation_queue_depth', 'Generation jobs waiting in the queue')
+        self.jobs_running = registry.gauge('generation_jobs_running', 'Generation jobs currently running')
+        self.telegram_latency = registry.histogram(
+            'telegram_request_duration_seconds', 'Telegram Bot API call latency', ('method',))
+        self.telegram_errors = registry.counter(
+            'telegram_request_errors_total', 'Telegram Bot API calls that raised', ('method',))
+        self.telegram_retries = registry.counter(
+            'telegram_rate_limited_total', 'Telegram Bot API calls retried after a 429', ('method',))
+        self.db_batch_latency = registry.histogram(
+            'db_write_batch_duration_seconds', 'Write-behind transaction duration')
+        self.db_write_lag = registry.histogram(
+            'db_write_lag_seconds', 'Delay between enqueueing a DB write and its commit')
+        self.db_queue_depth = registry.gauge('db_write_queue_depth', 'Writes waiting in the write-behind queue')
+        self.db_writes = registry.counter('db_writes_total', 'Write-behind operations by outcome', ('result',))
+        self.hedged_requests = registry.counter(
+            'deepseek_hedged_requests_total', 'Hedging decisions and which request won', ('outcome',))
+        self.hedge_delay = registry.gauge('deepseek_hedge_delay_seconds', 'Current adaptive hedging threshold')
+        self.upstream_tokens = registry.counter(
+            'deepseek_tokens_total', 'Tokens reported in DeepSeek usage (prompt, cached prompt, completion)', ('kind',))
+        self.coalesced_requests = registry.counter(
+            'generation_coalesced_total',
+            'Generation requests served by an identical in-flight request (upstream calls saved)', ('source',))
+        self.flights_in_progress = registry.gauge(
+            'generation_flights_in_progress', 'Distinct generation requests currently queued or running')
+        self.split_generations = registry.counter(
+            'split_generations_total', 'Split (spec + parallel artifacts) generation outcomes', ('result',))
+        self.similar_lookups = registry.counter(
+            'similar_project_lookups_total', 'Near-duplicate description lookups by outcome', ('result',))
+        self.similar_choices = registry.counter(
+            'similar_project_choices_total', 'User choice after a similar project was offered', ('choice',))
+        self.warm_restarts = registry.counter(
+            'warm_restart_restored_total',
+            'Sessions and generation jobs restored from the last snapshot (session, redelivered, resubmitted)',
+            ('kind',))
+        self.log_records_dropped = registry.gauge(
+            'log_records_dropped', 'Log records dropped because the logging queue was full')
+        self.generation_cache_stats = registry.gauge(
+            'generation_cache_stats',
+            'Generation cache counters since start (hits, memory_hits, misses, evictions, expired) and memory_size',
+            ('stat',))
+        self.session_stats = registry.gauge(
+            'session_store_stats',
+            'In-memory session stores: entries, approx_memory_bytes and lock acquisitions/contention/expiry/eviction',
+            ('store', 'stat'))
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+class MetricsServer:
+    """خادم HTTP صغير يعرض /metrics"""
+    
+    def __init__(self, registry, host, port):
+        self.registry = registry
+        self.httpd = _MetricsHTTPServer((host, port), self._make_handler())
+    
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+    
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def _make_handler(self):
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+metrics_registry = MetricsRegistry()
+app_metrics = AppMetrics(metrics_registry)
+app_metrics.log_records_dropped.set_function(lambda: log_handler.dropped)
+
+_telegram_sessions = threading.local()
+
+def timed_telegram_request(method, url, **kwargs):
+    """مرسل طلبات Telegram (apihelper.CUSTOM_REQUEST_SENDER) يقيس زمن كل استدعاء"""
+    session = getattr(_telegram_sessions, 'session', None)
+    if session is None:
+        session = _telegram_sessions.session = requests.Session()
+    
+    api_method = url.rsplit('/', 1)[-1]
+    start = time.perf_counter()
+    try:
+        return session.request(method, url, **kwargs)
+    except Exception:
+        app_metrics.telegram_errors.inc(method=api_method)
+        raise
+    finally:
+        app_metrics.telegram_latency.observe(time.perf_counter() - start, method=api_method)
+
+if Config.METRICS_ENABLED:
+    telebot.apihelper.CUSTOM_REQUEST_SENDER = timed_telegram_request
+
+def instrument_async_telegram():
+    """قياس استدعاءات AsyncTeleBot بتغليف asyncio_helper._process_request (لا يوفر مرسلاً مخصصاً)"""
+    from telebot import asyncio_helper
+    process_request = asyncio_helper._process_request
+    
+    async def timed_process_request(token, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await process_request(token, url, *args, **kwargs)
+        except Exception:
+            app_metrics.telegram_errors.inc(method=url)
+            raise
+        finally:
+            app_metrics.telegram_latency.observe(time.perf_counter() - start, method=url)
+    
+    asyncio_helper._process_request = timed_process_request
+
+def telegram_retry(api_call, *args, **kwargs):
+    """استدعاء Telegram مع الانتظار وإعادة المحاولة عند 429 حسب parameters.retry_after"""
+    for attempt in range(Config.TELEGRAM_MAX_RETRIES + 1):
+        try:
+            return api_call(*args, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e:
+            if e.error_code != 429 or attempt == Config.TELEGRAM_MAX_RETRIES:
+                raise
+            retry_after = (e.result_json or {}).get('parameters', {}).get('retry_after', 1)
+            if retry_after > Config.TELEGRAM_MAX_RETRY_AFTER:
+                raise
+            app_metrics.telegram_retries.inc(method=api_call.__name__)
+            time.sleep(retry_after)
+            # إعادة الملفات المرفوعة لبدايتها: المحاولة الفاشلة قرأتها
+            for arg in args:
+                if hasattr(arg, 'seek'):
+                    arg.seek(0)
+
+# ⏱️ نظام تحديد المعدل
+class TokenBucketLimiter:
+    """محدد معدل token bucket: ذاكرة ثابتة ووقت ثابت لكل فحص"""
+    
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.clock = clock
+        self.buckets = {}  # key -> [tokens, last_refill]
+        self.lock = threading.Lock()
+    
+    def try_acquire(self, key, cost=1):
+        """استهلاك cost من رصيد المفتاح إن توفر"""
+        with self.lock:
+            bucket = self._refill(key, self.clock())
+            if bucket[0] < cost:
+                return False
+            bucket[0] -= cost
+            return True
+    
+    def time_until(self, key, cost=1):
+        """الوقت اللازم حتى يتوفر رصيد cost (صفر إذا كان متوفراً الآن)"""
+        with self.lock:
+            bucket = self._refill(key, self.clock())
+            return self._wait_for(bucket, cost)
+    
+    def consume(self, key, cost=1):
+        """خصم الرصيد دون فحص (قد يصبح سالباً لتعويض استهلاك فعلي أكبر)"""
+        with self.lock:
+            bucket = self._refill(key, self.clock())
+            bucket[0] -= cost
+    
+    def refund(self, key, cost=1):
+        """إعادة رصيد محجوز دون تجاوز السعة"""
+        with self.lock:
+            bucket = self._refill(key, self.clock())
+            bucket[0] = min(self.capacity, bucket[0] + cost)
+    
+    def peek(self, key):
+        """الرصيد الحالي دون استهلاك، أو None إذا لم يكن للمفتاح سجل"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                return None
+            return min(self.capacity, bucket[0] + max(0.0, self.clock() - bucket[1]) * self.refill_per_second)
+    
+    def seed(self, key, tokens):
+        """زرع رصيد مستعاد ما لم يكن للمفتاح سجل بالفعل"""
+        with self.lock:
+            self.buckets.setdefault(key, [min(self.capacity, tokens), self.clock()])
+    
+    def prune(self):
+        """حذف الأرصدة الممتلئة: رصيد ممتلئ يكافئ عدم وجود سجل"""
+        now = self.clock()
+        with self.lock:
+            full = [
+                key for key, (tokens, last) in self.buckets.items()
+                if tokens + (now - last) * self.refill_per_second >= self.capacity
+            ]
+            for key in full:
+                del self.buckets[key]
+            return len(full)
+    
+    def _wait_for(self, bucket, cost):
+        missing = min(cost, self.capacity) - bucket[0]
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_per_second
+    
+    def _refill(self, key, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.capacity, now]
+            return bucket
+        elapsed = now - bucket[1]
+        if elapsed > 0:
+            bucket[0] = min(self.capacity, bucket[0] + elapsed * self.refill_per_second)
+            bucket[1] = now
+        return bucket
+
+class UpstreamKeyLimiter:
+    """حدود المعدل لكل مفتاح API: طلبات/دقيقة ورموز/دقيقة معاً"""
+    
+    def __init__(self, requests_per_min=None, tokens_per_min=None, clock=time.monotonic):
+        requests_per_min = requests_per_min or Config.KEY_REQUESTS_PER_MIN
+        tokens_per_min = tokens_per_min or Config.KEY_TOKENS_PER_MIN
+        self.requests = TokenBucketLimiter(requests_per_min, requests_per_min / 60, clock)
+        self.tokens = TokenBucketLimiter(tokens_per_min, tokens_per_min / 60, clock)
+        self.lock = threading.Lock()
+    
+    def time_until(self, key, tokens):
+        return max(self.requests.time_until(key, 1), self.tokens.time_until(key, tokens))
+    
+    def try_acquire(self, key, tokens):
+        """حجز طلب واحد وعدد الرموز المقدّر، أو لا شيء"""
+        with self.lock:
+            if self.time_until(key, tokens) > 0:
+                return False
+            self.requests.consume(key, 1)
+            self.tokens.consume(key, tokens)
+            return True
+    
+    def refund(self, key, tokens):
+        """إعادة حجز طلب لم يُستهلك (مثل الطلب الاحتياطي الخاسر)"""
+        with self.lock:
+            self.requests.refund(key, 1)
+            self.tokens.refund(key, tokens)
 
 # 🏗️ نظام إدارة الحالة المتقدم
+class StripedTTLMap:
+    """قاموس مقسّم على عدة أقفال حسب المفتاح، مع انتهاء صلاحية للخامل وطرد LRU"""
+    
+    def __init__(self, ttl, max_entries, stripes=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.stripe_count = stripes or Config.SESSION_LOCK_STRIPES
+        self.stripe_capacity = max(1, max_entries // self.stripe_count)
+        self.clock = clock
+        self.stripes = [OrderedDict() for _ in range(self.stripe_count)]  # key -> (value, expires_at)
+        self.locks = [threading.Lock() for _ in range(self.stripe_count)]
+        self.counters = [
+            {'acquisitions': 0, 'contended': 0, 'expired': 0, 'evicted': 0}
+            for _ in range(self.stripe_count)
+        ]
+    
+    def get(self, key, default=None):
+        index = hash(key) % self.stripe_count
+        with self._locked(index):
+            stripe = self.stripes[index]
+            entry = stripe.get(key)
+            if entry is None:
+                return default
+            now = self.clock()
+            if entry[1] <= now:
+                del stripe[key]
+                self.counters[index]['expired'] += 1
+                return default
+            # الوصول يجدد الصلاحية ويجعل المدخل الأحدث استخداماً
+            stripe[key] = (entry[0], now + self.ttl)
+            stripe.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value, ttl=None):
+        index = hash(key) % self.stripe_count
+        with self._locked(index):
+            stripe = self.stripes[index]
+            stripe[key] = (value, self.clock() + (self.ttl if ttl is None else ttl))
+            stripe.move_to_end(key)
+            while len(stripe) > self.stripe_capacity:
+                stripe.popitem(last=False)
+                self.counters[index]['evicted'] += 1
+    
+    def peek(self, key):
+        """(القيمة، الصلاحية المتبقية) دون تجديد الصلاحية أو ترتيب LRU، أو None"""
+        index = hash(key) % self.stripe_count
+        with self._locked(index):
+            entry = self.stripes[index].get(key)
+        if entry is None:
+            return None
+        remaining = entry[1] - self.clock()
+        return (entry[0], remaining) if remaining > 0 else None
+    
+    def pop(self, key, default=None):
+        index = hash(key) % self.stripe_count
+        with self._locked(index):
+            entry = self.stripes[index].pop(key, None)
+            return default if entry is None else entry[0]
+    
+    def sweep(self):
+        """حذف المدخلات المنتهية؛ ترتيب LRU يجعلها في بداية كل قسم"""
+        removed = 0
+        for index in range(self.stripe_count):
+            with self._locked(index):
+                stripe = self.stripes[index]
+                now = self.clock()
+                while stripe:
+                    key, (_, expires_at) = next(iter(stripe.items()))
+                    if expires_at > now:
+                        break
+                    del stripe[key]
+                    self.counters[index]['expired'] += 1
+                    removed += 1
+        return removed
+    
+    def __len__(self):
+        return sum(len(stripe) for stripe in self.stripes)
+    
+    def metrics(self):
+        """إحصاءات الحجم والذاكرة التقريبية والتنافس على الأقفال"""
+        totals = {'acquisitions': 0, 'contended': 0, 'expired': 0, 'evicted': 0}
+        memory = 0
+        entries = 0
+        for index in range(self.stripe_count):
+            with self._locked(index):
+                for name, value in self.counters[index].items():
+                    totals[name] += value
+                stripe = self.stripes[index]
+                entries += len(stripe)
+                memory += sys.getsizeof(stripe)
+                for value, _ in stripe.values():
+                    memory += sys.getsizeof(value)
+        totals['entries'] = entries
+        totals['approx_memory_bytes'] = memory
+        return totals
+    
+    def _locked(self, index):
+        lock = self.locks[index]
+        if not lock.acquire(blocking=False):
+            lock.acquire()
+            self.counters[index]['contended'] += 1
+        self.counters[index]['acquisitions'] += 1
+        return _HeldLock(lock)
+
+class _HeldLock:
+    """قفل محجوز مسبقاً يُحرَّر عند الخروج من with"""
+    
+    __slots__ = ('lock',)
+    
+    def __init__(self, lock):
+        self.lock = lock
+    
+    def __enter__(self):
+        return self.lock
+    
+    def __exit__(self, *exc):
+        self.lock.release()
+
 class StateManager:
     def __init__(self):
-        self.user_states = {}
-        self.user_projects = {}
-        self.rate_limits = {}
-        self.api_stats = {}
-        self.lock = threading.RLock()
+        self.user_states = StripedTTLMap(Config.SESSION_TTL, Config.MAX_SESSIONS)
+        self.user_projects = StripedTTLMap(Config.SESSION_TTL, Config.MAX_SESSIONS)
+        self.rate_limits = TokenBucketLimiter(Config.RATE_LIMIT_PER_USER, Config.RATE_LIMIT_PER_USER / 3600)
+        self.api_stats = StripedTTLMap(Config.SESSION_TTL, Config.MAX_SESSIONS)
+        self.dirty = set()  # مستخدمون تغيرت جلساتهم أو أرصدتهم منذ آخر لقطة
+        self.dirty_lock = threading.Lock()
+        self.sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+        self.sweeper.start()
         
     def set_user_state(self, user_id, state_data):
+        self.user_states.set(user_id, {
+            **state_data,
+            'timestamp': datetime.now(),
+            'retry_count': 0
+        })
+        self.mark_dirty(user_id)
+    
+    def get_user_state(self, user_id):
+        return self.user_states.get(user_id)
+    
+    def clear_user_state(self, user_id):
+        self.user_states.pop(user_id)
+        self.mark_dirty(user_id)
+    
+    def check_rate_limit(self, user_id):
+        allowed = self.rate_limits.try_acquire(user_id)
+        self.mark_dirty(user_id)
+        return allowed
+    
+    def mark_dirty(self, user_id):
+        with self.dirty_lock:
+            self.dirty.add(user_id)
+    
+    def take_dirty(self):
+        """المستخدمون المتغيرون منذ آخر استدعاء؛ ما يتغير بعده يبقى للقطة التالية"""
+        with self.dirty_lock:
+            dirty, self.dirty = self.dirty, set()
+        return dirty
+    
+    def restore(self, user_id, state, ttl, tokens):
+        """إعادة جلسة ورصيد من لقطة عند الإقلاع"""
+        if tokens is not None:
+            self.rate_limits.seed(user_id, tokens)
+        if state is not None:
+            self.user_states.set(user_id, state, ttl)
+    
+    def sweep(self):
+        """تنظيف الجلسات الخاملة وأرصدة المعدل الممتلئة"""
+        expired = self.user_states.sweep() + self.user_projects.sweep() + self.api_stats.sweep()
+        pruned = self.rate_limits.prune()
+        if expired or pruned:
+            logger.info("Session sweep: %s expired entries, %s idle rate-limit buckets", expired, pruned)
+    
+    def get_metrics(self):
+        """حجم الجلسات والذاكرة التقريبية والتنافس على الأقفال"""
+        return {
+            'user_states': self.user_states.metrics(),
+            'user_projects': self.user_projects.metrics(),
+            'api_stats': self.api_stats.metrics(),
+            'rate_limits': {'entries': len(self.rate_limits.buckets)}
+        }
+    
+    def _sweep_loop(self):
+        while True:
+            time.sleep(Config.SESSION_SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Session sweep failed: %s", e)
+
+state_manager = StateManager()
+app_metrics.session_stats.set_function(lambda: {
+    (store, stat): value
+    for store, stats in state_manager.get_metrics().items()
+    for stat, value in stats.items()
+})
+
+# 🗄️ نظام قاعدة البيانات المتقدم
+class WriteBehindWriter:
+    """كاتب خلفي: خيط واحد يملك اتصال WAL ويكتب العمليات على دفعات"""
+    
+    _STOP = object()
+    
+    def __init__(self, db_path, max_queue=None, batch_size=None, flush_interval=None):
+        self.db_path = db_path
+        self.batch_size = batch_size or Config.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.DB_WRITE_FLUSH_INTERVAL
+        self.queue = queue.Queue(maxsize=max_queue or Config.DB_WRITE_QUEUE_SIZE)
+        self.stats = {'enqueued': 0, 'written': 0, 'failed': 0, 'dropped': 0, 'batches': 0}
+        self.stats_lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+    
+    def execute(self, sql, params=()):
+        """إضافة عملية كتابة إلى الطابور دون انتظار؛ sql قد تكون دالة تُستدعى بـ (conn, *params)"""
+        if self.closed:
+            logger.warning("Write-behind writer is closed, dropping write")
+            self._count('dropped')
+            return False
+        
+        try:
+            self.queue.put_nowait((sql, params, time.monotonic()))
+            self._count('enqueued')
+            return True
+        except queue.Full:
+            self._count('dropped')
+            logger.warning("DB write queue full (%s), dropping write", self.queue.maxsize)
+            return False
+    
+    def flush(self, timeout=None):
+        """الانتظار حتى تُكتب جميع العمليات المضافة قبل هذا الاستدعاء"""
+        if not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self, timeout=10):
+        """كتابة كل ما في الطابور ثم إيقاف الخيط"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join(timeout)
+    
+    def _count(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+        if name in ('written', 'failed', 'dropped'):
+            app_metrics.db_writes.inc(amount, result=name)
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _collect_batch(self):
+        """تجميع دفعة: انتظار أول عنصر ثم سحب ما يصل خلال مهلة التجميع"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self.queue.get(timeout=remaining)
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is self._STOP or isinstance(item, threading.Event):
+                break
+        
+        return batch
+    
+    def _run(self):
+        conn = self._connect()
+        running = True
+        
+        while running:
+            batch = self._collect_batch()
+            markers = []
+            enqueued_at = []
+            written = 0
+            started = time.perf_counter()
+            
+            # كتابة الدفعة كاملة في معاملة واحدة (group commit)
+            try:
+                with conn:
+                    for item in batch:
+                        if item is self._STOP:
+                            running = False
+                        elif isinstance(item, threading.Event):
+                            markers.append(item)
+                        else:
+                            sql, params, queued_at = item
+                            enqueued_at.append(queued_at)
+                            try:
+                                if callable(sql):
+                                    sql(conn, *params)
+                                else:
+                                    conn.execute(sql, params)
+                                written += 1
+                            except sqlite3.Error as e:
+                                self._count('failed')
+                                logger.error("DB write failed: %s", e)
+                self._count('written', written)
+                self._count('batches')
+                committed = time.monotonic()
+                app_metrics.db_batch_latency.observe(time.perf_counter() - started)
+                for queued_at in enqueued_at:
+                    app_metrics.db_write_lag.observe(committed - queued_at)
+            except sqlite3.Error as e:
+                self._count('failed', written)
+                logger.error("DB batch commit failed: %s", e)
+            
+            for marker in markers:
+                marker.set()
+        
+        conn.close()
+
+class DatabaseManager:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.DB_PATH
+        self.local = threading.local()
+        self.init_db()
+        self.writer = WriteBehindWriter(self.db_path)
+    
+    def init_db(self):
+        # "with conn" يثبت المعاملة فقط؛ closing يغلق الاتصال حتى لا يبقى قفل على الملف
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                full_name TEXT,
+                language_code TEXT,
+                created_at TEXT,
+                last_active TEXT,
+                request_count INTEGER DEFAULT 0
+            )''')
+            
+            conn.execute('''CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                project_type TEXT,
+                description TEXT,
+                requirements TEXT,
+                project_data TEXT,
+                status TEXT,
+                quality_score INTEGER,
+                created_at TEXT,
+                updated_at TEXT,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )''')
+            
+            conn.execute('''CREATE TABLE IF NOT EXISTS api_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                api_key TEXT,
+                user_id INTEGER,
+                endpoint TEXT,
+                status_code INTEGER,
+                response_time REAL,
+                tokens_used INTEGER,
+                created_at TEXT
+            )''')
+            
+            conn.execute('''CREATE TABLE IF NOT EXISTS error_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                error_type TEXT,
+                error_message TEXT,
+                stack_trace TEXT,
+                created_at TEXT
+            )''')
+            
+            conn.execute('''CREATE TABLE IF NOT EXISTS generation_cache (
+                cache_key TEXT PRIMARY KEY,
+                project_data TEXT,
+                created_at REAL,
+                last_access REAL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_generation_cache_access ON generation_cache (last_access)')
+            
+            # محتوى المشاريع مضغوطاً ومرة واحدة لكل محتوى (sha256)
+            conn.execute('''CREATE TABLE IF NOT EXISTS project_blobs (
+                blob_hash TEXT PRIMARY KEY,
+                codec TEXT,
+                data BLOB,
+                raw_size INTEGER,
+                created_at TEXT
+            )''')
+            
+            project_columns = {row[1] for row in conn.execute('PRAGMA table_info(projects)')}
+            if 'blob_hash' not in project_columns:
+                conn.execute('ALTER TABLE projects ADD COLUMN blob_hash TEXT')
+            
+            # فهرس الأوصاف المتشابهة: توقيع MinHash لكل محتوى ونطاقات LSH لكل نوع مشروع
+            conn.execute('''CREATE TABLE IF NOT EXISTS description_signatures (
+                project_id INTEGER PRIMARY KEY,
+                project_type TEXT,
+                blob_hash TEXT UNIQUE,
+                signature BLOB
+            )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS description_lsh (
+                project_type TEXT,
+                bucket INTEGER,
+                project_id INTEGER,
+                PRIMARY KEY (project_type, bucket, project_id)
+            ) WITHOUT ROWID''')
+            
+            # رموز المدخلات المخدومة من ذاكرة البادئة لدى DeepSeek (usage)
+            usage_columns = {row[1] for row in conn.execute('PRAGMA table_info(api_usage)')}
+            if 'cached_tokens' not in usage_columns:
+                conn.execute('ALTER TABLE api_usage ADD COLUMN cached_tokens INTEGER DEFAULT 0')
+            
+            # فهرس يغطي عرض "مشاريعي" دون قراءة الصفوف
+            conn.execute('''CREATE INDEX IF NOT EXISTS idx_projects_user_listing
+                            ON projects (user_id, id DESC, project_type, quality_score, created_at)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_created ON projects (created_at)')
+            
+            # إحصائيات مجمّعة لكل مستخدم تُحدَّث مع كل إدراج (قراءة بمفتاح أساسي واحد)
+            has_user_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+            ).fetchone()
+            conn.execute('''CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INTEGER PRIMARY KEY,
+                project_count INTEGER DEFAULT 0,
+                quality_sum INTEGER DEFAULT 0,
+                type_counts TEXT DEFAULT '{}',
+                api_calls INTEGER DEFAULT 0,
+                tokens_total INTEGER DEFAULT 0,
+                latency_sum REAL DEFAULT 0
+            )''')
+            if not has_user_stats:
+                self.backfill_user_stats(conn)
+            
+            # لقطات الجلسات وأرصدة المعدل، ومهام الإنشاء غير المسلّمة واستجاباتها (إعادة تشغيل دافئة)
+            conn.execute('''CREATE TABLE IF NOT EXISTS session_snapshots (
+                user_id INTEGER PRIMARY KEY,
+                state TEXT,
+                state_expires_at REAL,
+                tokens REAL,
+                saved_at REAL,
+                expires_at REAL
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_session_snapshots_expires ON session_snapshots (expires_at)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS generation_journal (
+                user_id INTEGER PRIMARY KEY,
+                flight_key TEXT,
+                chat_id INTEGER,
+                message_id INTEGER,
+                user_state TEXT,
+                created_at REAL
+            )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS generation_results (
+                flight_key TEXT PRIMARY KEY,
+                codec TEXT,
+                data BLOB,
+                created_at REAL
+            )''')
+    
+    @staticmethod
+    def backfill_user_stats(conn):
+        """بناء user_stats مرة واحدة من البيانات الموجودة قبل إضافة الجدول"""
+        conn.execute('''INSERT INTO user_stats (user_id, project_count, quality_sum, type_counts)
+                        SELECT user_id, SUM(n), COALESCE(SUM(q), 0), json_group_object(COALESCE(project_type, ''), n)
+                        FROM (SELECT user_id, project_type, COUNT(*) AS n, SUM(quality_score) AS q
+                              FROM projects WHERE user_id IS NOT NULL
+                              GROUP BY user_id, project_type)
+                        GROUP BY user_id''')
+        conn.execute('''INSERT INTO user_stats (user_id, api_calls, tokens_total, latency_sum)
+                        SELECT user_id, COUNT(*), COALESCE(SUM(tokens_used), 0), COALESCE(SUM(response_time), 0)
+                        FROM api_usage WHERE user_id IS NOT NULL GROUP BY user_id
+                        ON CONFLICT(user_id) DO UPDATE SET
+                            api_calls = excluded.api_calls,
+                            tokens_total = excluded.tokens_total,
+                            latency_sum = excluded.latency_sum''')
+    
+    def get_read_connection(self):
+        """اتصال قراءة خاص بكل خيط (WAL يسمح بالقراءة بالتوازي مع الكاتب)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            self.local.conn = conn
+        return conn
+    
+    def fetch_one(self, sql, params=()):
+        return self.get_read_connection().execute(sql, params).fetchone()
+    
+    def fetch_all(self, sql, params=()):
+        return self.get_read_connection().execute(sql, params).fetchall()
+    
+    def log_api_usage(self, api_key, user_id, endpoint, status_code, response_time, tokens_used, cached_tokens=0):
+        self.writer.execute('''INSERT INTO api_usage 
+                         (api_key, user_id, endpoint, status_code, response_time, tokens_used, cached_tokens, created_at)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (api_key, user_id, endpoint, status_code, response_time, tokens_used, cached_tokens,
+                          datetime.now().isoformat()))
+        if user_id is not None:
+            self.writer.execute('''INSERT INTO user_stats (user_id, api_calls, tokens_total, latency_sum)
+                             VALUES (?, 1, ?, ?)
+                             ON CONFLICT(user_id) DO UPDATE SET
+                                 api_calls = api_calls + 1,
+                                 tokens_total = tokens_total + excluded.tokens_total,
+                                 latency_sum = latency_sum + excluded.latency_sum''',
+                             (user_id, tokens_used, response_time))
+    
+    def log_error(self, user_id, error_type, error_message, stack_trace=None):
+        self.writer.execute('''INSERT INTO error_logs 
+                         (user_id, error_type, error_message, stack_trace, created_at)
+                         VALUES (?, ?, ?, ?, ?)''',
+                         (user_id, error_type, error_message, stack_trace, datetime.now().isoformat()))
+    
+    @staticmethod
+    def encode_project(project_data):
+        """تسلسل ثابت + بصمة sha256 + ضغط: (البصمة، الترميز، البيانات، الحجم الأصلي)"""
+        raw = json.dumps(project_data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        blob_hash = hashlib.sha256(raw).hexdigest()
+        
+        if Config.PROJECT_COMPRESSION == 'zstd' and zstandard is not None:
+            data = zstandard.ZstdCompressor(level=Config.PROJECT_COMPRESSION_LEVEL).compress(raw)
+            return blob_hash, 'zstd', data, len(raw)
+        
+        return blob_hash, 'zlib', zlib.compress(raw, Config.PROJECT_COMPRESSION_LEVEL), len(raw)
+    
+    @staticmethod
+    def decode_project(codec, data):
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd project blobs")
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            raw = zlib.decompress(data)
+        return json.loads(raw)
+    
+    def save_project(self, user_id, project_type, description, project_data, status, quality_score,
+                     requirements=None):
+        now = datetime.now().isoformat()
+        blob_hash, codec, data, raw_size = self.encode_project(project_data)
+        
+        # نفس المحتوى (مثل ردود التخزين المؤقت) يُخزَّن مرة واحدة
+        self.writer.execute('''INSERT OR IGNORE INTO project_blobs 
+                         (blob_hash, codec, data, raw_size, created_at)
+                         VALUES (?, ?, ?, ?, ?)''',
+                         (blob_hash, codec, data, raw_size, now))
+        self.writer.execute(self.insert_project,
+                            ((user_id, project_type, description, requirements, blob_hash,
+                              status, quality_score, now, now), DescriptionIndex.signature(description)))
+        self.writer.execute('''INSERT INTO user_stats (user_id, project_count, quality_sum, type_counts)
+                         VALUES (?, 1, COALESCE(?, 0), json_object(?, 1))
+                         ON CONFLICT(user_id) DO UPDATE SET
+                             project_count = project_count + 1,
+                             quality_sum = quality_sum + excluded.quality_sum,
+                             type_counts = json_set(type_counts, '$."' || ? || '"',
+                                 COALESCE(json_extract(type_counts, '$."' || ? || '"'), 0) + 1)''',
+                         (user_id, quality_score, project_type, project_type, project_type))
+    
+    @staticmethod
+    def insert_project(conn, row, signature):
+        """إدراج المشروع وفهرسة وصفه في نفس المعاملة (في خيط الكاتب)"""
+        cursor = conn.execute('''INSERT INTO projects 
+                         (user_id, project_type, description, requirements, blob_hash, status, quality_score, created_at, updated_at)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', row)
+        DescriptionIndex.insert(conn, cursor.lastrowid, row[1], row[4], signature)
+    
+    def record_user(self, user_id, username=None, full_name=None, language_code=None):
+        """إضافة المستخدم أو تحديث بياناته وآخر نشاط"""
+        now = datetime.now().isoformat()
+        self.writer.execute('''INSERT INTO users 
+                         (user_id, username, full_name, language_code, created_at, last_active)
+                         VALUES (?, ?, ?, ?, ?, ?)
+                         ON CONFLICT(user_id) DO UPDATE SET
+                             username = excluded.username,
+                             full_name = excluded.full_name,
+                             language_code = excluded.language_code,
+                             last_active = excluded.last_active''',
+                         (user_id, username, full_name, language_code, now, now))
+    
+    def count_user_request(self, user_id):
+        now = datetime.now().isoformat()
+        self.writer.execute('''INSERT INTO users (user_id, created_at, last_active, request_count)
+                         VALUES (?, ?, ?, 1)
+                         ON CONFLICT(user_id) DO UPDATE SET
+                             request_count = request_count + 1,
+                             last_active = excluded.last_active''',
+                         (user_id, now, now))
+    
+    def get_user_stats(self, user_id):
+        """إحصائيات المستخدم من صف واحد في user_stats (و users) بالمفتاح الأساسي"""
+        row = self.fetch_one('''SELECT s.project_count, s.quality_sum, s.type_counts, s.api_calls,
+                                       s.tokens_total, s.latency_sum, u.request_count
+                                FROM user_stats s LEFT JOIN users u ON u.user_id = s.user_id
+                                WHERE s.user_id = ?''', (user_id,))
+        if row is None:
+            return None
+        
+        project_count, quality_sum, type_counts, api_calls, tokens_total, latency_sum, request_count = row
+        return {
+            'project_count': project_count,
+            'avg_quality': quality_sum / project_count if project_count else 0,
+            'type_counts': json.loads(type_counts or '{}'),
+            'api_calls': api_calls,
+            'tokens_total': tokens_total,
+            'avg_latency': latency_sum / api_calls if api_calls else 0,
+            'request_count': request_count or 0
+        }
+    
+    def list_projects(self, user_id, before_id=None, limit=None):
+        """صفحة من مشاريع المستخدم (الأحدث أولاً) بترقيم keyset على id"""
+        limit = limit or Config.PROJECTS_PAGE_SIZE
+        return self.fetch_all('''SELECT id, project_type, quality_score, created_at
+                                 FROM projects
+                                 WHERE user_id = ? AND id < ?
+                                 ORDER BY id DESC LIMIT ?''',
+                              (user_id, before_id if before_id is not None else sys.maxsize, limit))
+    
+    def load_project(self, user_id, project_id):
+        """تحميل مشروع كامل عند الطلب فقط: (البيانات الوصفية، المحتوى) أو None"""
+        row = self.fetch_one('''SELECT p.project_type, p.description, p.requirements, p.quality_score,
+                                       p.project_data, b.codec, b.data
+                                FROM projects p LEFT JOIN project_blobs b ON b.blob_hash = p.blob_hash
+                                WHERE p.id = ? AND p.user_id = ?''',
+                             (project_id, user_id))
+        if row is None:
+            return None
+        
+        project_type, description, requirements, quality_score, legacy_data, codec, data = row
+        if data is not None:
+            project_data = self.decode_project(codec, data)
+        elif legacy_data:
+            project_data = json.loads(legacy_data)  # صفوف ما قبل الضغط
+        else:
+            return None
+        
+        meta = {
+            'project_type': project_type,
+            'description': description,
+            'requirements': requirements,
+            'quality_score': quality_score
+        }
+        return meta, project_data
+    
+    def close(self):
+        """تفريغ طابور الكتابة قبل إيقاف البرنامج"""
+        self.writer.close()
+
+db_manager = DatabaseManager()
+atexit.register(db_manager.close)
+app_metrics.db_queue_depth.set_function(db_manager.writer.queue.qsize)
+
+# 💾 لقطات الجلسات ومهام الإنشاء (إعادة تشغيل دافئة)
+class SessionSnapshots:
+    """حفظ الجلسات وأرصدة المعدل المتغيرة دورياً في SQLite، واستعادتها دفعة واحدة عند الإقلاع"""
+    
+    def __init__(self, db, state_manager):
+        self.db = db
+        self.state_manager = state_manager
+        self.thread = None
+        self.stopped = threading.Event()
+    
+    def start(self):
+        """استعادة آخر لقطة قبل استقبال أي تحديث، ثم تشغيل الحفظ الدوري"""
+        try:
+            self.restore_all()
+        except Exception as e:
+            logger.error("Session restore failed: %s", e)
+        self.thread = threading.Thread(target=self._snapshot_loop, name='session-snapshot', daemon=True)
+        self.thread.start()
+    
+    @staticmethod
+    def encode_state(state):
+        return json.dumps(dict(state), ensure_ascii=False, default=datetime.isoformat)
+    
+    @staticmethod
+    def decode_state(text):
+        state = json.loads(text)
+        if 'timestamp' in state:
+            state['timestamp'] = datetime.fromisoformat(state['timestamp'])
+        return state
+    
+    def snapshot(self):
+        """كتابة المستخدمين المتغيرين منذ آخر لقطة فقط؛ يرجع (المحفوظ، المحذوف)"""
+        manager = self.state_manager
+        limiter = manager.rate_limits
+        # dirty تُضاف بعد كل كتابة، فما يتغير أثناء اللقطة يبقى للقطة التالية
+        user_ids = manager.take_dirty()
+        now = time.time()
+        rows, removed = [], []
+        
+        for user_id in user_ids:
+            session = manager.user_states.peek(user_id)
+            tokens = limiter.peek(user_id)
+            if session is None and tokens is None:
+                removed.append((user_id,))
+                continue
+            
+            state, state_expires_at, expires_at = None, None, now
+            if session is not None:
+                state, state_expires_at = self.encode_state(session[0]), now + session[1]
+                expires_at = state_expires_at
+            if tokens is not None:
+                expires_at = max(expires_at, now + (limiter.capacity - tokens) / limiter.refill_per_second)
+            rows.append((user_id, state, state_expires_at, tokens, now, expires_at))
+        
+        if rows or removed:
+            self.db.writer.execute(self.write, (rows, removed, now))
+        return len(rows), len(removed)
+    
+    @staticmethod
+    def write(conn, rows, removed, now):
+        conn.executemany('''INSERT OR REPLACE INTO session_snapshots
+                            (user_id, state, state_expires_at, tokens, saved_at, expires_at)
+                            VALUES (?, ?, ?, ?, ?, ?)''', rows)
+        conn.executemany('DELETE FROM session_snapshots WHERE user_id = ?', removed)
+        conn.execute('DELETE FROM session_snapshots WHERE expires_at < ?', (now,))
+    
+    def restore_all(self):
+        """قراءة كل اللقطات غير المنتهية مرة واحدة عند الإقلاع؛ يرجع عدد الجلسات المستعادة"""
+        now = time.time()
+        manager = self.state_manager
+        limiter = manager.rate_limits
+        restored = 0
+        for user_id, state, state_expires_at, tokens, saved_at in self.db.fetch_all(
+                '''SELECT user_id, state, state_expires_at, tokens, saved_at FROM session_snapshots
+                   WHERE expires_at > ?''', (now,)):
+            ttl = None
+            if state is not None and state_expires_at > now:
+                state, ttl = self.decode_state(state), state_expires_at - now
+                restored += 1
+            else:
+                state = None
+            if tokens is not None:
+                tokens += (now - saved_at) * limiter.refill_per_second
+                if tokens >= limiter.capacity:
+                    tokens = None
+            manager.restore(user_id, state, ttl, tokens)
+        
+        if restored:
+            app_metrics.warm_restarts.inc(restored, kind='session')
+            logger.info("Restored %s sessions from the last snapshot", restored)
+        return restored
+    
+    def close(self):
+        """لقطة أخيرة عند الإيقاف أو SIGTERM (قبل تفريغ طابور الكتابة)"""
+        if self.thread is None or self.stopped.is_set():
+            return
+        # إيقاف الحلقة الدورية أولاً حتى لا تكتب بعد إغلاق الكاتب
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error("Final session snapshot failed: %s", e)
+    
+    def _snapshot_loop(self):
+        while not self.stopped.wait(Config.SNAPSHOT_INTERVAL):
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error("Session snapshot failed: %s", e)
+
+class GenerationJournal:
+    """سجل مهام الإنشاء غير المسلّمة: من ينتظرها، واستجابتها بمجرد وصولها من DeepSeek"""
+    
+    def __init__(self, db):
+        self.db = db
+        self.enabled = Config.SNAPSHOT_ENABLED
+    
+    def record(self, user_id, flight_key, chat_id, message_id, user_state):
+        if not self.enabled:
+            return
+        self.db.writer.execute(
+            '''INSERT OR REPLACE INTO generation_journal
+               (user_id, flight_key, chat_id, message_id, user_state, created_at) VALUES (?, ?, ?, ?, ?, ?)''',
+            (user_id, flight_key, chat_id, message_id, SessionSnapshots.encode_state(user_state), time.time())
+        )
+    
+    def remove(self, user_id):
+        if self.enabled:
+            self.db.writer.execute('DELETE FROM generation_journal WHERE user_id = ?', (user_id,))
+    
+    def store_result(self, flight_key, project_data):
+        """حفظ الاستجابة المستلمة: بعد إعادة التشغيل تُسلَّم بدلاً من إنشائها مرة أخرى"""
+        if not self.enabled:
+            return
+        _, codec, data, _ = DatabaseManager.encode_project(project_data)
+        self.db.writer.execute(
+            'INSERT OR REPLACE INTO generation_results (flight_key, codec, data, created_at) VALUES (?, ?, ?, ?)',
+            (flight_key, codec, data, time.time())
+        )
+    
+    def finish(self, flight_key, waiters):
+        """حذف الاستجابة وسجلات المنتظرين بعد التسليم"""
+        if self.enabled:
+            self.db.writer.execute(self.delete_flight, (flight_key, [(waiter[0],) for waiter in waiters]))
+    
+    @staticmethod
+    def delete_flight(conn, flight_key, user_ids):
+        conn.executemany('DELETE FROM generation_journal WHERE user_id = ?', user_ids)
+        conn.execute('DELETE FROM generation_results WHERE flight_key = ?', (flight_key,))
+    
+    def pending(self):
+        """مهام التشغيل السابق غير المسلّمة: [(المفتاح، المشروع أو None، المنتظرون)]"""
+        if not self.enabled:
+            return []
+        cutoff = time.time() - Config.SESSION_TTL
+        flights = {}
+        for user_id, flight_key, chat_id, message_id, state in self.db.fetch_all(
+                '''SELECT user_id, flight_key, chat_id, message_id, user_state FROM generation_journal
+                   WHERE created_at >= ? ORDER BY created_at''', (cutoff,)):
+            flights.setdefault(flight_key, []).append(
+                (user_id, SessionSnapshots.decode_state(state), chat_id, message_id))
+        
+        pending = []
+        for flight_key, waiters in flights.items():
+            row = self.db.fetch_one('SELECT codec, data FROM generation_results WHERE flight_key = ?', (flight_key,))
+            pending.append((flight_key, DatabaseManager.decode_project(*row) if row else None, waiters))
+        
+        # المهام الأقدم من مدة الجلسة والاستجابات التي لا ينتظرها أحد
+        self.db.writer.execute(self.prune, (cutoff,))
+        return pending
+    
+    @staticmethod
+    def prune(conn, cutoff):
+        conn.execute('DELETE FROM generation_journal WHERE created_at < ?', (cutoff,))
+        conn.execute('''DELETE FROM generation_results
+                        WHERE flight_key NOT IN (SELECT flight_key FROM generation_journal)''')
+
+session_snapshots = SessionSnapshots(db_manager, state_manager)
+generation_journal = GenerationJournal(db_manager)
+if Config.SNAPSHOT_ENABLED:
+    session_snapshots.start()
+    # يعمل قبل db_manager.close (ترتيب atexit عكسي)، وعند SIGTERM عبر handle_sigterm
+    atexit.register(session_snapshots.close)
+
+# 📡 تتبع تقدم الاستجابة المتدفقة
+class StreamProgress:
+    """تتبع حجم البيانات المستلمة والقسم الجاري إرساله (html/css/js)"""
+    
+    SECTION_PATTERN = re.compile(r'"(html|css|js|documentation)"\s*:')
+    TAIL_SIZE = 24  # لالتقاط مفتاح مقسوم بين جزأين
+    
+    def __init__(self):
+        self.bytes_received = 0
+        self.section = None
+        self._tail = ''
+    
+    def feed(self, chunk):
+        """تحديث التقدم بجزء جديد من الاستجابة"""
+        self.bytes_received += len(chunk.encode('utf-8'))
+        
+        # البحث في الجزء الجديد فقط مع ذيل قصير من السابق
+        window = self._tail + chunk
+        matches = self.SECTION_PATTERN.findall(window)
+        if matches:
+            self.section = matches[-1]
+        self._tail = window[-self.TAIL_SIZE:]
+
+# ⚡ نظام التخزين المؤقت للمشاريع
+class GenerationCache:
+    """تخزين المشاريع المنشأة بمفتاح محتوى: LRU في الذاكرة مدعوم بجدول SQLite"""
+    
+    DIACRITICS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+    WHITESPACE = re.compile(r'\s+')
+    
+    def __init__(self, db, memory_entries=None, max_entries=None, ttl=None):
+        self.db = db
+        self.memory_entries = memory_entries or Config.CACHE_MEMORY_ENTRIES
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.CACHE_TTL
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.puts = 0
+        self.stats = {'hits': 0, 'memory_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+    
+    @classmethod
+    def normalize_description(cls, description):
+        """توحيد الوصف: NFKC، حذف التشكيل والتطويل، أحرف صغيرة ومسافات موحدة"""
+        text = unicodedata.normalize('NFKC', description)
+        text = cls.DIACRITICS.sub('', text)
+        text = cls.WHITESPACE.sub(' ', text)
+        return text.strip().lower()
+    
+    @classmethod
+    def make_key(cls, project_type, quality, description):
+        normalized = cls.normalize_description(description)
+        raw = f"{project_type}\x1f{quality}\x1f{normalized}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """إرجاع المشروع المخزّن أو None"""
+        now = time.time()
+        
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                project_data, created_at = entry
+                if now - created_at < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    self.stats['memory_hits'] += 1
+                    return json.loads(project_data)
+                del self.entries[key]
+                self.stats['expired'] += 1
+        
+        row = self.db.fetch_one(
+            'SELECT project_data, created_at FROM generation_cache WHERE cache_key = ?', (key,)
+        )
+        if row is None or now - row[1] >= self.ttl:
+            with self.lock:
+                self.stats['misses'] += 1
+                if row is not None:
+                    self.stats['expired'] += 1
+            return None
+        
+        self.db.writer.execute(
+            'UPDATE generation_cache SET last_access = ? WHERE cache_key = ?', (now, key)
+        )
+        with self.lock:
+            self.stats['hits'] += 1
+            self._remember(key, row[0], row[1])
+        return json.loads(row[0])
+    
+    def put(self, key, project_data):
+        """تخزين مشروع جديد في الذاكرة وفي الجدول"""
+        now = time.time()
+        serialized = json.dumps(project_data)
+        
+        with self.lock:
+            self._remember(key, serialized, now)
+            self.puts += 1
+            prune = self.puts % Config.CACHE_PRUNE_EVERY == 0
+        
+        self.db.writer.execute(
+            '''INSERT OR REPLACE INTO generation_cache (cache_key, project_data, created_at, last_access)
+               VALUES (?, ?, ?, ?)''',
+            (key, serialized, now, now)
+        )
+        if prune:
+            self.prune(now)
+    
+    def prune(self, now=None):
+        """حذف المنتهية صلاحيتها والأقدم استخداماً فوق الحد الأقصى من الجدول"""
+        now = now or time.time()
+        self.db.writer.execute('DELETE FROM generation_cache WHERE created_at < ?', (now - self.ttl,))
+        self.db.writer.execute(
+            '''DELETE FROM generation_cache WHERE cache_key IN (
+                   SELECT cache_key FROM generation_cache
+                   ORDER BY last_access DESC LIMIT -1 OFFSET ?)''',
+            (self.max_entries,)
+        )
+    
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, 'memory_size': len(self.entries)}
+    
+    def _remember(self, key, serialized, created_at):
+        self.entries[key] = (serialized, created_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.memory_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+generation_cache = GenerationCache(db_manager)
+app_metrics.generation_cache_stats.set_function(generation_cache.get_stats)
+
+# 🔍 فهرس الأوصاف المتشابهة (MinHash + LSH)
+class DescriptionIndex:
+    """اقتراح مشروع سابق لوصف مُعاد صياغته: MinHash لمقاطع الأحرف ونطاقات LSH في SQLite"""
+    
+    EMPTY = 0xFFFFFFFF
+    
+    def __init__(self, db, threshold=None):
+        self.db = db
+        self.threshold = threshold or Config.SIMILAR_THRESHOLD
+        self.backfill_if_needed()
+    
+    @staticmethod
+    def shingles(description):
+        text = GenerationCache.normalize_description(description)
+        size = Config.SIMILAR_SHINGLE_SIZE
+        return {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+    
+    @classmethod
+    def signature(cls, description):
+        """MinHash بتجزئة واحدة لكل مقطع (one-permutation) مع ملء الخانات الفارغة من التالية"""
+        slots = Config.SIMILAR_BANDS * Config.SIMILAR_ROWS
+        values = [cls.EMPTY] * slots
+        for shingle in cls.shingles(description):
+            digest = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            slot, value = digest % slots, digest >> 32
+            if value < values[slot]:
+                values[slot] = value
+        
+        filled = [i for i, value in enumerate(values) if value != cls.EMPTY]
+        if filled and len(filled) < slots:
+            for i in range(slots):
+                if values[i] == cls.EMPTY:
+                    values[i] = values[filled[bisect.bisect_left(filled, i) % len(filled)]]
+        return array('I', values).tobytes()
+    
+    @staticmethod
+    def buckets(signature):
+        """مفتاح لكل نطاق LSH: الأوصاف المتشابهة تشترك غالباً في نطاق واحد على الأقل"""
+        width = Config.SIMILAR_ROWS * 4
+        return [
+            int.from_bytes(hashlib.blake2b(bytes([band]) + signature[band * width:(band + 1) * width],
+                                           digest_size=8).digest(), 'big', signed=True)
+            for band in range(Config.SIMILAR_BANDS)
+        ]
+    
+    @staticmethod
+    def similarity(a, b):
+        """تقدير Jaccard: نسبة الخانات المتساوية بين توقيعين"""
+        first, second = array('I', a), array('I', b)
+        if len(first) != len(second):
+            return 0.0
+        return sum(map(operator.eq, first, second)) / len(first)
+    
+    @classmethod
+    def insert(cls, conn, project_id, project_type, blob_hash, signature):
+        """فهرسة مشروع جديد داخل معاملة الكاتب؛ المحتوى المكرر يُفهرس مرة واحدة"""
+        if blob_hash is None:
+            return
+        cursor = conn.execute('''INSERT OR IGNORE INTO description_signatures
+                                 (project_id, project_type, blob_hash, signature) VALUES (?, ?, ?, ?)''',
+                              (project_id, project_type, blob_hash, signature))
+        if cursor.rowcount:
+            conn.executemany('INSERT OR IGNORE INTO description_lsh (project_type, bucket, project_id) VALUES (?, ?, ?)',
+                             [(project_type, bucket, project_id) for bucket in cls.buckets(signature)])
+    
+    def find(self, project_type, description):
+        """أقرب مشروع سابق من نفس النوع: (معرّف المشروع، التشابه) أو None"""
+        signature = self.signature(description)
+        buckets = self.buckets(signature)
+        placeholders = ', '.join('?' * len(buckets))
+        rows = self.db.fetch_all(f'''SELECT s.project_id, s.signature
+                                     FROM (SELECT DISTINCT project_id FROM description_lsh
+                                           WHERE project_type = ? AND bucket IN ({placeholders})
+                                           ORDER BY project_id DESC LIMIT ?) c
+                                     JOIN description_signatures s ON s.project_id = c.project_id''',
+                                 (project_type, *buckets, Config.SIMILAR_MAX_CANDIDATES))
+        
+        best = None
+        for project_id, candidate in rows:
+            score = self.similarity(signature, candidate)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (project_id, score)
+        
+        app_metrics.similar_lookups.inc(result='hit' if best else 'miss')
+        return best
+    
+    def load(self, project_id):
+        """محتوى المشروع المفهرس أو None"""
+        row = self.db.fetch_one('''SELECT b.codec, b.data FROM description_signatures s
+                                   JOIN project_blobs b ON b.blob_hash = s.blob_hash
+                                   WHERE s.project_id = ?''', (project_id,))
+        if row is None:
+            return None
+        return self.db.decode_project(*row)
+    
+    def backfill_if_needed(self):
+        """فهرسة المشاريع المحفوظة قبل إضافة الفهرس، مرة واحدة وفي خيط الكاتب"""
+        if self.db.fetch_one('SELECT 1 FROM description_signatures LIMIT 1') is not None:
+            return
+        if self.db.fetch_one('SELECT 1 FROM projects WHERE blob_hash IS NOT NULL LIMIT 1') is None:
+            return
+        self.db.writer.execute(self._backfill)
+    
+    @classmethod
+    def _backfill(cls, conn):
+        rows = conn.execute('''SELECT id, project_type, description, blob_hash FROM projects
+                               WHERE blob_hash IS NOT NULL ORDER BY id''').fetchall()
+        for project_id, project_type, description, blob_hash in rows:
+            cls.insert(conn, project_id, project_type, blob_hash, cls.signature(description or ''))
+        logger.info("Indexed %s stored project descriptions for similarity lookups", len(rows))
+
+description_index = DescriptionIndex(db_manager)
+
+# 🔑 نظام صحة مفاتيح API
+class KeyHealth:
+    """حالة مفتاح واحد: الدائرة، معدل الأخطاء وزمن الاستجابة"""
+    
+    def __init__(self, key):
+        self.key = key
+        self.state = 'closed'  # closed | open | half_open
+        self.outcomes = deque(maxlen=Config.KEY_HEALTH_WINDOW)
+        self.latency = None
+        self.consecutive_failures = 0
+        self.cooldown = Config.KEY_COOLDOWN
+        self.opened_at = 0.0
+        self.blocked_until = 0.0  # من ترويسة Retry-After
+        self.in_flight = 0
+    
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+class APIKeyPool:
+    """مجمع مفاتيح بقواطع دائرة (circuit breakers) واختيار المفتاح الأفضل حالياً"""
+    
+    def __init__(self, keys, clock=time.monotonic, limiter=None):
+        self.clock = clock
+        self.health = {key: KeyHealth(key) for key in keys}
+        self.limiter = limiter
+        self.lock = threading.Lock()
+    
+    def acquire(self, tokens=0, exclude=()):
+        """حجز المفتاح ذي أفضل درجة حالياً، أو None إذا لم يتوفر أي مفتاح"""
+        now = self.clock()
+        with self.lock:
+            best, best_score = None, None
+            for health in self.health.values():
+                if health.key in exclude or not self._is_available(health, now):
+                    continue
+                if self.limiter and self.limiter.time_until(health.key, tokens) > 0:
+                    continue
+                score = self._score(health)
+                if best_score is None or score < best_score:
+                    best, best_score = health, score
+            
+            if best is None:
+                return None
+            
+            if self.limiter:
+                self.limiter.try_acquire(best.key, tokens)
+            
+            if best.state == 'open':
+                # انتهت المهلة: طلب تجريبي واحد (half-open)
+                best.state = 'half_open'
+                logger.info("API key %s*** half-open, probing", best.key[:10])
+            best.in_flight += 1
+            return best.key
+    
+    def report_success(self, key, latency):
+        with self.lock:
+            health = self.health[key]
+            health.in_flight = max(0, health.in_flight - 1)
+            health.outcomes.append(True)
+            health.consecutive_failures = 0
+            if health.latency is None:
+                health.latency = latency
+            else:
+                alpha = Config.KEY_LATENCY_ALPHA
+                health.latency = alpha * latency + (1 - alpha) * health.latency
+            
+            if health.state != 'closed':
+                logger.info("API key %s*** recovered, circuit closed", key[:10])
+                health.state = 'closed'
+                health.cooldown = Config.KEY_COOLDOWN
+    
+    def report_failure(self, key, status_code=None, retry_after=None):
+        now = self.clock()
+        with self.lock:
+            health = self.health[key]
+            health.in_flight = max(0, health.in_flight - 1)
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+            
+            if retry_after:
+                health.blocked_until = max(health.blocked_until, now + retry_after)
+            
+            if health.state == 'half_open':
+                # فشل الطلب التجريبي: إعادة الفتح بمهلة مضاعفة
+                health.cooldown = min(health.cooldown * 2, Config.KEY_MAX_COOLDOWN)
+                self._open(health, now, status_code)
+            elif health.state == 'closed' and (
+                health.consecutive_failures >= Config.KEY_FAILURE_THRESHOLD or
+                (len(health.outcomes) >= Config.KEY_MIN_SAMPLES and
+                 health.error_rate() >= Config.KEY_ERROR_RATE_THRESHOLD)
+            ):
+                self._open(health, now, status_code)
+    
+    def release(self, key):
+        """تحرير المفتاح دون احتساب نتيجة (خطأ غير متعلق بالمفتاح)"""
+        with self.lock:
+            health = self.health[key]
+            health.in_flight = max(0, health.in_flight - 1)
+            if health.state == 'half_open':
+                health.state = 'open'
+    
+    def refund(self, key, tokens=0):
+        """إعادة حجز حدود المعدل لطلب أُلغي قبل أن يكتمل"""
+        if self.limiter:
+            self.limiter.refund(key, tokens)
+    
+    def time_until_available(self, tokens=0):
+        """الوقت المتبقي حتى يصبح أول مفتاح متاحاً"""
+        now = self.clock()
+        with self.lock:
+            waits = []
+            for health in self.health.values():
+                if health.state == 'half_open':
+                    continue
+                ready_at = health.blocked_until
+                if health.state == 'open':
+                    ready_at = max(ready_at, health.opened_at + health.cooldown)
+                wait = max(0.0, ready_at - now)
+                if self.limiter:
+                    wait = max(wait, self.limiter.time_until(health.key, tokens))
+                waits.append(wait)
+            return min(waits) if waits else None
+    
+    def snapshot(self):
+        with self.lock:
+            return {
+                health.key[:10] + "***": {
+                    'state': health.state,
+                    'error_rate': round(health.error_rate(), 3),
+                    'latency': health.latency,
+                    'in_flight': health.in_flight
+                }
+                for health in self.health.values()
+            }
+    
+    def _open(self, health, now, status_code):
+        health.state = 'open'
+        health.opened_at = now
+        logger.warning("API key %s*** circuit opened (status: %s, cooldown: %ss)",
+                       health.key[:10], status_code, health.cooldown)
+    
+    def _is_available(self, health, now):
+        if now < health.blocked_until:
+            return False
+        if health.state == 'closed':
+            return True
+        if health.state == 'open':
+            return now >= health.opened_at + health.cooldown
+        return False  # half_open: الطلب التجريبي جارٍ
+    
+    def _score(self, health):
+        """درجة أقل = أفضل: معدل الأخطاء ثم زمن الاستجابة ثم الطلبات الجارية"""
+        latency = health.latency if health.latency is not None else 0.0
+        return health.error_rate() * 10 + latency / 10 + health.in_flight
+
+# 🛡️ الطلبات الاحتياطية (hedging) لتقليل زمن الذيل
+class HedgePolicy:
+    """متى يُرسل طلب احتياطي: عتبة تكيفية من مئين زمن أول بايت، وسقف لنسبة الطلبات المكررة"""
+    
+    def __init__(self, percentile=None, budget=None, window=None, min_delay=None, initial_delay=None):
+        self.percentile = percentile or Config.HEDGE_PERCENTILE
+        self.budget = Config.HEDGE_BUDGET if budget is None else budget
+        self.min_delay = Config.HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.initial_delay = initial_delay or Config.HEDGE_INITIAL_DELAY
+        window = window or Config.HEDGE_WINDOW
+        self.samples = deque(maxlen=window)  # أزمنة أول بايت (ثوانٍ)
+        self.decisions = deque(maxlen=window)  # True = أُرسل طلب احتياطي
+        self.lock = threading.Lock()
+    
+    def observe(self, first_byte_latency):
         with self.lock:
-            self.user_states[user_id] = {
-                **state_data,
-                'timestamp': datetime.now(),
-                'retry_count': 0
-            }
+            self.samples.append(first_byte_latency)
     
-    def get_user_state(self, user_id):
+    def delay(self):
+        """العتبة الحالية: المئين المطلوب من العينات الأخيرة، أو القيمة الابتدائية"""
         with self.lock:
-            return self.user_states.get(user_id)
+            if len(self.samples) < Config.HEDGE_MIN_SAMPLES:
+                return self.initial_delay
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return max(self.min_delay, ordered[index])
     
-    def clear_user_state(self, user_id):
+    def try_hedge(self):
+        """هل تسمح الميزانية بطلب احتياطي آخر؟"""
         with self.lock:
-            self.user_states.pop(user_id, None)
+            hedged = self.decisions.count(True)
+            total = max(len(self.decisions) + 1, Config.HEDGE_MIN_SAMPLES)
+            return hedged + 1 <= self.budget * total
     
-    def check_rate_limit(self, user_id):
+    def record(self, hedged):
         with self.lock:
-            now = datetime.now()
-            user_limits = self.rate_limits.get(user_id, [])
-            
-            # تنظيف الطلبات القديمة
-            user_limits = [t for t in user_limits if now - t < timedelta(hours=1)]
-            
-            if len(user_limits) >= Config.RATE_LIMIT_PER_USER:
-                return False
-                
-            user_limits.append(now)
-            self.rate_limits[user_id] = user_limits
-            return True
+            self.decisions.append(hedged)
+    
+    def get_stats(self):
+        with self.lock:
+            decisions = len(self.decisions)
+            hedged = self.decisions.count(True)
+        return {'delay': self.delay(), 'requests': decisions, 'hedged': hedged}
 
-state_manager = StateManager()
+class RequestCancellation:
+    """إلغاء مشترك بين طلبات متوازية: set() يغلق مقابس الطلبات الجارية فيتوقف حتى انتظار الترويسات"""
+    
+    _active = threading.local()  # الإلغاء المرتبط بطلب الخيط الحالي
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.connections = {}  # معرّف الخيط -> الاتصال المستخدم حالياً
+        self.lock = threading.Lock()
+    
+    def is_set(self):
+        return self.event.is_set()
+    
+    def set(self):
+        with self.lock:
+            self.event.set()
+            for connection in self.connections.values():
+                self._abort(connection)
+            self.connections.clear()
+    
+    def track(self):
+        """ربط اتصالات الطلب الذي يبدأ في هذا الخيط بالإلغاء (سياق with)"""
+        return _TrackedRequest(self)
+    
+    @classmethod
+    def attach(cls, connection):
+        cancellation = getattr(cls._active, 'current', None)
+        if cancellation is None:
+            return
+        with cancellation.lock:
+            if cancellation.event.is_set():
+                cancellation._abort(connection)
+            else:
+                cancellation.connections[threading.get_ident()] = connection
+    
+    @classmethod
+    def detach(cls):
+        # قبل عودة الاتصال للمجمع: إلغاء لاحق يجب ألا يغلق اتصالاً يستخدمه طلب آخر
+        cancellation = getattr(cls._active, 'current', None)
+        if cancellation is not None:
+            with cancellation.lock:
+                cancellation.connections.pop(threading.get_ident(), None)
+    
+    @staticmethod
+    def _abort(connection):
+        sock = getattr(connection, 'sock', None)
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # الاتصال مغلق بالفعل
 
-# 🗄️ نظام قاعدة البيانات المتقدم
-class DatabaseManager:
+class _TrackedRequest:
+    def __init__(self, cancellation):
+        self.cancellation = cancellation
+    
+    def __enter__(self):
+        RequestCancellation._active.current = self.cancellation
+    
+    def __exit__(self, *exc):
+        RequestCancellation.detach()
+        RequestCancellation._active.current = None
+
+class _CancellableConnectionPool:
+    """مجمع urllib3 يسجّل الاتصال المأخوذ لدى إلغاء الطلب الجاري في الخيط"""
+    
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        RequestCancellation.attach(connection)
+        return connection
+    
+    def _put_conn(self, connection):
+        RequestCancellation.detach()
+        super()._put_conn(connection)
+
+class _CancellableHTTPConnectionPool(_CancellableConnectionPool, HTTPConnectionPool):
+    pass
+
+class _CancellableHTTPSConnectionPool(_CancellableConnectionPool, HTTPSConnectionPool):
+    pass
+
+class CancellableHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter تقبل طلباته الإلغاء عبر RequestCancellation"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CancellableHTTPConnectionPool,
+            'https': _CancellableHTTPSConnectionPool
+        }
+
+# 🧩 استخراج JSON من مخرجات النموذج
+class ProjectJSONExtractor:
+    """استخراج مشروع JSON بزمن خطي: كتل ```json أولاً ثم raw_decode من كل '{'، مع إصلاح العيوب الشائعة"""
+    
+    SCHEMA = {'html': True, 'css': True, 'js': False, 'documentation': False}  # المفتاح: إلزامي؟
+    FENCE_PATTERN = re.compile(r'```[ \t]*(?:json|JSON)?[ \t]*\r?\n(.*?)(?:```|\Z)', re.DOTALL)
+    MAX_CANDIDATES = 32  # حد محاولات raw_decode لكل مصدر
+    
     def __init__(self):
-        self.init_db()
+        self.decoder = json.JSONDecoder()
+        self.stats = {'direct': 0, 'repaired': 0, 'failed': 0}
+        self.stats_lock = threading.Lock()
     
-    def init_db(self):
-        with sqlite3.connect('ai_creator.db') as conn:
-            conn.execute('''CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                full_name TEXT,
-                language_code TEXT,
-                created_at TEXT,
-                last_active TEXT,
-                request_count INTEGER DEFAULT 0
-            )''')
-            
-            conn.execute('''CREATE TABLE IF NOT EXISTS projects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                project_type TEXT,
-                description TEXT,
-                requirements TEXT,
-                project_data TEXT,
-                status TEXT,
-                quality_score INTEGER,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )''')
-            
-            conn.execute('''CREATE TABLE IF NOT EXISTS api_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                api_key TEXT,
-                user_id INTEGER,
-                endpoint TEXT,
-                status_code INTEGER,
-                response_time REAL,
-                tokens_used INTEGER,
-                created_at TEXT
-            )''')
+    def extract(self, content):
+        """إرجاع قاموس المشروع أو رفع JSONExtractionError / JSONValidationError"""
+        sources = [match.group(1) for match in self.FENCE_PATTERN.finditer(content)]
+        sources.append(content)
+        
+        schema_error = None
+        for source in sources:
+            for candidate in self._candidates(source):
+                try:
+                    project = self.validate(candidate)
+                except JSONValidationError as e:
+                    schema_error = schema_error or e
+                    continue
+                self._count('direct')
+                return project
+        
+        # لم ينجح التحليل المباشر: محاولة إصلاح كل مصدر مرة واحدة
+        for source in sources:
+            start = source.find('{')
+            if start == -1:
+                continue
+            repaired = self.repair(source[start:])
+            try:
+                candidate, _ = self.decoder.raw_decode(repaired)
+                project = self.validate(candidate)
+            except json.JSONDecodeError:
+                continue
+            except JSONValidationError as e:
+                schema_error = schema_error or e
+                continue
+            self._count('repaired')
+            logger.warning("Model output needed JSON repair")
+            return project
+        
+        self._count('failed')
+        if schema_error:
+            raise schema_error
+        raise JSONExtractionError("No JSON found in response")
+    
+    def extract_object(self, content):
+        """أول كائن JSON في النص دون مخطط المشروع (مثل مواصفات التصميم)"""
+        sources = [match.group(1) for match in self.FENCE_PATTERN.finditer(content)]
+        sources.append(content)
+        for source in sources:
+            for candidate in self._candidates(source):
+                if isinstance(candidate, dict):
+                    return candidate
+        raise JSONExtractionError("No JSON object found in response")
+    
+    def validate(self, data):
+        """التحقق من الحقول وأنواعها؛ يقبل غلافاً واحداً مثل {"project": {...}}"""
+        if not isinstance(data, dict):
+            raise JSONValidationError("Response JSON is not an object")
+        
+        if not any(key in data for key in self.SCHEMA):
+            nested = [value for value in data.values() if isinstance(value, dict)]
+            if len(nested) == 1:
+                data = nested[0]
+        
+        project = {}
+        for key, required in self.SCHEMA.items():
+            value = data.get(key)
+            if isinstance(value, str):
+                project[key] = value
+            elif required:
+                raise JSONValidationError(f"Missing required key: {key}")
+        return project
+    
+    def get_stats(self):
+        with self.stats_lock:
+            return dict(self.stats)
+    
+    def _candidates(self, source):
+        """كائنات JSON الكاملة في النص بالترتيب، مع تخطي ما سبق تحليله"""
+        position = source.find('{')
+        attempts = 0
+        while position != -1 and attempts < self.MAX_CANDIDATES:
+            attempts += 1
+            try:
+                candidate, end = self.decoder.raw_decode(source, position)
+            except json.JSONDecodeError:
+                position = source.find('{', position + 1)
+                continue
+            yield candidate
+            position = source.find('{', end)
+    
+    @staticmethod
+    def repair(text):
+        """مرور واحد: تهريب أسطر النصوص الخام، حذف الفواصل الزائدة، وإغلاق الذيل المقطوع"""
+        escapes = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+        out = []
+        stack = []
+        in_string = False
+        escaped = False
+        safe_length = 0  # آخر موضع انتهت عنده قيمة كاملة داخل حاوية
+        safe_stack = []
+        
+        for char in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                elif char in escapes:
+                    char = escapes[char]
+                out.append(char)
+                continue
             
-            conn.execute('''CREATE TABLE IF NOT EXISTS error_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                error_type TEXT,
-                error_message TEXT,
-                stack_trace TEXT,
-                created_at TEXT
-            )''')
+            if char == '"':
+                in_string = True
+            elif char in '{[':
+                stack.append('}' if char == '{' else ']')
+            elif char in '}]':
+                if not stack:
+                    break
+                # حذف الفاصلة الزائدة قبل الإغلاق
+                while out and out[-1] in ' \t\r\n':
+                    out.pop()
+                if out and out[-1] == ',':
+                    out.pop()
+                char = stack.pop()
+                out.append(char)
+                if not stack:
+                    return ''.join(out)
+                continue
+            elif char == ',':
+                safe_length = len(out)
+                safe_stack = list(stack)
+            out.append(char)
+        
+        # النص مقطوع: إغلاق النص المفتوح ثم الحاويات
+        if in_string:
+            if escaped:
+                out.pop()
+            out.append('"')
+        tail = ''.join(out).rstrip()
+        if tail.endswith(','):
+            tail = tail[:-1]
+        
+        closed = tail + ''.join(reversed(stack))
+        try:
+            json.loads(closed)
+            return closed
+        except json.JSONDecodeError:
+            # مفتاح بلا قيمة في النهاية: الرجوع لآخر قيمة كاملة
+            return ''.join(out[:safe_length]) + ''.join(reversed(safe_stack))
     
-    def log_api_usage(self, api_key, user_id, endpoint, status_code, response_time, tokens_used):
-        with sqlite3.connect('ai_creator.db') as conn:
-            conn.execute('''INSERT INTO api_usage 
-                         (api_key, user_id, endpoint, status_code, response_time, tokens_used, created_at)
-                         VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                         (api_key, user_id, endpoint, status_code, response_time, tokens_used, 
-                          datetime.now().isoformat()))
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+        app_metrics.json_extractions.inc(result=name)
+
+# 🔬 تحليل خصائص الكود
+class CodeFeatures:
+    """سجل خصائص المشروع من مرور واحد على كل ملف، يشترك فيه التحسين وحساب الجودة"""
     
-    def log_error(self, user_id, error_type, error_message, stack_trace=None):
-        with sqlite3.connect('ai_creator.db') as conn:
-            conn.execute('''INSERT INTO error_logs 
-                         (user_id, error_type, error_message, stack_trace, created_at)
-                         VALUES (?, ?, ?, ?, ?)''',
-                         (user_id, error_type, error_message, stack_trace, datetime.now().isoformat()))
+    HTML_PATTERN = re.compile(
+        r'''(?P<lang_ar>\blang\s*=\s*["']?ar\b)'''
+        r'''|(?P<dir_rtl>\bdir\s*=\s*["']?rtl\b)'''
+        r'''|(?P<viewport><meta\b[^>]*?\bname\s*=\s*["']?viewport\b)'''
+        r'''|<(?P<semantic>header|footer|nav|main|section|article|aside)\b''',
+        re.IGNORECASE
+    )
+    CSS_PATTERN = re.compile(
+        r'(?P<media>@media\b)'
+        r'|(?P<layout>\b(?:display\s*:\s*(?:inline-)?(?:flex|grid)\b|(?:flex|grid)(?:-[a-z]+)*\s*:))'
+        r'|(?P<motion>@keyframes\b|\b(?:transition|animation)(?:-[a-z]+)*\s*:)'
+        r'|(?P<mobile>\bmobile\b)',
+        re.IGNORECASE
+    )
+    JS_PATTERN = re.compile(
+        r'(?P<try_block>\btry\s*\{)'
+        r'|(?P<catch_block>\bcatch\s*[({])'
+        r'|(?P<listener>\baddEventListener\s*\()'
+    )
+    # التعليقات (والنصوص في JS) تُحذف قبل المطابقة: "// try {" أو "<!-- <header> -->" ليست كوداً
+    HTML_COMMENT_PATTERN = re.compile(r'<!--.*?(?:-->|\Z)', re.DOTALL)
+    CSS_COMMENT_PATTERN = re.compile(r'/\*.*?(?:\*/|\Z)', re.DOTALL)
+    JS_NOISE_PATTERN = re.compile(
+        r'''//[^\n]*|/\*.*?(?:\*/|\Z)'''
+        r'''|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`''',
+        re.DOTALL
+    )
+    SCORES = (
+        ('lang_ar', 20), ('viewport', 15), ('semantic_layout', 25),
+        ('media_queries', 20), ('layout', 15), ('motion', 10),
+        ('listener', 10), ('error_handling', 15)
+    )
+    
+    def __init__(self):
+        self.lang_ar = False
+        self.dir_rtl = False
+        self.viewport = False
+        self.semantic_tags = set()
+        self.media_queries = False
+        self.mobile_rules = False
+        self.layout = False
+        self.motion = False
+        self.try_block = False
+        self.catch_block = False
+        self.listener = False
+    
+    @classmethod
+    def analyze(cls, project_data):
+        """تحليل html/css/js الموجودة في المشروع"""
+        features = cls()
+        features.scan_html(project_data.get('html', ''))
+        features.scan_css(project_data.get('css', ''))
+        features.scan_js(project_data.get('js', ''))
+        return features
+    
+    @classmethod
+    def for_project(cls, project_data):
+        """السجل المرفق بالمشروع إن وُجد، وإلا تحليل جديد"""
+        features = getattr(project_data, 'features', None)
+        return features if features is not None else cls.analyze(project_data)
+    
+    def scan_html(self, html):
+        html = self.HTML_COMMENT_PATTERN.sub(' ', html)
+        for match in self.HTML_PATTERN.finditer(html):
+            name = match.lastgroup
+            if name == 'semantic':
+                self.semantic_tags.add(match.group(name).lower())
+            else:
+                setattr(self, name, True)
+    
+    def scan_css(self, css):
+        css = self.CSS_COMMENT_PATTERN.sub(' ', css)
+        for match in self.CSS_PATTERN.finditer(css):
+            name = match.lastgroup
+            if name == 'media':
+                self.media_queries = True
+            elif name == 'mobile':
+                self.mobile_rules = True
+            else:
+                setattr(self, name, True)
+    
+    def scan_js(self, js):
+        # النصوص تُفرَّغ ولا تُحذف، و"//" داخلها (مثل الروابط) لا تُعد تعليقاً
+        js = self.JS_NOISE_PATTERN.sub(lambda match: ' ' if match.group().startswith('/') else '""', js)
+        for match in self.JS_PATTERN.finditer(js):
+            setattr(self, match.lastgroup, True)
+    
+    @property
+    def semantic_layout(self):
+        return {'header', 'footer'} <= self.semantic_tags or len(self.semantic_tags) >= 3
+    
+    @property
+    def error_handling(self):
+        return self.try_block and self.catch_block
+    
+    def quality_score(self):
+        return min(100, sum(points for name, points in self.SCORES if getattr(self, name)))
 
-db_manager = DatabaseManager()
+class ArtifactConsistency:
+    """فحص اتساق ملفات أُنشئت بشكل منفصل: المعرّفات والأصناف المشتركة بين HTML و CSS و JS"""
+    
+    HTML_DOCUMENT_PATTERN = re.compile(r'<(?:!DOCTYPE\b|html\b|body\b)', re.IGNORECASE)
+    HTML_ID_PATTERN = re.compile(r'''\bid\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+    HTML_CLASS_PATTERN = re.compile(r'''\bclass(?:Name)?\s*=\s*["']([^"']+)["']''')
+    CSS_NOISE_PATTERN = re.compile(r'''/\*.*?\*/|"[^"]*"|'[^']*'|url\([^)]*\)''', re.DOTALL)
+    CSS_PRELUDE_PATTERN = re.compile(r'([^{};]+)\{')
+    SELECTOR_PATTERN = re.compile(r'([#.])(-?[_a-zA-Z][\w-]*)')
+    JS_ID_PATTERN = re.compile(r'''getElementById\(\s*["'`]([^"'`]+)''')
+    JS_SELECTOR_PATTERN = re.compile(r'''querySelector(?:All)?\(\s*["'`]([^"'`]+)''')
+    JS_CLASS_OPERATION_PATTERN = re.compile(
+        r'''classList\.(?:add|remove|toggle|replace)\(\s*["'`]([^"'`]+)["'`](?:\s*,\s*["'`]([^"'`]+))?''')
+    
+    @classmethod
+    def check(cls, project_data):
+        """قائمة المشاكل (فارغة إذا كانت الملفات متسقة)"""
+        html = project_data.get('html', '')
+        css = project_data.get('css', '')
+        js = project_data.get('js', '')
+        
+        # ما يعرّفه HTML، أو JS عند بناء عناصر أو إضافة أصناف أثناء التشغيل
+        ids = set(cls.HTML_ID_PATTERN.findall(html)) | set(cls.HTML_ID_PATTERN.findall(js))
+        classes = {name for value in cls.HTML_CLASS_PATTERN.findall(html + js) for name in value.split()}
+        for match in cls.JS_CLASS_OPERATION_PATTERN.finditer(js):
+            classes.update(name for name in match.groups() if name)
+        
+        issues = []
+        if not cls.HTML_DOCUMENT_PATTERN.search(html):
+            issues.append("HTML output is not a document")
+        js_selectors = cls.selectors(' '.join(cls.JS_SELECTOR_PATTERN.findall(js)))
+        missing_ids = set(cls.JS_ID_PATTERN.findall(js)) - ids
+        missing_ids |= {name for kind, name in js_selectors if kind == '#'} - ids
+        missing_classes = {name for kind, name in js_selectors if kind == '.'} - classes
+        if missing_ids:
+            issues.append(f"JS references missing ids: {sorted(missing_ids)}")
+        if missing_classes:
+            issues.append(f"JS references missing classes: {sorted(missing_classes)}")
+        
+        stripped = cls.CSS_NOISE_PATTERN.sub('', css)
+        css_selectors = cls.selectors(' '.join(
+            prelude for prelude in cls.CSS_PRELUDE_PATTERN.findall(stripped)
+            if not prelude.strip().startswith('@')
+        ))
+        if css_selectors:
+            matched = sum(1 for kind, name in css_selectors if name in (ids if kind == '#' else classes))
+            coverage = matched / len(css_selectors)
+            if coverage < Config.SPLIT_MIN_SELECTOR_COVERAGE:
+                issues.append(f"Only {coverage:.0%} of CSS selectors match HTML/JS")
+        return issues
+    
+    @classmethod
+    def selectors(cls, text):
+        """أزواج (# أو .، الاسم) في نص محددات"""
+        return set(cls.SELECTOR_PATTERN.findall(text))
+
+class ProjectData(dict):
+    """قاموس المشروع مع سجل خصائصه؛ يُسلسَل كقاموس عادي"""
+    
+    def __init__(self, data, features=None):
+        super().__init__(data)
+        self.features = features
+
+# 📝 قوالب الطلبات المُجهّزة مسبقاً
+class PromptTemplate:
+    """جسم طلب chat/completions مُسلسل مرة واحدة؛ النص المتغير يُلحق في نهاية رسالة المستخدم"""
+    
+    SLOT = '\x00slot\x00'  # علامة موضع النص (تُهرَّب إلى \u0000 فلا تتكرر في البادئة)
+    
+    def __init__(self, system_prompt, user_prefix, max_tokens):
+        self.system_prompt = system_prompt
+        self.user_prefix = user_prefix
+        self.max_tokens = max_tokens
+        body = json.dumps(self.payload(system_prompt, user_prefix + self.SLOT, max_tokens))
+        head, tail = body.split(json.dumps(self.SLOT)[1:-1])
+        self.head = head.encode('ascii')
+        self.tail = tail.encode('ascii')
+        self.static_tokens = (len(system_prompt) + len(user_prefix)) // 4 + max_tokens
+    
+    @staticmethod
+    def payload(system_prompt, user_prompt, max_tokens):
+        payload = {
+            "model": "deepseek-coder",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens,
+            "top_p": 0.9,
+            "stream": Config.STREAM_RESPONSES
+        }
+        if Config.STREAM_RESPONSES:
+            # حدث أخير فيه usage (بما فيها رموز ذاكرة السياق)
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    def render(self, text):
+        """(جسم الطلب بايتات، الرموز المقدّرة لحدود المعدل: المدخلات + الحد الأقصى للمخرجات)"""
+        escaped = json.dumps(text)[1:-1].encode('ascii')
+        return self.head + escaped + self.tail, self.static_tokens + len(text) // 4
 
 # 🧠 نظام الذكاء الاصطناعي المتقدم
 class AIService:
     def __init__(self):
-        self.current_key_index = 0
-        self.failed_keys = set()
-        self.executor = ThreadPoolExecutor(max_workers=3)
-    
-    def get_available_key(self):
-        """نظام تدوير المفاتيح الذكي"""
-        available_keys = [k for k in Config.DEEPSEEK_API_KEYS if k not in self.failed_keys]
-        if not available_keys:
-            return None
+        self.key_limiter = UpstreamKeyLimiter()
+        self.key_pool = APIKeyPool(Config.DEEPSEEK_API_KEYS, limiter=self.key_limiter)
+        # ملفات وضع split (html/css/js) لكل مهمة إنشاء متزامنة
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(self.ARTIFACT_NAMES) * max(1, len(Config.DEEPSEEK_API_KEYS)) *
+            Config.GENERATION_WORKERS_PER_KEY,
+            thread_name_prefix='artifact'
+        )
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.json_extractor = ProjectJSONExtractor()
+        self.templates = {}
+        self.compile_templates()
+        self.hedge_policy = HedgePolicy()
+        # الطلب الأصلي والاحتياطي يعملان هنا بينما ينتظر خيط المهمة أسبقهما
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=Config.HTTP_POOL_SIZE * max(1, len(Config.DEEPSEEK_API_KEYS)),
+            thread_name_prefix='hedge'
+        )
+        app_metrics.hedge_delay.set_function(self.hedge_policy.delay)
+    
+    def get_session(self, api_key):
+        """جلسة HTTP دائمة (keep-alive) لكل مفتاح مع مجمع اتصالات مشترك بين الخيوط"""
+        session = self.sessions.get(api_key)
+        if session is not None:
+            return session
+        
+        with self.sessions_lock:
+            session = self.sessions.get(api_key)
+            if session is None:
+                session = self.create_session(api_key)
+                self.sessions[api_key] = session
+            return session
+    
+    def create_session(self, api_key):
+        """إنشاء جلسة مع مجمع اتصالات وإعادة محاولة على مستوى النقل"""
+        # إعادة المحاولة لأخطاء الاتصال فقط: إعادة إرسال POST بعد قراءة جزئية تعني دفع التكلفة مرتين
+        retries = Retry(
+            total=Config.HTTP_CONNECT_RETRIES,
+            connect=Config.HTTP_CONNECT_RETRIES,
+            read=0,
+            status=0,
+            backoff_factor=Config.HTTP_RETRY_BACKOFF,
+            allowed_methods=None,
+            # 429/503 مع Retry-After تعود كاستجابة ليقرأها مجمع المفاتيح (تبريد المفتاح)
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        adapter = CancellableHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=Config.HTTP_POOL_SIZE,
+            max_retries=retries,
+            pool_block=False
+        )
         
-        key = available_keys[self.current_key_index % len(available_keys)]
-        self.current_key_index += 1
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+            "Connection": "keep-alive"
+        })
+        return session
+    
+    def close(self):
+        """إغلاق جميع الجلسات المفتوحة"""
+        with self.sessions_lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+        self.executor.shutdown(wait=False)
+        self.hedge_executor.shutdown(wait=False)
+    
+    def get_available_key(self, tokens=0):
+        """اختيار أفضل مفتاح متاح حسب صحته وحدود معدله، مع انتظار قصير عند الحاجة"""
+        key = self.key_pool.acquire(tokens)
+        if key is None:
+            wait = self.key_pool.time_until_available(tokens)
+            if wait is not None and wait <= Config.KEY_MAX_WAIT:
+                time.sleep(wait)
+                key = self.key_pool.acquire(tokens)
         return key
     
+    @staticmethod
+    def backoff_delay(attempt):
+        """تأخير أسّي مع تذبذب عشوائي (jitter) بين المحاولات"""
+        delay = min(Config.RETRY_BACKOFF_CAP, Config.RETRY_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+    
+    @staticmethod
+    def parse_retry_after(response):
+        """قراءة ترويسة Retry-After (ثوانٍ أو تاريخ HTTP)"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
     def validate_description(self, description, project_type):
         """التحقق من جودة الوصف"""
         issues = []
@@ -196,10 +2544,7 @@ class AIService:
         
         return issues
     
-    def enhance_prompt(self, description, project_type, requirements=None):
-        """تحسين الprompt للحصول على أفضل النتائج"""
-        
-        base_system_prompt = """You are an expert full-stack developer and UI/UX designer. 
+    SYSTEM_PROMPT = """You are an expert full-stack developer and UI/UX designer. 
 Create professional, production-ready code with:
 
 ESSENTIAL REQUIREMENTS:
@@ -233,15 +2578,8 @@ Return ONLY valid JSON with this exact structure:
     "js": "clean JavaScript with error handling",
     "documentation": "brief setup instructions"
 }"""
-
-        user_prompt = f"""
-PROJECT REQUEST:
-{description}
-
-ADDITIONAL REQUIREMENTS:
-{requirements or "Standard professional implementation"}
-
-SPECIFIC INSTRUCTIONS:
+    
+    INSTRUCTIONS = """SPECIFIC INSTRUCTIONS:
 - Use Arabic language support (dir='rtl', lang='ar')
 - Implement modern, professional design
 - Include responsive navigation
@@ -253,125 +2591,509 @@ SPECIFIC INSTRUCTIONS:
 - Optimize for performance
 - Add relevant meta tags
 
-Please provide complete, production-ready code.
-"""
+Please provide complete, production-ready code."""
+    
+    def enhance_prompt(self, description, project_type, requirements=None):
+        """تحسين الprompt للحصول على أفضل النتائج"""
+        template = self.get_template('project', project_type, requirements)
+        return template.system_prompt, template.user_prefix + description
+    
+    def get_template(self, kind, project_type=None, requirements=None):
+        """القالب المُجهّز لنوع الطلب (project/spec/html/css/js) ونوع المشروع والجودة"""
+        key = (kind, project_type, requirements, Config.STREAM_RESPONSES)
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates.setdefault(key, self.compile_template(kind, project_type, requirements))
+        return template
+    
+    def compile_template(self, kind, project_type=None, requirements=None):
+        # الأجزاء الثابتة أولاً والوصف في النهاية: البادئة المشتركة تُخدم من ذاكرة السياق لدى DeepSeek
+        if kind in self.ARTIFACT_NAMES:
+            system_prompt = self.ARTIFACT_SYSTEM_PROMPT.format(
+                name=self.ARTIFACT_NAMES[kind], rules=self.ARTIFACT_RULES[kind])
+            return PromptTemplate(system_prompt, '', Config.SPLIT_MAX_TOKENS[kind])
         
-        return base_system_prompt, user_prompt
+        context = (f"PROJECT TYPE: {project_type}\n\n"
+                   f"ADDITIONAL REQUIREMENTS:\n{requirements or 'Standard professional implementation'}\n\n"
+                   f"PROJECT REQUEST:\n")
+        if kind == 'spec':
+            return PromptTemplate(self.SPEC_SYSTEM_PROMPT, context, Config.SPLIT_MAX_TOKENS['spec'])
+        return PromptTemplate(self.SYSTEM_PROMPT, self.INSTRUCTIONS + "\n\n" + context, 4000)
     
-    def generate_project(self, description, project_type, requirements=None, user_id=None):
-        """إنشاء المشروع مع معالجة متقدمة للأخطاء"""
+    def compile_templates(self):
+        """تجهيز قوالب كل أنواع المشاريع ومستويات الجودة عند البدء"""
+        for project_type in UIManager.TYPE_NAMES:
+            for quality_name in UIManager.QUALITY_NAMES.values():
+                self.get_template('project', project_type, f"جودة: {quality_name}")
+    
+    def prepare_generation(self, description, project_type, requirements=None):
+        """التحقق من الوصف وبناء جسم الطلب؛ يرجع (الجسم بايتات، الرموز المقدّرة)"""
         
         # التحقق من جودة الوصف
+        self.check_description(description, project_type)
+        
+        # الجسم يُسلسل مرة واحدة ويُعاد استخدامه في كل المحاولات
+        return self.get_template('project', project_type, requirements).render(description)
+    
+    def check_description(self, description, project_type):
         validation_issues = self.validate_description(description, project_type)
         if validation_issues:
             raise ValidationError(" | ".join(validation_issues))
+    
+    SPEC_SYSTEM_PROMPT = """You are a senior UI/UX designer planning a website that three developers
+will build in parallel: one writes the HTML, one the CSS and one the JavaScript.
+Write a compact design specification they can all follow without talking to each other.
+
+Return ONLY valid JSON with this exact structure:
+{
+    "title": "page title",
+    "palette": {"primary": "#hex", "secondary": "#hex", "background": "#hex", "text": "#hex"},
+    "typography": "font families and sizes",
+    "sections": [{"id": "section-id", "purpose": "what the section contains"}],
+    "ids": ["every element id that CSS or JavaScript will use"],
+    "classes": ["every class name shared between HTML, CSS and JavaScript"],
+    "interactions": ["behaviour implemented in JavaScript, naming the ids/classes involved"],
+    "documentation": "brief setup instructions"
+}
+The site is in Arabic (dir='rtl', lang='ar'). Keep the specification under 400 words."""
+    
+    ARTIFACT_SYSTEM_PROMPT = """You are an expert front-end developer on a team building one website in parallel.
+You write ONLY the {name} file; your teammates write the other files from the same design specification.
+Use exactly the ids and class names listed in the specification and do not invent new shared names.
+
+{rules}
+
+Return ONLY the raw {name} code, without markdown fences or explanations."""
+    
+    ARTIFACT_RULES = {
+        'html': """- Arabic page: <html lang="ar" dir="rtl"> with UTF-8 and viewport meta tags
+- Semantic HTML5 (header, nav, main, section, footer) with every section id from the specification
+- Link style.css in <head> and script.js with defer
+- Accessible markup: alt texts, labels, aria attributes where needed""",
+        'css': """- Mobile-first responsive design with @media queries
+- Flexbox/Grid layout using the palette and typography from the specification
+- Smooth transitions and animations
+- Style the ids and classes from the specification plus element selectors""",
+        'js': """- Vanilla JavaScript (ES6+) that runs after DOMContentLoaded
+- Look elements up only by the ids and classes from the specification and skip missing ones
+- Use addEventListener and wrap handlers in try/catch
+- Implement every interaction listed in the specification""",
+    }
+    ARTIFACT_NAMES = {'html': 'HTML (index.html)', 'css': 'CSS (style.css)', 'js': 'JavaScript (script.js)'}
+    CODE_FENCE_PATTERN = re.compile(r'^\s*```[\w-]*[ \t]*\r?\n(.*?)\r?\n?```\s*$', re.DOTALL)
+    
+    def prepare_spec(self, description, project_type, requirements=None):
+        """طلب مواصفات التصميم المشتركة لوضع split"""
+        return self.get_template('spec', project_type, requirements).render(description)
+    
+    def prepare_artifacts(self, spec, description, requirements=None):
+        """طلبات html/css/js بنفس المواصفات: {الملف: (الجسم، الرموز المقدّرة)}"""
+        spec_json = json.dumps(spec, ensure_ascii=False, indent=2)
+        user_prompt = (f"DESIGN SPECIFICATION:\n{spec_json}\n\n"
+                       f"ADDITIONAL REQUIREMENTS:\n{requirements or 'Standard professional implementation'}\n\n"
+                       f"PROJECT REQUEST:\n{description}")
+        return {artifact: self.get_template(artifact).render(user_prompt) for artifact in self.ARTIFACT_NAMES}
+    
+    def parse_spec(self, content):
+        if content is None:
+            raise ProjectGenerationError("Design spec request failed")
+        return self.json_extractor.extract_object(content)
+    
+    def assemble_split_project(self, spec, contents):
+        """دمج الملفات المنفصلة والتحقق من اتساقها"""
+        project = {}
+        for artifact, content in contents.items():
+            match = self.CODE_FENCE_PATTERN.match(content)
+            code = (match.group(1) if match else content).strip()
+            if not code:
+                raise ProjectGenerationError(f"Empty {artifact} response")
+            project[artifact] = code
+        
+        if isinstance(spec.get('documentation'), str):
+            project['documentation'] = spec['documentation']
+        
+        issues = ArtifactConsistency.check(project)
+        if issues:
+            raise ProjectGenerationError("Inconsistent artifacts: " + "; ".join(issues))
+        return project
+    
+    def finish_split_project(self, project, description, user_id):
+        with app_metrics.phase_latency.time(phase='parse'):
+            enhanced_data = self.enhance_project_quality(project, description)
+        app_metrics.split_generations.inc(result='ok')
+        logger.info("Project generated successfully for user %s (split)", user_id)
+        return enhanced_data
+    
+    def acquire_artifact_keys(self, bodies):
+        """مفتاح مختلف لكل ملف إن أمكن، وإلا مشاركة أفضل مفتاح متاح"""
+        keys = {}
+        try:
+            for artifact, (_, tokens) in bodies.items():
+                api_key = (self.key_pool.acquire(tokens, exclude=set(keys.values())) or
+                           self.get_available_key(tokens))
+                if not api_key:
+                    raise APINotAvailableError("No available API keys")
+                keys[artifact] = api_key
+        except Exception:
+            for api_key in keys.values():
+                self.key_pool.release(api_key)
+            raise
+        return keys
+    
+    @staticmethod
+    def split_progress(on_progress):
+        """جمع تقدم الملفات المتوازية في رسالة واحدة"""
+        received = {}
+        lock = threading.Lock()
+        
+        def reporter(artifact):
+            if on_progress is None:
+                return None
+            
+            def report(bytes_received, section):
+                with lock:
+                    received[artifact] = bytes_received
+                    total = sum(received.values())
+                return on_progress(total, artifact)
+            return report
+        return reporter
+    
+    @staticmethod
+    def mask_key(api_key):
+        return api_key[:10] + "***"
+    
+    def record_attempt(self, api_key, user_id, status_code, response_time, description, usage=None):
+        """تسجيل استخدام API"""
+        usage = usage or {}
+        tokens_used = usage.get('total_tokens') or len(description) // 4  # تقدير تقريبي دون usage
+        cached_tokens = self.cached_tokens(usage)
+        db_manager.log_api_usage(
+            self.mask_key(api_key), user_id, "chat/completions", 
+            status_code, response_time, tokens_used, cached_tokens
+        )
+        if usage:
+            app_metrics.upstream_tokens.inc(usage.get('prompt_tokens', 0), kind='prompt')
+            app_metrics.upstream_tokens.inc(cached_tokens, kind='cached')
+            app_metrics.upstream_tokens.inc(usage.get('completion_tokens', 0), kind='completion')
+        app_metrics.upstream_latency.observe(response_time, key=self.mask_key(api_key), status=status_code)
+    
+    @staticmethod
+    def cached_tokens(usage):
+        """رموز المدخلات من ذاكرة السياق: prompt_cache_hit_tokens (DeepSeek) أو prompt_tokens_details"""
+        if 'prompt_cache_hit_tokens' in usage:
+            return usage['prompt_cache_hit_tokens'] or 0
+        return (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+    
+    def finish_generation(self, content, description, user_id):
+        """استخراج JSON من المحتوى وتحسين جودته"""
+        with app_metrics.phase_latency.time(phase='parse'):
+            # استخراج وتحليل JSON
+            project_data = self.extract_and_validate_json(content)
+            
+            # تحسين الجودة النهائية
+            enhanced_data = self.enhance_project_quality(project_data, description)
         
-        # تحسين الprompt
-        system_prompt, user_prompt = self.enhance_prompt(description, project_type, requirements)
+        logger.info("Project generated successfully for user %s", user_id)
+        return enhanced_data
+    
+    def generate_project(self, description, project_type, requirements=None, user_id=None, on_progress=None):
+        """إنشاء المشروع مع معالجة متقدمة للأخطاء"""
+        if Config.GENERATION_MODE == 'split':
+            self.check_description(description, project_type)
+            try:
+                return self.generate_project_split(description, project_type, requirements, user_id, on_progress)
+            except Exception as e:
+                logger.warning("Split generation failed for user %s, falling back to single-shot: %s", user_id, e)
+                app_metrics.split_generations.inc(result='fallback')
+        
+        body, estimated_tokens = self.prepare_generation(description, project_type, requirements)
         
         # المحاولة مع retry logic
         for attempt in range(Config.MAX_RETRIES):
+            if attempt:
+                time.sleep(self.backoff_delay(attempt - 1))
+            
             try:
-                api_key = self.get_available_key()
+                api_key = self.get_available_key(estimated_tokens)
                 if not api_key:
                     raise APINotAvailableError("No available API keys")
                 
-                start_time = time.time()
-                
-                response = requests.post(
-                    Config.DEEPSEEK_API_URL,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {api_key}"
-                    },
-                    json={
-                        "model": "deepseek-coder",
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 4000,
-                        "top_p": 0.9
-                    },
-                    timeout=Config.REQUEST_TIMEOUT
-                )
-                
-                response_time = time.time() - start_time
-                
-                # تسجيل استخدام API
-                tokens_used = len(description) // 4  # تقدير تقريبي
-                db_manager.log_api_usage(
-                    api_key[:10] + "***", user_id, "chat/completions", 
-                    response.status_code, response_time, tokens_used
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content']
-                    
-                    # استخراج وتحليل JSON
-                    project_data = self.extract_and_validate_json(content)
-                    
-                    # تحسين الجودة النهائية
-                    enhanced_data = self.enhance_project_quality(project_data, description)
-                    
-                    logger.info(f"Project generated successfully for user {user_id}")
-                    return enhanced_data
-                    
+                if Config.HEDGE_ENABLED:
+                    content = self.request_hedged(api_key, body, estimated_tokens, user_id, description, on_progress)
                 else:
-                    logger.warning(f"API attempt {attempt + 1} failed: {response.status_code}")
-                    self.failed_keys.add(api_key)
+                    content = self.request_content(api_key, body, user_id, description, on_progress)
+                
+                if content is not None:
+                    return self.finish_generation(content, description, user_id)
                     
             except requests.exceptions.Timeout:
-                logger.warning(f"API timeout on attempt {attempt + 1}")
+                logger.warning("API timeout on attempt %s", attempt + 1)
+                app_metrics.upstream_retries.inc(reason='timeout')
                 continue
             except requests.exceptions.RequestException as e:
-                logger.error(f"Request error on attempt {attempt + 1}: {e}")
+                logger.error("Request error on attempt %s: %s", attempt + 1, e)
+                app_metrics.upstream_retries.inc(reason='request_error')
                 continue
             except Exception as e:
-                logger.error(f"Unexpected error on attempt {attempt + 1}: {e}")
+                logger.error("Unexpected error on attempt %s: %s", attempt + 1, e)
+                app_metrics.upstream_retries.inc(reason=type(e).__name__)
                 continue
         
-        raise ProjectGenerationError("Failed to generate project after multiple attempts")
+        raise ProjectGenerationError("Failed to generate project after multiple attempts")
+    
+    def generate_project_split(self, description, project_type, requirements=None, user_id=None, on_progress=None):
+        """مواصفات تصميم قصيرة ثم html/css/js بالتوازي على مفاتيح مختلفة"""
+        spec_body, spec_tokens = self.prepare_spec(description, project_type, requirements)
+        with app_metrics.phase_latency.time(phase='spec'):
+            api_key = self.get_available_key(spec_tokens)
+            if not api_key:
+                raise APINotAvailableError("No available API keys")
+            spec = self.parse_spec(self.request_content(api_key, spec_body, user_id, description))
+        
+        bodies = self.prepare_artifacts(spec, description, requirements)
+        keys = self.acquire_artifact_keys(bodies)
+        reporter = self.split_progress(on_progress)
+        cancelled = RequestCancellation()
+        with app_metrics.phase_latency.time(phase='artifacts'):
+            futures = {
+                self.executor.submit(self.request_artifact, artifact, keys[artifact], body,
+                                     user_id, description, reporter(artifact), cancelled): artifact
+                for artifact, (body, _) in bodies.items()
+            }
+            try:
+                # أول فشل يكفي للرجوع إلى الطلب الواحد؛ البقية تتوقف عند الجزء التالي
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        raise future.exception()
+                contents = {artifact: future.result() for future, artifact in futures.items()}
+            finally:
+                cancelled.set()
+        
+        return self.finish_split_project(self.assemble_split_project(spec, contents), description, user_id)
+    
+    def request_artifact(self, artifact, api_key, body, user_id, description, on_progress=None, cancelled=None):
+        content = self.request_content(api_key, body, user_id, description, on_progress, cancelled=cancelled)
+        if content is None:
+            raise ProjectGenerationError(f"{artifact} request failed")
+        return content
+    
+    def request_content(self, api_key, body, user_id, description, on_progress=None,
+                        on_first_byte=None, cancelled=None):
+        """طلب واحد على مفتاح محجوز؛ يرجع المحتوى، أو None إذا رُفض الطلب أو أُلغي"""
+        if cancelled is not None and cancelled.is_set():
+            # بدأ بعد انتهاء السباق (انتظر خيطاً متاحاً): لا داعي للاتصال
+            self.key_pool.release(api_key)
+            return None
+        
+        start_time = time.time()
+        content = None
+        usage = {}
+        try:
+            with cancelled.track() if cancelled is not None else nullcontext():
+                response = self.get_session(api_key).post(
+                    Config.DEEPSEEK_API_URL,
+                    data=body,
+                    timeout=Config.REQUEST_TIMEOUT,
+                    stream=Config.STREAM_RESPONSES
+                )
+                
+                with response:
+                    if response.status_code == 200:
+                        if Config.STREAM_RESPONSES:
+                            progress = StreamProgress()
+                            parts = []
+                            for chunk in self.iter_stream_chunks(response, usage):
+                                if cancelled is not None and cancelled.is_set():
+                                    break  # إغلاق الاستجابة يقطع الاتصال مع الخادم
+                                if not parts:
+                                    self.mark_first_byte(start_time, on_first_byte)
+                                parts.append(chunk)
+                                progress.feed(chunk)
+                                if on_progress:
+                                    on_progress(progress.bytes_received, progress.section)
+                            content = "".join(parts)
+                        else:
+                            data = response.json()
+                            content = data['choices'][0]['message']['content']
+                            usage.update(data.get('usage') or {})
+                            self.mark_first_byte(start_time, on_first_byte)
+        except Exception:
+            # فشل على مستوى النقل (مهلة أو انقطاع) قبل الحكم على الاستجابة
+            if cancelled is not None and cancelled.is_set():
+                self.key_pool.release(api_key)
+            else:
+                self.key_pool.report_failure(api_key)
+            raise
+        
+        if cancelled is not None and cancelled.is_set():
+            # خسر السباق: لا يُحتسب نجاحاً ولا فشلاً للمفتاح
+            self.key_pool.release(api_key)
+            return None
+        
+        response_time = time.time() - start_time
+        self.record_attempt(api_key, user_id, response.status_code, response_time, description, usage)
+        return self.report_response(api_key, response.status_code, response_time,
+                                    self.parse_retry_after(response), content)
+    
+    def report_response(self, api_key, status_code, response_time, retry_after, content):
+        """إبلاغ مجمع المفاتيح بنتيجة الاستجابة؛ يرجع المحتوى عند النجاح فقط"""
+        if status_code == 200:
+            self.key_pool.report_success(api_key, response_time)
+            return content
+        
+        logger.warning("API request on key %s failed: %s", self.mask_key(api_key), status_code)
+        app_metrics.upstream_retries.inc(reason=str(status_code))
+        self.key_pool.report_failure(api_key, status_code, retry_after)
+        return None
+    
+    def mark_first_byte(self, start_time, on_first_byte=None):
+        """تسجيل زمن أول بايت لعتبة التحوط"""
+        self.hedge_policy.observe(time.time() - start_time)
+        if on_first_byte:
+            on_first_byte()
+    
+    def acquire_hedge_key(self, api_key, estimated_tokens):
+        """مفتاح آخر للطلب الاحتياطي إذا سمحت الميزانية، دون انتظار"""
+        if not self.hedge_policy.try_hedge():
+            app_metrics.hedged_requests.inc(outcome='skipped_budget')
+            return None
+        hedge_key = self.key_pool.acquire(estimated_tokens, exclude=(api_key,))
+        if hedge_key is None:
+            app_metrics.hedged_requests.inc(outcome='skipped_no_key')
+        return hedge_key
+    
+    def record_hedge(self, api_key, hedge_key, winner):
+        """نتيجة السباق: won = الطلب الاحتياطي أسرع، lost = الأصلي أسرع"""
+        if hedge_key is None:
+            return
+        outcome = 'won' if winner == hedge_key else 'lost' if winner == api_key else 'failed'
+        app_metrics.hedged_requests.inc(outcome=outcome)
+        logger.info("Hedged request %s -> %s: %s", self.mask_key(api_key), self.mask_key(hedge_key), outcome)
+    
+    @staticmethod
+    def hedge_progress(on_progress):
+        """أول طلب يستقبل بيانات يملك رسالة التقدم؛ تقدم الطلب الآخر يُتجاهل"""
+        owner = []
+        
+        def reporter(api_key):
+            if on_progress is None:
+                return None
+            
+            def report(bytes_received, section):
+                if not owner:
+                    owner.append(api_key)
+                if owner[0] == api_key:
+                    on_progress(bytes_received, section)
+            return report
+        return reporter
     
-    def extract_and_validate_json(self, content):
-        """استخراج والتحقق من صحة JSON"""
+    def request_hedged(self, api_key, body, estimated_tokens, user_id, description, on_progress=None):
+        """الطلب على api_key، ومع تأخر أول بايت عن العتبة طلب مكرر على مفتاح آخر؛ الأسبق يفوز"""
+        first_byte = threading.Event()
+        cancelled = RequestCancellation()
+        reporter = self.hedge_progress(on_progress)
+        futures = {}
+        pending = set()
+        
+        def launch(key):
+            future = self.hedge_executor.submit(
+                self.request_content, key, body, user_id, description,
+                reporter(key), first_byte.set, cancelled
+            )
+            future.add_done_callback(lambda _: first_byte.set())
+            futures[future] = key
+        
+        content, error, winner, hedge_key = None, None, None, None
         try:
-            # البحث عن JSON في المحتوى
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if not json_match:
-                raise JSONExtractionError("No JSON found in response")
+            launch(api_key)
+            if not first_byte.wait(self.hedge_policy.delay()):
+                hedge_key = self.acquire_hedge_key(api_key, estimated_tokens)
+                if hedge_key:
+                    launch(hedge_key)
+            self.hedge_policy.record(hedge_key is not None)
             
-            json_str = json_match.group()
-            data = json.loads(json_str)
-            
-            # التحقق من الهيكل الأساسي
-            required_keys = ['html', 'css']
-            for key in required_keys:
-                if key not in data:
-                    raise JSONValidationError(f"Missing required key: {key}")
-            
-            return data
-            
-        except json.JSONDecodeError as e:
-            raise JSONExtractionError(f"Invalid JSON format: {e}")
+            pending = set(futures)
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if result is not None and winner is None:
+                        content, winner = result, futures[future]
+        finally:
+            # إغلاق مقبس الخاسر يحرر خيطه ومفتاحه فوراً حتى قبل وصول الترويسات
+            cancelled.set()
+        
+        # الخاسر لم يكتمل: حجز حدود المعدل يعود لمفتاحه
+        for future in pending:
+            self.key_pool.refund(futures[future], estimated_tokens)
+        self.record_hedge(api_key, hedge_key, winner)
+        if content is None and error is not None:
+            raise error
+        return content
+    
+    STREAM_DONE = object()
+    
+    def parse_stream_line(self, raw_line, usage=None):
+        """تحليل سطر SSE واحد: جزء نصي، أو STREAM_DONE، أو None للتجاهل؛ usage يُملأ من الحدث الأخير"""
+        if not raw_line or not raw_line.startswith(b'data:'):
+            return None
+        
+        payload = raw_line[5:].decode('utf-8', errors='replace').strip()
+        if payload == '[DONE]':
+            return self.STREAM_DONE
+        
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed stream event: %s", payload[:80])
+            return None
+        
+        if usage is not None and event.get('usage'):
+            usage.update(event['usage'])
+        
+        choices = event.get('choices') or []
+        if not choices:
+            return None
+        
+        return (choices[0].get('delta') or {}).get('content') or None
+    
+    def iter_stream_chunks(self, response, usage=None):
+        """قراءة أحداث SSE وإرجاع أجزاء النص فور وصولها"""
+        # تقسيم البايتات ثم فك UTF-8 لكل سطر: فك الترميز أولاً قد يقسم الأسطر داخل النص العربي
+        for raw_line in response.iter_lines():
+            chunk = self.parse_stream_line(raw_line, usage)
+            if chunk is self.STREAM_DONE:
+                break
+            if chunk:
+                yield chunk
+    
+    def extract_and_validate_json(self, content):
+        """استخراج والتحقق من صحة JSON"""
+        return self.json_extractor.extract(content)
     
     def enhance_project_quality(self, project_data, description):
         """تحسين جودة المشروع النهائي"""
+        features = CodeFeatures.analyze(project_data)
         
         # تحسين HTML
         if 'html' in project_data:
             html = project_data['html']
             
             # إضافة دعم العربية إذا لم يكن موجوداً
-            if 'lang="ar"' not in html:
-                html = html.replace('<html>', '<html lang="ar" dir="rtl">')
+            if not features.lang_ar and '<html>' in html:
+                html = html.replace('<html>', '<html lang="ar" dir="rtl">', 1)
+                features.lang_ar = features.dir_rtl = True
             
             # إضافة meta tags مهمة
-            if '<meta name="viewport"' not in html:
+            if not features.viewport and '</head>' in html:
                 viewport_meta = '<meta name="viewport" content="width=device-width, initial-scale=1.0">'
-                html = html.replace('</head>', f'    {viewport_meta}\n</head>')
+                html = html.replace('</head>', f'    {viewport_meta}\n</head>', 1)
+                features.viewport = True
             
             project_data['html'] = html
         
@@ -380,7 +3102,7 @@ Please provide complete, production-ready code.
             css = project_data['css']
             
             # إضافة أساسيات التصميم المتجاوب
-            if '@media' not in css and 'mobile' not in css.lower():
+            if not features.media_queries and not features.mobile_rules:
                 responsive_css = '''
 
 /* ===== RESPONSIVE DESIGN ===== */
@@ -410,6 +3132,7 @@ Please provide complete, production-ready code.
 }
 '''
                 css += responsive_css
+                features.scan_css(responsive_css)  # الجزء المضاف فقط
             
             project_data['css'] = css
         
@@ -418,12 +3141,13 @@ Please provide complete, production-ready code.
             js = project_data['js']
             
             # إضافة معالجة الأخطاء إذا لم تكن موجودة
-            if 'try' not in js and 'catch' not in js:
+            if not features.try_block and not features.catch_block:
                 js = f'// Error handling and initialization\ndocument.addEventListener("DOMContentLoaded", function() {{\n    try {{\n{js}\n    }} catch (error) {{\n        console.error("Application error:", error);\n    }}\n}});'
+                features.try_block = features.catch_block = features.listener = True
             
             project_data['js'] = js
         
-        return project_data
+        return ProjectData(project_data, features)
 
 # 🎨 نظام واجهة المستخدم المتقدم
 class UIManager:
@@ -463,6 +3187,281 @@ class UIManager:
             InlineKeyboardButton("⭐⭐⭐⭐ ممتاز", callback_data="quality_premium")
         )
         return markup
+    
+    @staticmethod
+    def create_similar_project_keyboard():
+        markup = InlineKeyboardMarkup(row_width=1)
+        markup.add(
+            InlineKeyboardButton("⚡ استخدم المشروع المشابه", callback_data="similar_use"),
+            InlineKeyboardButton("🔄 إنشاء مشروع جديد", callback_data="similar_new")
+        )
+        return markup
+    
+    @staticmethod
+    def create_projects_keyboard(rows, has_more):
+        markup = InlineKeyboardMarkup(row_width=1)
+        for project_id, project_type, _, _ in rows:
+            type_name = UIManager.TYPE_NAMES.get(project_type, 'موقع ويب')
+            markup.add(InlineKeyboardButton(f"⬇️ {type_name} #{project_id}",
+                                            callback_data=f"project_dl_{project_id}"))
+        if has_more:
+            markup.add(InlineKeyboardButton("⬅️ الأقدم", callback_data=f"projects_before_{rows[-1][0]}"))
+        return markup
+    
+    TYPE_NAMES = {
+        'ecommerce': '🛒 موقع تجارة إلكترونية',
+        'corporate': '📊 موقع شركة',
+        'educational': '🎓 موقع تعليمي', 
+        'portfolio': '📝 موقع شخصي',
+        'restaurant': '🍽️ موقع مطعم',
+        'medical': '⚕️ موقع طبي'
+    }
+    
+    QUALITY_NAMES = {
+        'basic': '⭐ أساسي',
+        'advanced': '⭐⭐ متقدم', 
+        'pro': '⭐⭐⭐ احترافي',
+        'premium': '⭐⭐⭐⭐ ممتاز'
+    }
+    
+    SECTION_NAMES = {
+        'html': "🎨 تصميم الواجهة (HTML)...",
+        'css': "📱 التنسيق والتجاوب (CSS)...",
+        'js': "⚡ برمجة الوظائف (JavaScript)...",
+        'documentation': "🛠️ كتابة التوثيق..."
+    }
+    
+    # 💬 نصوص الرسائل (مشتركة بين وقتي التشغيل المتزامن وغير المتزامن)
+    @staticmethod
+    def welcome_text(user_name):
+        return f"""
+🎉 <b>مرحباً {user_name}!</b>
+
+🤖 <b>بوت إنشاء المواقع والتطبيقات بالذكاء الاصطناعي</b>
+
+✨ <b>المميزات المتقدمة:</b>
+• 🎯 <code>ذكاء اصطناعي متقدم</code> - DeepSeek AI
+• 🏗️ <code>تصميم احترافي</code> - أكواد جاهزة للإنتاج
+• 📱 <code>تصميم متجاوب</code> - يعمل على جميع الأجهزة
+• ⚡ <code>أداء ممتاز</code> - تحسينات السرعة والأداء
+• 🛡️ <code>جودة عالية</code> - معايير احترافية
+
+🚀 <b>لنبدأ رحلتك:</b>
+1. اختر نوع المشروع
+2. صف ما تريد بدقة
+3. اختر مستوى الجودة
+4. احصل على مشروعك الاحترافي
+
+🎯 <b>اختر من القائمة:</b>
+    """
+    
+    @staticmethod
+    def rate_limited_text():
+        return ("⏳ <b>تم تجاوز الحد المسموح</b>\n\n"
+                "لقد استخدمت الحد الأقصى من الطلبات لهذه الساعة.\n"
+                "يرجى المحاولة مرة أخرى لاحقاً.")
+    
+    @staticmethod
+    def website_type_text():
+        return ("🌐 <b>مرحلة 1/3: اختر نوع الموقع</b>\n\n"
+                "📊 <b>الأنواع المتاحة:</b>\n"
+                "• <b>🛒 تجارة إلكترونية</b> - متاجر онлайн متكاملة\n"
+                "• <b>📊 موقع شركة</b> - مواقع مؤسسات احترافية\n"  
+                "• <b>🎓 تعليمي</b> - منصات تعلم إلكتروني\n"
+                "• <b>📝 شخصي</b> - portfolios وسير ذاتية\n"
+                "• <b>🍽️ مطعم</b> - قوائم طعام وحجوزات\n"
+                "• <b>⚕️ طبي</b> - عيادات وخدمات طبية\n\n"
+                "🎯 <b>اختر النوع المناسب:</b>")
+    
+    @staticmethod
+    def description_prompt_text(type_name):
+        return (f"🎯 <b>مرحلة 2/3: وصف المشروع</b>\n\n"
+                f"📝 <b>النوع المحدد:</b> {type_name}\n\n"
+                f"💡 <b>الآن صف مشروعك بالتفصيل:</b>\n"
+                f"• الألوان المفضلة\n• الوظائف المطلوبة\n• المحتوى الرئيسي\n• أي متطلبات خاصة\n\n"
+                f"📋 <b>مثال احترافي:</b>\n"
+                f"<i>\"أريد موقع شركة بمجال التقنية بالألوان الأزرق والأبيض، يحتوي على:\n"
+                f"- صفحة رئيسية مع شريط تمرير للميزات\n"
+                f"- صفحة عن الشركة مع فريق العمل\n"  
+                f"- صفحة خدمات مع تفاصيل كل خدمة\n"
+                f"- نموذج اتصال متكامل\n"
+                f"- تصميم عصري مع تأثيرات scroll\"</i>\n\n"
+                f"🎯 <b>اكتب وصفك الآن:</b>")
+    
+    @staticmethod
+    def description_issues_text(issues):
+        error_msg = "\n".join([f"• {issue}" for issue in issues])
+        return (f"⚠️ <b>تحسينات مقترحة للوصف:</b>\n\n{error_msg}\n\n"
+                f"📝 <b>يرجى تعديل الوصف وإعادة إرساله:</b>")
+    
+    @staticmethod
+    def quality_prompt_text(type_name, description):
+        return (f"✅ <b>تم استلام الوصف بنجاح!</b>\n\n"
+                f"📝 <b>ملخص الطلب:</b>\n"
+                f"• <b>النوع:</b> {type_name}\n"
+                f"• <b>الوصف:</b> {description[:100]}...\n\n"
+                f"🎯 <b>مرحلة 3/3: مستوى الجودة</b>\n\n"
+                f"⭐ <b>مستويات الجودة:</b>\n"
+                f"• <b>أساسي</b> - تصميم بسيط وظيفي\n"
+                f"• <b>متقدم</b> - تصميم متجاوب بميزات إضافية\n"
+                f"• <b>احترافي</b> - تصميم احترافي مع تأثيرات متقدمة\n"
+                f"• <b>ممتاز</b> - أعلى مستوى من الجودة والتفاصيل\n\n"
+                f"💎 <b>اختر مستوى الجودة المطلوب:</b>")
+    
+    @staticmethod
+    def description_error_text():
+        return ("❌ <b>حدث خطأ أثناء معالجة الوصف</b>\n\n"
+                "يرجى المحاولة مرة أخرى أو الاتصال بالدعم.")
+    
+    @staticmethod
+    def session_expired_text():
+        return "❌ انتهت الجلسة. يرجى البدء من جديد."
+    
+    @staticmethod
+    def help_text():
+        return ("ℹ️ <b>طريقة الاستخدام</b>\n\n"
+                "1. اضغط <b>🌐 إنشاء موقع ويب</b> واختر نوع الموقع\n"
+                "2. أرسل وصفاً واضحاً لما تريد\n"
+                "3. اختر مستوى الجودة واستلم ملفات المشروع\n\n"
+                "• <b>🚀 مشاريعي:</b> تحميل مشاريعك السابقة\n"
+                "• <b>📊 إحصائياتي:</b> ملخص استخدامك\n"
+                "• /start للبدء من جديد في أي وقت")
+    
+    @staticmethod
+    def coming_soon_text(feature):
+        return f"🚧 <b>{feature}</b>\n\nهذه الميزة قيد التطوير وستتوفر قريباً."
+    
+    @staticmethod
+    def choose_from_buttons_text():
+        return "👆 يرجى الاختيار من الأزرار في الرسالة السابقة، أو أرسل /start للبدء من جديد."
+    
+    @staticmethod
+    def generation_in_progress_text():
+        return "⏳ <b>مشروعك قيد الإنشاء</b>\n\nستصلك الملفات فور اكتمالها."
+    
+    @staticmethod
+    def generation_started_text(type_name, quality_name):
+        return (f"🚀 <b>بدء الإنشاء...</b>\n\n"
+                f"📊 <b>تفاصيل الطلب:</b>\n"
+                f"• <b>النوع:</b> {type_name}\n"
+                f"• <b>الجودة:</b> {quality_name}\n"
+                f"• <b>الحالة:</b> جاري المعالجة...\n\n"
+                f"⏳ <b>قد تستغرق العملية 1-2 دقائق</b>\n"
+                f"🤖 <b>جاري استخدام الذكاء الاصطناعي...</b>")
+    
+    @staticmethod
+    def queue_position_text(position):
+        return (f"🕒 <b>طلبك في الطابور</b>\n\n"
+                f"📍 <b>موقعك:</b> {position}\n\n"
+                f"⏳ سيبدأ الإنشاء تلقائياً عند وصول دورك.")
+    
+    @staticmethod
+    def queue_full_text():
+        return ("⏳ <b>الخدمة مشغولة حالياً</b>\n\n"
+                "طابور الإنشاء ممتلئ. يرجى المحاولة مرة أخرى بعد قليل.")
+    
+    @staticmethod
+    def coalesced_text():
+        return ("🔗 <b>طلب مطابق قيد الإنشاء الآن</b>\n\n"
+                "ستصلك ملفات المشروع فور اكتماله دون انتظار دور جديد في الطابور.")
+    
+    @staticmethod
+    def similar_project_text(similarity):
+        return (f"♻️ <b>يوجد مشروع مشابه جداً لطلبك</b>\n\n"
+                f"أُنشئ سابقاً مشروع من نفس النوع بوصف مطابق لوصفك بنسبة {similarity:.0%} تقريباً.\n"
+                f"يمكنك استلامه فوراً أو إنشاء مشروع جديد خاص بوصفك.")
+    
+    @staticmethod
+    def job_cancelled_text():
+        return "🚫 <b>تم إلغاء الطلب</b>\n\nبدأت طلباً جديداً، لذا أُلغي الطلب السابق من الطابور."
+    
+    @staticmethod
+    def progress_text(bytes_received, section):
+        percent = min(95, bytes_received * 100 // Config.EXPECTED_RESPONSE_CHARS)
+        stage = UIManager.SECTION_NAMES.get(section, "🔍 تحليل المتطلبات...")
+        return (f"🚀 <b>جاري الإنشاء...</b>\n\n"
+                f"📊 <b>التقدم:</b> {percent}% ({bytes_received // 1024} KB)\n"
+                f"🔧 <b>المرحلة:</b> {stage}\n\n"
+                f"⏳ <b>يرجى الانتظار...</b>")
+    
+    @staticmethod
+    def generation_error_text(error):
+        """نص الخطأ حسب نوعه"""
+        error_msg = str(error)
+        if isinstance(error, ValidationError):
+            return (f"❌ <b>خطأ في التحقق</b>\n\n{error_msg}\n\n"
+                    f"📝 يرجى تعديل الوصف وإعادة المحاولة.")
+        if isinstance(error, ProjectGenerationError):
+            return (f"❌ <b>خطأ في الإنشاء</b>\n\n{error_msg}\n\n"
+                    f"🔄 يرجى المحاولة مرة أخرى.")
+        return (f"❌ <b>خطأ غير متوقع</b>\n\n{error_msg}\n\n"
+                f"🛠️ تم تسجيل الخطأ وسيتم معالجته.")
+    
+    @staticmethod
+    def success_text(user_state, quality_score, files_summary, first_step):
+        return f"""
+🎉 <b>تم الإنشاء بنجاح!</b>
+
+📊 <b>تفاصيل المشروع:</b>
+• <b>النوع:</b> {user_state['type_name']}
+• <b>الجودة:</b> {user_state['quality_name']}
+• <b>درجة الجودة:</b> {quality_score}/100
+• <b>الملفات:</b> {files_summary}
+
+🚀 <b>خطوات التشغيل:</b>
+1. {first_step}
+2. افتح ملف index.html في المتصفح
+3. استمتع بموقعك الجديد!
+
+💡 <b>نصائح مهمة:</b>
+• يمكنك تعديل الألوان في ملف style.css
+• يمكنك إضافة محتوى جديد في index.html
+• الموقع جاهز للتطوير والإضافة
+
+🔧 <b>لإنشاء مشروع جديد:</b>
+اختر "إنشاء موقع ويب" من القائمة الرئيسية.
+        """
+    
+    @staticmethod
+    def send_files_error_text(error):
+        return f"❌ <b>خطأ في إرسال الملفات</b>\n\n{str(error)}"
+    
+    @staticmethod
+    def my_projects_text(rows):
+        lines = []
+        for project_id, project_type, quality_score, created_at in rows:
+            type_name = UIManager.TYPE_NAMES.get(project_type, 'موقع ويب')
+            lines.append(f"• <b>#{project_id}</b> {type_name} — {quality_score}/100 — {created_at[:10]}")
+        return "🚀 <b>مشاريعي</b>\n\n" + "\n".join(lines) + "\n\n⬇️ اضغط على مشروع لتحميله مجدداً."
+    
+    @staticmethod
+    def no_projects_text():
+        return ("📭 <b>لا توجد مشاريع بعد</b>\n\n"
+                "اختر \"إنشاء موقع ويب\" من القائمة لإنشاء مشروعك الأول.")
+    
+    @staticmethod
+    def user_stats_text(stats):
+        if not stats:
+            return ("📊 <b>إحصائياتي</b>\n\n"
+                    "لا توجد إحصائيات بعد، أنشئ مشروعك الأول من القائمة الرئيسية.")
+        
+        type_lines = "\n".join(
+            f"• {UIManager.TYPE_NAMES.get(project_type, project_type)}: {count}"
+            for project_type, count in sorted(stats['type_counts'].items(), key=lambda item: -item[1])
+        ) or "• —"
+        return f"""📊 <b>إحصائياتي</b>
+
+📁 <b>المشاريع:</b> {stats['project_count']}
+{type_lines}
+
+🏆 <b>متوسط الجودة:</b> {stats['avg_quality']:.0f}/100
+📨 <b>طلبات الإنشاء:</b> {stats['request_count']}
+🔢 <b>الرموز المستخدمة:</b> {stats['tokens_total']:,}
+⏱️ <b>متوسط زمن الاستجابة:</b> {stats['avg_latency']:.1f} ث"""
+    
+    @staticmethod
+    def project_not_found_text():
+        return "❌ <b>المشروع غير موجود</b>\n\nربما لم يكتمل حفظه بعد، حاول بعد لحظات."
 
 # 🎯 معالجة الأخطاء المخصصة
 class ProjectGenerationError(Exception):
@@ -485,420 +3484,966 @@ class JSONValidationError(Exception):
     """خطأ في تحقق JSON"""
     pass
 
+# 🧵 نظام جدولة مهام الإنشاء
+class GenerationJob:
+    """مهمة إنشاء واحدة في الطابور"""
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, user_id, func, args=(), on_position=None, on_cancel=None):
+        self.job_id = next(self._ids)
+        self.user_id = user_id
+        self.func = func
+        self.args = args
+        self.on_position = on_position
+        self.on_cancel = on_cancel
+        self.status = 'queued'
+        self.position = None
+        self.created_at = time.time()
+
+class FairJobQueue:
+    """طابور عادل (round-robin) بين المستخدمين؛ الحماية من التزامن مسؤولية المجدول"""
+    
+    def __init__(self, max_queued=None, max_queued_per_user=None):
+        self.max_queued = max_queued or Config.MAX_QUEUED_JOBS
+        self.max_queued_per_user = max_queued_per_user or Config.MAX_QUEUED_JOBS_PER_USER
+        self.user_queues = {}
+        self.turns = deque()  # ترتيب المستخدمين في الدور
+        self.queued_count = 0
+        self.running = {}
+        self.stopping = False
+    
+    def _enqueue(self, job):
+        """إضافة المهمة؛ يرجع المهام التي تغير موقعها، أو None عند الامتلاء"""
+        if self.stopping or self.queued_count >= self.max_queued:
+            return None
+        
+        user_queue = self.user_queues.get(job.user_id)
+        if user_queue is None:
+            user_queue = self.user_queues[job.user_id] = deque()
+            self.turns.append(job.user_id)
+        elif len(user_queue) >= self.max_queued_per_user:
+            return None
+        
+        user_queue.append(job)
+        self.queued_count += 1
+        job.position = self._positions().get(job.job_id)
+        # دخول مستخدم جديد قد يؤخر مهام الآخرين في الدور
+        return self._refresh_positions()
+    
+    def _dequeue_user(self, user_id):
+        """إزالة مهام المستخدم المنتظرة؛ يرجع (الملغاة، المتغير موقعها)"""
+        user_queue = self.user_queues.pop(user_id, None)
+        if not user_queue:
+            return [], []
+        self.turns.remove(user_id)
+        self.queued_count -= len(user_queue)
+        cancelled = list(user_queue)
+        for job in cancelled:
+            job.status = 'cancelled'
+        return cancelled, self._refresh_positions()
+    
+    def _positions(self):
+        """حساب ترتيب التنفيذ المتوقع وفق الدور بين المستخدمين"""
+        positions = {}
+        queues = [self.user_queues[user_id] for user_id in self.turns]
+        position = 1
+        for depth in range(self.max_queued_per_user):
+            for user_queue in queues:
+                if depth < len(user_queue):
+                    positions[user_queue[depth].job_id] = position
+                    position += 1
+        return positions
+    
+    def _refresh_positions(self):
+        positions = self._positions()
+        changed = []
+        for user_queue in self.user_queues.values():
+            for job in user_queue:
+                new_position = positions.get(job.job_id)
+                if new_position != job.position:
+                    job.position = new_position
+                    changed.append(job)
+        return changed
+    
+    def _next_job(self):
+        user_id = self.turns.popleft()
+        user_queue = self.user_queues[user_id]
+        job = user_queue.popleft()
+        if user_queue:
+            self.turns.append(user_id)
+        else:
+            del self.user_queues[user_id]
+        self.queued_count -= 1
+        job.status = 'running'
+        self.running[job.job_id] = job
+        app_metrics.phase_latency.observe(time.time() - job.created_at, phase='queue_wait')
+        return job
+    
+    def _notify(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.warning("Job scheduler callback failed: %s", e)
+    
+    def _notify_positions(self, jobs):
+        for job in jobs:
+            if job.status == 'queued':
+                self._notify(job.on_position, job.position)
+
+class JobScheduler(FairJobQueue):
+    """مجدول بعدد عمال (خيوط) محدود فوق الطابور العادل"""
+    
+    def __init__(self, max_workers, max_queued=None, max_queued_per_user=None):
+        super().__init__(max_queued, max_queued_per_user)
+        self.max_workers = max_workers
+        self.cond = threading.Condition()
+        self.workers = [
+            threading.Thread(target=self._worker, name=f'generation-worker-{i}', daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+    
+    def submit(self, job):
+        """إضافة مهمة للطابور وإرجاع موقعها (1 = التالية)، أو None عند الامتلاء"""
+        with self.cond:
+            changed = self._enqueue(job)
+            if changed is None:
+                return None
+            self.cond.notify()
+        
+        self._notify_positions(changed)
+        return job.position
+    
+    def cancel_user(self, user_id):
+        """إلغاء مهام المستخدم التي لم تبدأ بعد"""
+        with self.cond:
+            cancelled, changed = self._dequeue_user(user_id)
+        
+        for job in cancelled:
+            self._notify(job.on_cancel, job)
+        self._notify_positions(changed)
+        return cancelled
+    
+    def queue_depth(self):
+        with self.cond:
+            return self.queued_count
+    
+    def shutdown(self):
+        """إيقاف استقبال المهام وإنهاء العمال بعد المهام الجارية"""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+    
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.turns and not self.stopping:
+                    self.cond.wait()
+                if self.stopping:
+                    return
+                job = self._next_job()
+                changed = self._refresh_positions()
+            
+            self._notify_positions(changed)
+            context = log_context.set({'user_id': job.user_id, 'job_id': job.job_id})
+            try:
+                job.func(*job.args)
+            except Exception as e:
+                logger.error("Generation job %s failed: %s", job.job_id, e)
+            finally:
+                log_context.reset(context)
+                with self.cond:
+                    self.running.pop(job.job_id, None)
+                job.status = 'done'
+
+# 🔗 دمج طلبات الإنشاء المتطابقة الجارية (singleflight)
+class GenerationFlight:
+    """طلب إنشاء جارٍ واحد ومن ينتظر نتيجته؛ المنتظر الأول هو صاحب المهمة في الطابور"""
+    
+    def __init__(self, key):
+        self.key = key
+        self.waiters = []  # (user_id, user_state, chat_id, message_id)
+        self.done = False
+
+class SingleFlight:
+    """أول طلب لمفتاح ينفذ الإنشاء، والطلبات المطابقة أثناء تنفيذه تُسلَّم من نفس الاستجابة"""
+    
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+    
+    def join(self, key, waiter):
+        """يرجع (flight، هل هو القائد؟، هل هو تكرار من نفس المحادثة؟)"""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = GenerationFlight(key)
+                flight.waiters.append(waiter)
+                return flight, True, False
+            
+            duplicate = any(chat_id == waiter[2] for _, _, chat_id, _ in flight.waiters)
+            if not duplicate:
+                flight.waiters.append(waiter)
+        app_metrics.coalesced_requests.inc(source='duplicate' if duplicate else 'shared')
+        return flight, False, duplicate
+    
+    def leave(self, flight, waiter):
+        """خروج منتظر من الطلب (إلغاء مهمة القائد)؛ يرجع القائد الجديد أو None إذا لم يبقَ أحد"""
+        with self.lock:
+            flight.waiters = [other for other in flight.waiters if other is not waiter]
+            if flight.waiters:
+                return flight.waiters[0]
+            self._close(flight)
+            return None
+    
+    def complete(self, flight):
+        """إغلاق الطلب (نجاحاً أو فشلاً) وإرجاع كل المنتظرين؛ الطلبات اللاحقة تبدأ طلباً جديداً"""
+        with self.lock:
+            self._close(flight)
+            return list(flight.waiters)
+    
+    def cancel_user(self, user_id):
+        """إزالة انتظار المستخدم من الطلبات التي لا يقودها؛ يرجع المنتظرين المزالين"""
+        removed = []
+        with self.lock:
+            for flight in self.flights.values():
+                leader, followers = flight.waiters[0], flight.waiters[1:]
+                kept = [waiter for waiter in followers if waiter[0] != user_id]
+                if len(kept) != len(followers):
+                    removed.extend(waiter for waiter in followers if waiter[0] == user_id)
+                    flight.waiters = [leader] + kept
+        return removed
+    
+    def __len__(self):
+        with self.lock:
+            return len(self.flights)
+    
+    def _close(self, flight):
+        flight.done = True
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
 # 🌟 تهيئة الخدمات
 ai_service = AIService()
+atexit.register(ai_service.close)
+job_scheduler = JobScheduler(len(Config.DEEPSEEK_API_KEYS) * Config.GENERATION_WORKERS_PER_KEY)
+atexit.register(job_scheduler.shutdown)
+app_metrics.queue_depth.set_function(job_scheduler.queue_depth)
+app_metrics.jobs_running.set_function(lambda: len(job_scheduler.running))
+generation_flights = SingleFlight()
+app_metrics.flights_in_progress.set_function(lambda: len(generation_flights))
 ui_manager = UIManager()
 
 # 💫 نظام التتبع والتحليلات
 def track_user_activity(user_id, action, details=None):
-    """تتبع نشاط المستخدم"""
-    logger.info(f"User {user_id} performed {action}: {details}")
+    """تتبع نشاط المستخدم (مع أخذ عينة من الأحداث عالية الحجم)"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if Config.LOG_ACTIVITY_SAMPLE_RATE < 1 and random.random() >= Config.LOG_ACTIVITY_SAMPLE_RATE:
+        return
+    logger.info("User %s performed %s: %s", user_id, action, details,
+                extra={'user_id': user_id, 'event': action})
+
+def calculate_quality_score(project_data):
+    """حساب درجة جودة المشروع"""
+    return CodeFeatures.for_project(project_data).quality_score()
+
+# 🧩 خطوات المسار المشتركة بين وقتي التشغيل
+def register_user(user):
+    """حفظ بيانات مستخدم Telegram (كتابة خلفية)"""
+    full_name = " ".join(part for part in (user.first_name, user.last_name) if part)
+    db_manager.record_user(user.id, user.username, full_name, user.language_code)
+
+def start_website_flow(user_id):
+    """بدء مسار إنشاء موقع؛ يرجع False عند تجاوز حد المعدل"""
+    if not state_manager.check_rate_limit(user_id):
+        return False
+    
+    track_user_activity(user_id, "start_website_creation")
+    state_manager.set_user_state(user_id, {
+        'action': 'awaiting_project_type',
+        'project_category': 'website'
+    })
+    return True
+
+def select_project_type(user_id, project_type):
+    """حفظ نوع المشروع وإرجاع اسمه المعروض"""
+    type_name = UIManager.TYPE_NAMES.get(project_type, 'موقع ويب')
+    state_manager.set_user_state(user_id, {
+        'action': 'awaiting_description',
+        'project_category': 'website',
+        'project_type': project_type,
+        'type_name': type_name
+    })
+    return type_name
+
+def submit_description(user_id, user_state, description):
+    """التحقق من الوصف وحفظه؛ يرجع قائمة الملاحظات (فارغة عند القبول)"""
+    validation_issues = ai_service.validate_description(description, user_state['project_type'])
+    if validation_issues:
+        return validation_issues
+    
+    # حفظ الوصف والمتابعة لمرحلة الجودة
+    user_state['description'] = description
+    user_state['action'] = 'awaiting_quality'
+    state_manager.set_user_state(user_id, user_state)
+    
+    track_user_activity(user_id, "project_description_received", 
+                      f"type: {user_state['project_type']}, length: {len(description)}")
+    return []
+
+def select_quality(user_id, quality_level):
+    """حفظ مستوى الجودة؛ يرجع حالة المستخدم، أو None إذا انتهت الجلسة أو لم تكن تنتظر الجودة"""
+    user_state = state_manager.get_user_state(user_id)
+    # ضغطة مكررة أو لوحة مفاتيح قديمة: الطلب احتُسب بالفعل أو لم يكتمل وصفه
+    if not user_state or user_state['action'] != 'awaiting_quality':
+        return None
+    
+    user_state['quality'] = quality_level
+    user_state['quality_name'] = UIManager.QUALITY_NAMES.get(quality_level, 'أساسي')
+    mark_generating(user_id, user_state)
+    db_manager.count_user_request(user_id)
+    return user_state
+
+def find_similar_project(user_id, user_state):
+    """البحث عن مشروع سابق بوصف شبه مطابق؛ عند وجوده ينتظر البوت اختيار المستخدم"""
+    with app_metrics.phase_latency.time(phase='similar_lookup'):
+        similar = description_index.find(user_state['project_type'], user_state['description'])
+    if similar is None:
+        return None
+    
+    user_state['action'] = 'awaiting_similar_choice'
+    user_state['similar_project_id'] = similar[0]
+    state_manager.set_user_state(user_id, user_state)
+    track_user_activity(user_id, "similar_project_offered", f"similarity: {similar[1]:.2f}")
+    return similar
+
+def choose_similar_project(user_id, choice):
+    """تسجيل الاختيار؛ يرجع (حالة المستخدم، المشروع المشابه أو None لإنشاء جديد)، أو None إذا انتهت الجلسة"""
+    user_state = state_manager.get_user_state(user_id)
+    if not user_state or user_state['action'] != 'awaiting_similar_choice':
+        return None
+    
+    project_id = user_state.pop('similar_project_id', None)
+    user_state['action'] = 'awaiting_quality'
+    state_manager.set_user_state(user_id, user_state)
+    
+    project_data = description_index.load(project_id) if choice == 'use' and project_id else None
+    app_metrics.similar_choices.inc(choice='use' if project_data is not None else 'regenerate')
+    return user_state, project_data
+
+def project_cache_key(user_state):
+    return GenerationCache.make_key(user_state['project_type'], user_state['quality'], user_state['description'])
+
+def finalize_project(user_id, user_state, project_data):
+    """حساب الجودة وحفظ المشروع وتنظيف الحالة؛ يرجع درجة الجودة"""
+    # حساب درجة الجودة
+    quality_score = calculate_quality_score(project_data)
+    
+    # حفظ المشروع في قاعدة البيانات
+    db_manager.save_project(user_id, user_state['project_type'], user_state['description'],
+                            project_data, 'مكتمل', quality_score,
+                            requirements=f"جودة: {user_state['quality_name']}")
+    
+    # تنظيف حالة المستخدم
+    state_manager.clear_user_state(user_id)
+    
+    track_user_activity(user_id, "project_created_successfully", 
+                      f"quality: {user_state['quality_name']}, score: {quality_score}")
+    return quality_score
+
+def mark_generating(user_id, user_state):
+    """انتقال المحادثة إلى الإنشاء: الرسائل النصية تُجاب بحالة التقدم"""
+    user_state['action'] = 'generating'
+    state_manager.set_user_state(user_id, user_state)
+
+def reset_to_quality(user_id):
+    """إرجاع المحادثة لاختيار الجودة بعد فشل الإنشاء أو امتلاء الطابور لإعادة المحاولة"""
+    generation_journal.remove(user_id)
+    user_state = state_manager.get_user_state(user_id)
+    if user_state and user_state['action'] == 'generating':
+        user_state['action'] = 'awaiting_quality'
+        state_manager.set_user_state(user_id, user_state)
+
+def log_generation_error(user_id, error):
+    if isinstance(error, ValidationError):
+        db_manager.log_error(user_id, "validation_error", str(error))
+    elif isinstance(error, ProjectGenerationError):
+        db_manager.log_error(user_id, "generation_error", str(error))
+    else:
+        logger.error("Unexpected error in project creation: %s", error)
+        db_manager.log_error(user_id, "unexpected_error", str(error))
+
+def projects_page(user_id, before_id=None):
+    """صفحة "مشاريعي": (الصفوف، هل توجد صفحة أقدم)"""
+    page_size = Config.PROJECTS_PAGE_SIZE
+    rows = db_manager.list_projects(user_id, before_id, page_size + 1)
+    return rows[:page_size], len(rows) > page_size
+
+def stored_project_documents(user_id, project_id):
+    """تحميل مشروع محفوظ (المحتوى يُقرأ ويُفك ضغطه الآن فقط) وتجهيز مستنداته"""
+    loaded = db_manager.load_project(user_id, project_id)
+    if loaded is None:
+        return None
+    
+    meta, project_data = loaded
+    user_state = {
+        'project_type': meta['project_type'],
+        'type_name': UIManager.TYPE_NAMES.get(meta['project_type'], 'موقع ويب'),
+        'description': meta['description'],
+        'quality_name': (meta['requirements'] or '').replace('جودة: ', '', 1) or '—'
+    }
+    documents, _ = build_delivery(project_data, user_state, meta['quality_score'])
+    return documents
+
+def parse_callback_id(data, prefix):
+    try:
+        return int(data[len(prefix):])
+    except ValueError:
+        return None
+
+class ProgressThrottle:
+    """تحديد متى تُعدَّل رسالة التقدم احتراماً لحدود Telegram"""
+    
+    def __init__(self):
+        self.last_time = 0.0
+        self.last_text = None
+    
+    def next_text(self, bytes_received, section):
+        """نص التحديث التالي، أو None إذا لم يحن وقته أو لم يتغير"""
+        now = time.time()
+        if now - self.last_time < Config.PROGRESS_EDIT_INTERVAL:
+            return None
+        
+        text = UIManager.progress_text(bytes_received, section)
+        if text == self.last_text:
+            return None
+        
+        self.last_time = now
+        self.last_text = text
+        return text
 
-def calculate_quality_score(project_data):
-    """حساب درجة جودة المشروع"""
-    score = 0
+def build_project_files(project_data, user_state, quality_score):
+    """تجهيز ملفات المشروع في الذاكرة: (الاسم، العنوان، الوصف، المحتوى)"""
+    files = []
     
     if 'html' in project_data:
-        html = project_data['html']
-        if 'lang="ar"' in html:
-            score += 20
-        if 'viewport' in html:
-            score += 15
-        if 'semantic' in html.lower() or ('<header>' in html and '<footer>' in html):
-            score += 25
+        files.append(("index.html", "📄 index.html", "الملف الرئيسي للموقع", project_data['html']))
     
     if 'css' in project_data:
-        css = project_data['css']
-        if '@media' in css:
-            score += 20
-        if 'flex' in css or 'grid' in css:
-            score += 15
-        if 'animation' in css or 'transition' in css:
-            score += 10
+        files.append(("style.css", "🎨 style.css", "ملف التنسيق والتصميم", project_data['css']))
     
     if 'js' in project_data:
-        js = project_data['js']
-        if 'addEventListener' in js:
-            score += 10
-        if 'try' in js and 'catch' in js:
-            score += 15
+        files.append(("script.js", "⚡ script.js", "ملف التفاعلات والوظائف", project_data['js']))
+    
+    readme_content = create_readme_file(user_state, quality_score, project_data)
+    files.append(("README.md", "📋 دليل الاستخدام والشرح", "تعليمات التشغيل والتفاصيل", readme_content))
+    
+    return files
+
+def build_project_zip(files):
+    """بناء أرشيف ZIP في الذاكرة دون ملفات مؤقتة على القرص"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for file_name, _, _, content in files:
+            archive.writestr(file_name, content)
+    buffer.seek(0)
+    return buffer
+
+def build_delivery(project_data, user_state, quality_score):
+    """تجهيز المستندات المرسلة ونص النجاح: ([(الملف، الاسم، التعليق)]، النص)"""
+    files = build_project_files(project_data, user_state, quality_score)
+    
+    if Config.DELIVERY_MODE == 'zip':
+        # إرسال المشروع كاملاً في أرشيف واحد
+        file_list = "\n".join(f"• <code>{file_name}</code>" for file_name, _, _, _ in files)
+        documents = [(
+            build_project_zip(files),
+            f"{user_state['project_type']}_project.zip",
+            f"📦 <b>ملفات المشروع</b>\n{file_list}"
+        )]
+        files_summary = f"أرشيف ZIP يضم {len(files)} ملفات"
+        first_step = "فك ضغط الأرشيف في مجلد واحد"
+    else:
+        # إرسال كل ملف على حدة
+        documents = [
+            (io.BytesIO(content.encode('utf-8')), file_name, f"<b>{title}</b>\n{description}")
+            for file_name, title, description, content in files
+        ]
+        files_summary = f"{len(files) - 1} ملف"
+        first_step = "احفظ جميع الملفات في مجلد واحد"
+    
+    return documents, UIManager.success_text(user_state, quality_score, files_summary, first_step)
+
+# 🧭 توجيه التحديثات بجداول بدلاً من مرشحات متتالية
+class ConversationRouter:
+    """بحث واحد لكل تحديث: الأمر أو زر القائمة أو بادئة الزر أو حالة المحادثة الحالية"""
+    
+    def __init__(self):
+        self.commands = {}
+        self.menu = {}
+        self.callbacks = {}  # الجزء قبل أول "_" في callback_data
+        self.states = {}  # action → معالج (message, user_state)
     
-    return min(score, 100)
+    def command(self, *names):
+        return self._register(self.commands, names)
+    
+    def menu_item(self, *texts):
+        return self._register(self.menu, texts)
+    
+    def callback(self, *prefixes):
+        return self._register(self.callbacks, prefixes)
+    
+    def state(self, *actions):
+        return self._register(self.states, actions)
+    
+    def dispatch_message(self, message):
+        """استدعاء معالج الرسالة وإرجاع نتيجته أو None"""
+        text = message.text or ''
+        handler = self.menu.get(text)
+        if handler is None and text.startswith('/'):
+            handler = self.commands.get(text[1:].split(maxsplit=1)[0].partition('@')[0] if len(text) > 1 else '')
+        if handler is not None:
+            return handler(message)
+        
+        # قراءة واحدة لحالة المستخدم تكفي للتوجيه وتُمرَّر للمعالج
+        user_state = state_manager.get_user_state(message.from_user.id)
+        handler = self.states.get(user_state['action']) if user_state else None
+        if handler is not None:
+            return handler(message, user_state)
+        return None
+    
+    def dispatch_callback(self, call):
+        handler = self.callbacks.get((call.data or '').partition('_')[0])
+        return handler(call) if handler is not None else None
+    
+    @staticmethod
+    def _register(table, keys):
+        def decorator(handler):
+            for key in keys:
+                if key in table:
+                    raise ValueError(f"Route {key!r} already registered")
+                table[key] = handler
+            return handler
+        return decorator
+
+router = ConversationRouter()
 
 # 🚀 معالجات البوت الأساسية
-@bot.message_handler(commands=['start', 'help'])
+@router.command('start', 'help')
 def handle_start(message):
     user_id = message.from_user.id
     user_name = message.from_user.first_name
     
     track_user_activity(user_id, "start_command")
-    
-    welcome_text = f"""
-🎉 <b>مرحباً {user_name}!</b>
-
-🤖 <b>بوت إنشاء المواقع والتطبيقات بالذكاء الاصطناعي</b>
-
-✨ <b>المميزات المتقدمة:</b>
-• 🎯 <code>ذكاء اصطناعي متقدم</code> - DeepSeek AI
-• 🏗️ <code>تصميم احترافي</code> - أكواد جاهزة للإنتاج
-• 📱 <code>تصميم متجاوب</code> - يعمل على جميع الأجهزة
-• ⚡ <code>أداء ممتاز</code> - تحسينات السرعة والأداء
-• 🛡️ <code>جودة عالية</code> - معايير احترافية
-
-🚀 <b>لنبدأ رحلتك:</b>
-1. اختر نوع المشروع
-2. صف ما تريد بدقة
-3. اختر مستوى الجودة
-4. احصل على مشروعك الاحترافي
-
-🎯 <b>اختر من القائمة:</b>
-    """
+    register_user(message.from_user)
+    cancel_pending_generation(user_id)
     
     bot.send_message(
         message.chat.id,
-        welcome_text,
+        ui_manager.welcome_text(user_name),
         reply_markup=ui_manager.create_main_keyboard(),
         parse_mode="HTML"
     )
 
-@bot.message_handler(func=lambda msg: msg.text == "🌐 إنشاء موقع ويب")
+@router.menu_item("🌐 إنشاء موقع ويب")
 def handle_create_website(message):
     user_id = message.from_user.id
     
-    if not state_manager.check_rate_limit(user_id):
-        bot.send_message(
-            message.chat.id,
-            "⏳ <b>تم تجاوز الحد المسموح</b>\n\n"
-            "لقد استخدمت الحد الأقصى من الطلبات لهذه الساعة.\n"
-            "يرجى المحاولة مرة أخرى لاحقاً.",
-            parse_mode="HTML"
-        )
+    if not start_website_flow(user_id):
+        bot.send_message(message.chat.id, ui_manager.rate_limited_text(), parse_mode="HTML")
         return
     
-    track_user_activity(user_id, "start_website_creation")
-    
-    state_manager.set_user_state(user_id, {
-        'action': 'awaiting_project_type',
-        'project_category': 'website'
-    })
+    # إعادة بدء المسار تلغي أي طلب سابق لم يبدأ بعد
+    cancel_pending_generation(user_id)
     
     bot.send_message(
         message.chat.id,
-        "🌐 <b>مرحلة 1/3: اختر نوع الموقع</b>\n\n"
-        "📊 <b>الأنواع المتاحة:</b>\n"
-        "• <b>🛒 تجارة إلكترونية</b> - متاجر онлайн متكاملة\n"
-        "• <b>📊 موقع شركة</b> - مواقع مؤسسات احترافية\n"  
-        "• <b>🎓 تعليمي</b> - منصات تعلم إلكتروني\n"
-        "• <b>📝 شخصي</b> - portfolios وسير ذاتية\n"
-        "• <b>🍽️ مطعم</b> - قوائم طعام وحجوزات\n"
-        "• <b>⚕️ طبي</b> - عيادات وخدمات طبية\n\n"
-        "🎯 <b>اختر النوع المناسب:</b>",
+        ui_manager.website_type_text(),
         reply_markup=ui_manager.create_project_type_keyboard(),
         parse_mode="HTML"
     )
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('type_'))
-def handle_project_type_selection(call):
-    user_id = call.from_user.id
-    project_type = call.data.replace('type_', '')
+@router.menu_item("🚀 مشاريعي")
+def handle_my_projects(message):
+    rows, has_more = projects_page(message.from_user.id)
+    if not rows:
+        bot.send_message(message.chat.id, ui_manager.no_projects_text(), parse_mode="HTML")
+        return
     
-    type_names = {
-        'ecommerce': '🛒 موقع تجارة إلكترونية',
-        'corporate': '📊 موقع شركة',
-        'educational': '🎓 موقع تعليمي', 
-        'portfolio': '📝 موقع شخصي',
-        'restaurant': '🍽️ موقع مطعم',
-        'medical': '⚕️ موقع طبي'
-    }
+    bot.send_message(
+        message.chat.id,
+        ui_manager.my_projects_text(rows),
+        reply_markup=ui_manager.create_projects_keyboard(rows, has_more),
+        parse_mode="HTML"
+    )
+
+@router.menu_item("📊 إحصائياتي")
+def handle_my_stats(message):
+    stats = db_manager.get_user_stats(message.from_user.id)
+    bot.send_message(message.chat.id, ui_manager.user_stats_text(stats), parse_mode="HTML")
+
+@router.menu_item("ℹ️ المساعدة")
+def handle_help(message):
+    bot.send_message(message.chat.id, ui_manager.help_text(), parse_mode="HTML")
+
+@router.menu_item("📱 إنشاء تطبيق", "🛠️ الجودة والتحسين")
+def handle_coming_soon(message):
+    bot.send_message(message.chat.id, ui_manager.coming_soon_text(message.text), parse_mode="HTML")
+
+@router.state('awaiting_project_type', 'awaiting_quality', 'awaiting_similar_choice')
+def handle_pending_choice(message, user_state):
+    bot.send_message(message.chat.id, ui_manager.choose_from_buttons_text())
+
+@router.state('generating')
+def handle_generating(message, user_state):
+    bot.send_message(message.chat.id, ui_manager.generation_in_progress_text(), parse_mode="HTML")
+
+@router.callback('projects')
+def handle_projects_page(call):
+    before_id = parse_callback_id(call.data, 'projects_before_')
+    rows, has_more = projects_page(call.from_user.id, before_id)
+    if not rows:
+        bot.answer_callback_query(call.id)
+        return
     
-    state_manager.set_user_state(user_id, {
-        'action': 'awaiting_description',
-        'project_category': 'website',
-        'project_type': project_type,
-        'type_name': type_names.get(project_type, 'موقع ويب')
-    })
+    bot.edit_message_text(
+        ui_manager.my_projects_text(rows),
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=ui_manager.create_projects_keyboard(rows, has_more),
+        parse_mode="HTML"
+    )
+    bot.answer_callback_query(call.id)
+
+@router.callback('project')
+def handle_project_download(call):
+    bot.answer_callback_query(call.id)
+    project_id = parse_callback_id(call.data, 'project_dl_')
+    documents = stored_project_documents(call.from_user.id, project_id) if project_id else None
+    
+    if documents is None:
+        bot.send_message(call.message.chat.id, ui_manager.project_not_found_text(), parse_mode="HTML")
+        return
+    
+    for document, file_name, caption in documents:
+        telegram_retry(
+            bot.send_document,
+            call.message.chat.id,
+            document,
+            visible_file_name=file_name,
+            caption=caption,
+            parse_mode="HTML"
+        )
+
+@router.callback('type')
+def handle_project_type_selection(call):
+    user_id = call.from_user.id
+    type_name = select_project_type(user_id, call.data.replace('type_', ''))
     
     bot.edit_message_text(
-        f"🎯 <b>مرحلة 2/3: وصف المشروع</b>\n\n"
-        f"📝 <b>النوع المحدد:</b> {type_names.get(project_type, 'موقع ويب')}\n\n"
-        f"💡 <b>الآن صف مشروعك بالتفصيل:</b>\n"
-        f"• الألوان المفضلة\n• الوظائف المطلوبة\n• المحتوى الرئيسي\n• أي متطلبات خاصة\n\n"
-        f"📋 <b>مثال احترافي:</b>\n"
-        f"<i>\"أريد موقع شركة بمجال التقنية بالألوان الأزرق والأبيض، يحتوي على:\n"
-        f"- صفحة رئيسية مع شريط تمرير للميزات\n"
-        f"- صفحة عن الشركة مع فريق العمل\n"  
-        f"- صفحة خدمات مع تفاصيل كل خدمة\n"
-        f"- نموذج اتصال متكامل\n"
-        f"- تصميم عصري مع تأثيرات scroll\"</i>\n\n"
-        f"🎯 <b>اكتب وصفك الآن:</b>",
+        ui_manager.description_prompt_text(type_name),
         call.message.chat.id,
         call.message.message_id,
         parse_mode="HTML"
     )
 
-@bot.message_handler(func=lambda msg: state_manager.get_user_state(msg.from_user.id) and 
-                   state_manager.get_user_state(msg.from_user.id)['action'] == 'awaiting_description')
-def handle_project_description(message):
+@router.state('awaiting_description')
+def handle_project_description(message, user_state):
     user_id = message.from_user.id
-    user_state = state_manager.get_user_state(user_id)
     description = message.text.strip()
     
     try:
         # التحقق من جودة الوصف
-        validation_issues = ai_service.validate_description(description, user_state['project_type'])
+        validation_issues = submit_description(user_id, user_state, description)
         if validation_issues:
-            error_msg = "\n".join([f"• {issue}" for issue in validation_issues])
             bot.send_message(
                 message.chat.id,
-                f"⚠️ <b>تحسينات مقترحة للوصف:</b>\n\n{error_msg}\n\n"
-                f"📝 <b>يرجى تعديل الوصف وإعادة إرساله:</b>",
+                ui_manager.description_issues_text(validation_issues),
                 parse_mode="HTML"
             )
             return
         
-        # حفظ الوصف والمتابعة لمرحلة الجودة
-        user_state['description'] = description
-        user_state['action'] = 'awaiting_quality'
-        state_manager.set_user_state(user_id, user_state)
-        
-        track_user_activity(user_id, "project_description_received", 
-                          f"type: {user_state['project_type']}, length: {len(description)}")
-        
         bot.send_message(
             message.chat.id,
-            f"✅ <b>تم استلام الوصف بنجاح!</b>\n\n"
-            f"📝 <b>ملخص الطلب:</b>\n"
-            f"• <b>النوع:</b> {user_state['type_name']}\n"
-            f"• <b>الوصف:</b> {description[:100]}...\n\n"
-            f"🎯 <b>مرحلة 3/3: مستوى الجودة</b>\n\n"
-            f"⭐ <b>مستويات الجودة:</b>\n"
-            f"• <b>أساسي</b> - تصميم بسيط وظيفي\n"
-            f"• <b>متقدم</b> - تصميم متجاوب بميزات إضافية\n"
-            f"• <b>احترافي</b> - تصميم احترافي مع تأثيرات متقدمة\n"
-            f"• <b>ممتاز</b> - أعلى مستوى من الجودة والتفاصيل\n\n"
-            f"💎 <b>اختر مستوى الجودة المطلوب:</b>",
+            ui_manager.quality_prompt_text(user_state['type_name'], description),
             reply_markup=ui_manager.create_quality_options_keyboard(),
             parse_mode="HTML"
         )
         
     except Exception as e:
-        logger.error(f"Error processing description for user {user_id}: {e}")
+        logger.error("Error processing description for user %s: %s", user_id, e)
         db_manager.log_error(user_id, "description_processing", str(e))
         
-        bot.send_message(
-            message.chat.id,
-            "❌ <b>حدث خطأ أثناء معالجة الوصف</b>\n\n"
-            "يرجى المحاولة مرة أخرى أو الاتصال بالدعم.",
-            parse_mode="HTML"
-        )
+        bot.send_message(message.chat.id, ui_manager.description_error_text(), parse_mode="HTML")
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('quality_'))
+@router.callback('quality')
 def handle_quality_selection(call):
     user_id = call.from_user.id
-    quality_level = call.data.replace('quality_', '')
-    user_state = state_manager.get_user_state(user_id)
+    user_state = select_quality(user_id, call.data.replace('quality_', ''))
     
     if not user_state:
-        bot.send_message(call.message.chat.id, "❌ انتهت الجلسة. يرجى البدء من جديد.")
+        bot.send_message(call.message.chat.id, ui_manager.session_expired_text())
         return
     
-    quality_names = {
-        'basic': '⭐ أساسي',
-        'advanced': '⭐⭐ متقدم', 
-        'pro': '⭐⭐⭐ احترافي',
-        'premium': '⭐⭐⭐⭐ ممتاز'
-    }
+    chat_id, message_id = call.message.chat.id, call.message.message_id
     
-    user_state['quality'] = quality_level
-    user_state['quality_name'] = quality_names.get(quality_level, 'أساسي')
-    state_manager.set_user_state(user_id, user_state)
+    # بدء عملية الإنشاء: فشل تعديل الرسالة يجب ألا يوقف الطلب
+    try:
+        telegram_retry(
+            bot.edit_message_text,
+            ui_manager.generation_started_text(user_state['type_name'], user_state['quality_name']),
+            chat_id,
+            message_id
+        )
+    except Exception as e:
+        logger.warning("Failed to edit generation message for user %s: %s", user_id, e)
     
-    # بدء عملية الإنشاء
-    bot.edit_message_text(
-        f"🚀 <b>بدء الإنشاء...</b>\n\n"
-        f"📊 <b>تفاصيل الطلب:</b>\n"
-        f"• <b>النوع:</b> {user_state['type_name']}\n"
-        f"• <b>الجودة:</b> {quality_names.get(quality_level, 'أساسي')}\n"
-        f"• <b>الحالة:</b> جاري المعالجة...\n\n"
-        f"⏳ <b>قد تستغرق العملية 1-2 دقائق</b>\n"
-        f"🤖 <b>جاري استخدام الذكاء الاصطناعي...</b>",
-        call.message.chat.id,
-        call.message.message_id
-    )
+    # تقديم المشروع مباشرة إذا سبق إنشاء طلب مطابق
+    if Config.CACHE_ENABLED:
+        cached_project = generation_cache.get(project_cache_key(user_state))
+        if cached_project is not None:
+            track_user_activity(user_id, "project_served_from_cache")
+            deliver_project(user_id, user_state, chat_id, cached_project)
+            return
     
-    # إنشاء المشروع في thread منفصل
-    threading.Thread(
-        target=create_project_background,
-        args=(user_id, user_state, call.message.chat.id, call.message.message_id)
-    ).start()
+    # عرض مشروع سابق بوصف شبه مطابق قبل طلب جديد لـ DeepSeek
+    if Config.SIMILAR_ENABLED:
+        similar = find_similar_project(user_id, user_state)
+        if similar is not None:
+            bot.edit_message_text(
+                ui_manager.similar_project_text(similar[1]),
+                chat_id,
+                message_id,
+                reply_markup=ui_manager.create_similar_project_keyboard(),
+                parse_mode="HTML"
+            )
+            return
+    
+    start_generation(user_id, user_state, chat_id, message_id)
 
-def create_project_background(user_id, user_state, chat_id, message_id):
-    """إنشاء المشروع في الخلفية"""
+@router.callback('similar')
+def handle_similar_choice(call):
+    user_id = call.from_user.id
+    chosen = choose_similar_project(user_id, call.data.replace('similar_', ''))
+    
+    if chosen is None:
+        bot.send_message(call.message.chat.id, ui_manager.session_expired_text())
+        return
+    
+    user_state, project_data = chosen
+    chat_id, message_id = call.message.chat.id, call.message.message_id
     try:
-        # تحديث حالة التقدم
-        progress_messages = [
-            "🔍 تحليل المتطلبات...",
-            "🎨 تصميم الواجهة...", 
-            "⚡ برمجة الوظائف...",
-            "📱 تحسين التجربة...",
-            "🛠️ مراجعة الجودة..."
-        ]
-        
-        for i, progress_msg in enumerate(progress_messages):
-            time.sleep(2)  # محاكاة التقدم
-            try:
-                bot.edit_message_text(
-                    f"🚀 <b>جاري الإنشاء...</b>\n\n"
-                    f"📊 <b>التقدم:</b> {(i+1)*20}%\n"
-                    f"🔧 <b>المرحلة:</b> {progress_msg}\n\n"
-                    f"⏳ <b>يرجى الانتظار...</b>",
-                    chat_id,
-                    message_id
-                )
-            except:
-                pass  # تجاهل أخطاء تعديل الرسالة
-        
-        # إنشاء المشروع باستخدام الذكاء الاصطناعي
-        project_data = ai_service.generate_project(
-            description=user_state['description'],
-            project_type=user_state['project_type'],
-            requirements=f"جودة: {user_state['quality_name']}",
-            user_id=user_id
-        )
-        
-        # حساب درجة الجودة
-        quality_score = calculate_quality_score(project_data)
-        
-        # حفظ المشروع في قاعدة البيانات
-        with sqlite3.connect('ai_creator.db') as conn:
-            conn.execute('''INSERT INTO projects 
-                         (user_id, project_type, description, project_data, status, quality_score, created_at, updated_at)
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                         (user_id, user_state['project_type'], user_state['description'],
-                          json.dumps(project_data), 'مكتمل', quality_score,
-                          datetime.now().isoformat(), datetime.now().isoformat()))
-        
-        # إرسال الملفات
-        send_project_files(chat_id, project_data, user_state, quality_score)
-        
-        # تنظيف حالة المستخدم
-        state_manager.clear_user_state(user_id)
-        
-        track_user_activity(user_id, "project_created_successfully", 
-                          f"quality: {user_state['quality_name']}, score: {quality_score}")
-        
-    except ValidationError as e:
-        error_msg = str(e)
-        bot.edit_message_text(
-            f"❌ <b>خطأ في التحقق</b>\n\n{error_msg}\n\n"
-            f"📝 يرجى تعديل الوصف وإعادة المحاولة.",
-            chat_id, message_id
-        )
-        db_manager.log_error(user_id, "validation_error", error_msg)
-        
-    except ProjectGenerationError as e:
-        error_msg = str(e)
-        bot.edit_message_text(
-            f"❌ <b>خطأ في الإنشاء</b>\n\n{error_msg}\n\n"
-            f"🔄 يرجى المحاولة مرة أخرى.",
-            chat_id, message_id
+        telegram_retry(
+            bot.edit_message_text,
+            ui_manager.generation_started_text(user_state['type_name'], user_state['quality_name']),
+            chat_id,
+            message_id
         )
-        db_manager.log_error(user_id, "generation_error", error_msg)
-        
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Unexpected error in project creation: {e}")
-        bot.edit_message_text(
-            f"❌ <b>خطأ غير متوقع</b>\n\n{error_msg}\n\n"
-            f"🛠️ تم تسجيل الخطأ وسيتم معالجته.",
-            chat_id, message_id
-        )
-        db_manager.log_error(user_id, "unexpected_error", error_msg)
+        logger.warning("Failed to edit generation message for user %s: %s", user_id, e)
+    
+    if project_data is not None:
+        track_user_activity(user_id, "project_served_from_similar")
+        deliver_project(user_id, user_state, chat_id, project_data)
+        return
+    
+    start_generation(user_id, user_state, chat_id, message_id)
 
-def send_project_files(chat_id, project_data, user_state, quality_score):
-    """إرسال ملفات المشروع بشكل احترافي"""
+# مرشح واحد لكل نوع تحديث؛ التوجيه الفعلي في جداول router
+@bot.message_handler(content_types=['text'])
+def dispatch_message(message):
+    router.dispatch_message(message)
+
+@bot.callback_query_handler(func=lambda call: True)
+def dispatch_callback(call):
+    router.dispatch_callback(call)
+
+def start_generation(user_id, user_state, chat_id, message_id):
+    """الانضمام لطلب مطابق جارٍ أو إضافة طلب جديد إلى الطابور"""
+    mark_generating(user_id, user_state)
+    flight_key = project_cache_key(user_state)
+    generation_journal.record(user_id, flight_key, chat_id, message_id, user_state)
+    
+    # الطلبات المطابقة الجارية تنتظر نفس الاستجابة بدلاً من طلب جديد لـ DeepSeek
+    # نفس الكائن للانضمام والتقديم: leave تقارن المنتظرين بالهوية
+    waiter = (user_id, user_state, chat_id, message_id)
+    flight, is_leader, is_duplicate = generation_flights.join(flight_key, waiter)
+    if not is_leader:
+        if not is_duplicate:
+            track_user_activity(user_id, "project_generation_coalesced")
+            try:
+                telegram_retry(bot.edit_message_text, ui_manager.coalesced_text(), chat_id, message_id, parse_mode="HTML")
+            except Exception:
+                pass  # تجاهل أخطاء تعديل الرسالة
+        return
+    
+    submit_generation(flight, waiter)
+
+def submit_generation(flight, leader):
+    """إضافة مهمة القائد إلى طابور الإنشاء؛ إلغاؤها ينقل القيادة لأول منتظر"""
+    user_id, user_state, chat_id, message_id = leader
     
-    with tempfile.TemporaryDirectory() as tmp_dir:
+    def on_cancel(job):
+        # نقل القيادة أولاً: فشل تعديل الرسالة يجب ألا يترك الطلب المشترك دون مهمة
+        next_leader = generation_flights.leave(flight, leader)
+        if next_leader is not None:
+            submit_generation(flight, next_leader)
         try:
-            # إعداد الملفات
-            files_to_send = []
-            
-            if 'html' in project_data:
-                html_file = os.path.join(tmp_dir, "index.html")
-                with open(html_file, 'w', encoding='utf-8') as f:
-                    f.write(project_data['html'])
-                files_to_send.append(("📄 index.html", html_file, "الملف الرئيسي للموقع"))
-            
-            if 'css' in project_data:
-                css_file = os.path.join(tmp_dir, "style.css")
-                with open(css_file, 'w', encoding='utf-8') as f:
-                    f.write(project_data['css'])
-                files_to_send.append(("🎨 style.css", css_file, "ملف التنسيق والتصميم"))
-            
-            if 'js' in project_data:
-                js_file = os.path.join(tmp_dir, "script.js")
-                with open(js_file, 'w', encoding='utf-8') as f:
-                    f.write(project_data['js'])
-                files_to_send.append(("⚡ script.js", js_file, "ملف التفاعلات والوظائف"))
-            
-            # إرسال الملفات
-            for file_name, file_path, description in files_to_send:
-                with open(file_path, 'rb') as file:
-                    bot.send_document(
-                        chat_id,
-                        file,
-                        caption=f"<b>{file_name}</b>\n{description}",
-                        parse_mode="HTML"
-                    )
-                time.sleep(1)  # تجنب rate limiting
-            
-            # إرسال ملف التعليمات
-            readme_content = create_readme_file(user_state, quality_score, project_data)
-            readme_file = os.path.join(tmp_dir, "README.md")
-            with open(readme_file, 'w', encoding='utf-8') as f:
-                f.write(readme_content)
-            
-            with open(readme_file, 'rb') as file:
-                bot.send_document(
-                    chat_id,
-                    file,
-                    caption="📋 <b>دليل الاستخدام والشرح</b>\nتعليمات التشغيل والتفاصيل",
-                    parse_mode="HTML"
-                )
-            
-            # رسالة النجاح النهائية
-            success_text = f"""
-🎉 <b>تم الإنشاء بنجاح!</b>
+            bot.edit_message_text(ui_manager.job_cancelled_text(), chat_id, message_id)
+        except Exception:
+            pass  # تجاهل أخطاء تعديل الرسالة
+    
+    job = GenerationJob(
+        user_id,
+        create_project_background,
+        args=(user_id, user_state, chat_id, message_id, flight),
+        on_position=create_queue_position_reporter(chat_id, message_id),
+        on_cancel=on_cancel
+    )
+    position = job_scheduler.submit(job)
+    
+    if position is None:
+        for waiter_user_id, _, waiter_chat_id, waiter_message_id in generation_flights.complete(flight):
+            reset_to_quality(waiter_user_id)
+            bot.edit_message_text(ui_manager.queue_full_text(), waiter_chat_id, waiter_message_id)
+        return
+    
+    if job.status == 'queued':
+        job.on_position(position)
 
-📊 <b>تفاصيل المشروع:</b>
-• <b>النوع:</b> {user_state['type_name']}
-• <b>الجودة:</b> {user_state['quality_name']}
-• <b>درجة الجودة:</b> {quality_score}/100
-• <b>الملفات:</b> {len(files_to_send)} ملف
+def cancel_pending_generation(user_id):
+    """إلغاء ما لم يبدأ من طلبات المستخدم: انتظاره لطلبات الآخرين ومهامه في الطابور"""
+    for _, _, chat_id, message_id in generation_flights.cancel_user(user_id):
+        try:
+            bot.edit_message_text(ui_manager.job_cancelled_text(), chat_id, message_id)
+        except Exception:
+            pass  # تجاهل أخطاء تعديل الرسالة
+    job_scheduler.cancel_user(user_id)
+    generation_journal.remove(user_id)
 
-🚀 <b>خطوات التشغيل:</b>
-1. احفظ جميع الملفات في مجلد واحد
-2. افتح ملف index.html في المتصفح
-3. استمتع بموقعك الجديد!
+def create_queue_position_reporter(chat_id, message_id):
+    """إنشاء دالة عرض موقع الطلب في الطابور"""
+    def report(position):
+        if not position:
+            return
+        try:
+            bot.edit_message_text(ui_manager.queue_position_text(position), chat_id, message_id)
+        except Exception:
+            pass  # تجاهل أخطاء تعديل الرسالة
+    
+    return report
 
-💡 <b>نصائح مهمة:</b>
-• يمكنك تعديل الألوان في ملف style.css
-• يمكنك إضافة محتوى جديد في index.html
-• الموقع جاهز للتطوير والإضافة
+def create_project_progress_reporter(chat_id, message_id):
+    """إنشاء دالة تحديث رسالة التقدم من البيانات المتدفقة الفعلية"""
+    throttle = ProgressThrottle()
+    
+    def report(bytes_received, section):
+        text = throttle.next_text(bytes_received, section)
+        if text is None:
+            return
+        try:
+            bot.edit_message_text(text, chat_id, message_id)
+        except Exception:
+            pass  # تجاهل أخطاء تعديل الرسالة
+    
+    return report
 
-🔧 <b>لإنشاء مشروع جديد:</b>
-اختر "إنشاء موقع ويب" من القائمة الرئيسية.
-            """
-            
-            bot.send_message(chat_id, success_text, parse_mode="HTML")
+def create_project_background(user_id, user_state, chat_id, message_id, flight=None):
+    """إنشاء المشروع في الخلفية وتسليمه لكل من ينتظر نفس الطلب"""
+    phases = app_metrics.phase_latency
+    waiters = [(user_id, user_state, chat_id, message_id)]
+    try:
+        with phases.time(phase='job'):
+            try:
+                # إنشاء المشروع باستخدام الذكاء الاصطناعي مع تحديث التقدم الفعلي
+                with phases.time(phase='generate'):
+                    project_data = ai_service.generate_project(
+                        description=user_state['description'],
+                        project_type=user_state['project_type'],
+                        requirements=f"جودة: {user_state['quality_name']}",
+                        user_id=user_id,
+                        on_progress=create_project_progress_reporter(chat_id, message_id)
+                    )
+                
+                generation_journal.store_result(project_cache_key(user_state), project_data)
+                if Config.CACHE_ENABLED:
+                    with phases.time(phase='cache_store'):
+                        generation_cache.put(project_cache_key(user_state), project_data)
+            finally:
+                if flight is not None:
+                    waiters = generation_flights.complete(flight)
             
-        except Exception as e:
-            logger.error(f"Error sending files: {e}")
-            bot.send_message(
+            with phases.time(phase='deliver'):
+                for waiter_user_id, waiter_state, waiter_chat_id, _ in waiters:
+                    try:
+                        deliver_project(waiter_user_id, waiter_state, waiter_chat_id, project_data)
+                    except Exception as e:
+                        logger.error("Error delivering shared project to user %s: %s", waiter_user_id, e)
+                generation_journal.finish(project_cache_key(user_state), waiters)
+        
+    except Exception as e:
+        for waiter_user_id, _, waiter_chat_id, waiter_message_id in waiters:
+            try:
+                bot.edit_message_text(ui_manager.generation_error_text(e), waiter_chat_id, waiter_message_id)
+            except Exception:
+                pass  # تجاهل أخطاء تعديل الرسالة
+            log_generation_error(waiter_user_id, e)
+            reset_to_quality(waiter_user_id)
+
+def deliver_project(user_id, user_state, chat_id, project_data):
+    """حفظ المشروع وإرسال ملفاته للمستخدم"""
+    quality_score = finalize_project(user_id, user_state, project_data)
+    send_project_files(chat_id, project_data, user_state, quality_score)
+
+def recover_generations():
+    """إعادة التشغيل الدافئ: تسليم ما وصلت استجابته، وإعادة ما لم تصل استجابته إلى الطابور"""
+    for flight_key, project_data, waiters in generation_journal.pending():
+        if project_data is None:
+            for waiter in waiters:
+                try:
+                    start_generation(*waiter)
+                except Exception as e:
+                    logger.error("Failed to resubmit generation for user %s: %s", waiter[0], e)
+            app_metrics.warm_restarts.inc(len(waiters), kind='resubmitted')
+            continue
+        
+        for waiter_user_id, waiter_state, waiter_chat_id, _ in waiters:
+            try:
+                deliver_project(waiter_user_id, waiter_state, waiter_chat_id, project_data)
+            except Exception as e:
+                logger.error("Error redelivering project to user %s: %s", waiter_user_id, e)
+        generation_journal.finish(flight_key, waiters)
+        app_metrics.warm_restarts.inc(len(waiters), kind='redelivered')
+
+def send_project_files(chat_id, project_data, user_state, quality_score):
+    """إرسال ملفات المشروع بشكل احترافي"""
+    
+    try:
+        documents, success_text = build_delivery(project_data, user_state, quality_score)
+        
+        for i, (document, file_name, caption) in enumerate(documents):
+            if i:
+                time.sleep(Config.FILE_SEND_INTERVAL)  # تجنب rate limiting
+            telegram_retry(
+                bot.send_document,
                 chat_id,
-                f"❌ <b>خطأ في إرسال الملفات</b>\n\n{str(e)}",
+                document,
+                visible_file_name=file_name,
+                caption=caption,
                 parse_mode="HTML"
             )
+        
+        # رسالة النجاح النهائية
+        telegram_retry(bot.send_message, chat_id, success_text, parse_mode="HTML")
+        
+    except Exception as e:
+        logger.error("Error sending files: %s", e)
+        telegram_retry(bot.send_message, chat_id, ui_manager.send_files_error_text(e), parse_mode="HTML")
 
 def create_readme_file(user_state, quality_score, project_data):
     """إنشاء ملف README احترافي"""
@@ -938,14 +4483,190 @@ def create_readme_file(user_state, quality_score, project_data):
 تم إنشاء هذا المشروع باستخدام الذكاء الاصطناعي المتقدم
 """
 
+# ⚡ وقت تشغيل asyncio: استقبال التحديثات على حلقة الأحداث، ونفس المعالجات المتزامنة في خيوط
+def register_async_handlers(async_bot):
+    """ربط AsyncTeleBot بجداول router: SQLite والحالة وTelegram المتزامن تعمل خارج الحلقة"""
+    
+    @async_bot.message_handler(content_types=['text'])
+    async def dispatch_message_async(message):
+        await asyncio.to_thread(router.dispatch_message, message)
+    
+    @async_bot.callback_query_handler(func=lambda call: True)
+    async def dispatch_callback_async(call):
+        await asyncio.to_thread(router.dispatch_callback, call)
+
+async def run_asyncio_runtime():
+    """تشغيل استقبال التحديثات على AsyncTeleBot؛ المسار ومهام الإنشاء مشتركة مع وقت التشغيل المتزامن"""
+    if AsyncTeleBot is None:
+        raise RuntimeError("Config.RUNTIME = 'asyncio' requires aiohttp")
+    
+    # نفس عدد خيوط المعالجات في وقت التشغيل المتزامن
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=Config.BOT_WORKER_THREADS, thread_name_prefix='handler')
+    )
+    async_bot = AsyncTeleBot(Config.BOT_TOKEN, parse_mode="HTML")
+    if Config.METRICS_ENABLED:
+        instrument_async_telegram()
+    register_async_handlers(async_bot)
+    
+    try:
+        await async_bot.delete_webhook()
+        await async_bot.infinity_polling(timeout=60, request_timeout=90)
+    finally:
+        await async_bot.close_session()
+
+# 🌐 استقبال التحديثات عبر Webhook
+class _WebhookHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class WebhookServer:
+    """خادم HTTP يستقبل تحديثات Telegram، يتحقق من السر، يرد فوراً ثم يوزعها على العمال"""
+    
+    def __init__(self, telegram_bot, host, port, path, secret=None):
+        self.bot = telegram_bot
+        self.path = path
+        self.secret = secret
+        self.stats = {'received': 0, 'rejected': 0, 'invalid': 0}
+        self.stats_lock = threading.Lock()
+        self.httpd = _WebhookHTTPServer((host, port), self._make_handler())
+    
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+    
+    def serve_forever(self):
+        self.httpd.serve_forever()
+    
+    def start(self):
+        """تشغيل الخادم في خيط خلفي"""
+        thread = threading.Thread(target=self.serve_forever, name='webhook-server', daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def dispatch(self, body):
+        """تحويل JSON إلى Update وتمريره لمجموعة عمال البوت"""
+        try:
+            update = telebot.types.Update.de_json(body.decode('utf-8'))
+        except Exception as e:
+            # JSON صالح بشكل غير متوقع يرفع KeyError/TypeError: رد 500 يعني إعادة إرسال Telegram بلا نهاية
+            self._count('invalid')
+            logger.warning("Invalid webhook update: %s", e)
+            return
+        self.bot.process_new_updates([update])
+    
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+    
+    def _make_handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # إبقاء الاتصال مفتوحاً بين التحديثات
+            disable_nagle_algorithm = True
+            
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                
+                if server.secret:
+                    token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+                    if not hmac.compare_digest(token, server.secret):
+                        server._count('rejected')
+                        self._reply(403)
+                        return
+                
+                length = int(self.headers.get('Content-Length') or 0)
+                if length <= 0 or length > Config.WEBHOOK_MAX_BODY:
+                    self._reply(413 if length else 400)
+                    return
+                body = self.rfile.read(length)
+                
+                # الرد فوراً حتى لا ينتظر Telegram معالجة التحديث
+                self._reply(200)
+                server._count('received')
+                server.dispatch(body)
+            
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                if status != 200:
+                    # الرفض المبكر لا يقرأ الجسم، فبقاياه ستُقرأ كطلب تالٍ على نفس الاتصال
+                    self.send_header('Connection', 'close')
+                    self.close_connection = True
+                self.end_headers()
+                self.wfile.flush()
+            
+            def log_message(self, format, *args):
+                pass  # سجلات الطلبات عبر logger فقط
+        
+        return Handler
+
+def run_polling():
+    bot.remove_webhook()
+    bot.infinity_polling(timeout=60, long_polling_timeout=30)
+
+def run_webhook():
+    """تشغيل وضع Webhook، والعودة إلى polling إذا فشل التسجيل"""
+    secret = Config.WEBHOOK_SECRET
+    
+    if Config.WEBHOOK_URL:
+        secret = secret or secrets.token_urlsafe(32)
+        try:
+            bot.remove_webhook()
+            bot.set_webhook(
+                url=Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH,
+                secret_token=secret,
+                max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+            )
+        except Exception as e:
+            logger.error("Webhook registration failed, falling back to polling: %s", e)
+            run_polling()
+            return
+    elif not secret:
+        logger.warning("Webhook running locally without a secret token")
+    
+    server = WebhookServer(bot, Config.WEBHOOK_LISTEN, Config.WEBHOOK_PORT, Config.WEBHOOK_PATH, secret)
+    logger.info("🌐 Webhook listening on %s:%s%s", Config.WEBHOOK_LISTEN, server.port, Config.WEBHOOK_PATH)
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
+
+def handle_sigterm(signum, frame):
+    """SIGTERM من docker/systemd: إيقاف الاستقبال والخروج عبر sys.exit حتى تعمل دوال atexit"""
+    logger.info("🛑 SIGTERM received, shutting down...")
+    bot.stop_polling()
+    # SystemExit يخرج من polling / serve_forever / asyncio.run ثم تُفرَّغ طوابير الكتابة والسجلات
+    sys.exit(0)
+
 # 🎯 تشغيل البوت
 if __name__ == "__main__":
     logger.info("🚀 Starting Advanced AI Project Creator Bot...")
-    logger.info(f"🔑 Available API Keys: {len(Config.DEEPSEEK_API_KEYS)}")
+    logger.info("🔑 Available API Keys: %s", len(Config.DEEPSEEK_API_KEYS))
     logger.info("💫 Bot is ready and listening...")
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    if Config.METRICS_ENABLED:
+        metrics_server = MetricsServer(metrics_registry, Config.METRICS_LISTEN, Config.METRICS_PORT)
+        metrics_server.start()
+        logger.info("📈 Metrics on http://%s:%s/metrics", Config.METRICS_LISTEN, metrics_server.port)
+    
+    threading.Thread(target=recover_generations, name='warm-restart', daemon=True).start()
     
     try:
-        bot.infinity_polling(timeout=60, long_polling_timeout=30)
+        if Config.RUNTIME == 'asyncio':
+            asyncio.run(run_asyncio_runtime())
+        elif Config.UPDATE_MODE == 'webhook':
+            run_webhook()
+        else:
+            run_polling()
     except Exception as e:
-        logger.critical(f"Bot crashed: {e}")
+        logger.critical("Bot crashed: %s", e)
         raise
\ No newline at end of file
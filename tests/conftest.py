@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# استيراد الوحدة ينشئ قاعدة البيانات والسجل في المجلد الحالي: مجلد مؤقت بدلاً من المستودع
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix='tests_'))
+
+import deepseek_python_20251127_e330aa as app  # noqa: E402
+
+
+class FakeClock:
+    """ساعة يدوية تُمرَّر كـ clock بدلاً من time.monotonic"""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,49 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+import deepseek_python_20251127_e330aa as app
+
+
+@pytest.fixture
+def stalled_server():
+    """خادم يقبل الاتصال ولا يرسل الترويسات أبداً"""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    accepted = []
+    
+    def accept():
+        while True:
+            try:
+                accepted.append(server.accept()[0])
+            except OSError:
+                return
+    
+    threading.Thread(target=accept, daemon=True).start()
+    yield 'http://127.0.0.1:%d/' % server.getsockname()[1]
+    server.close()
+    for connection in accepted:
+        connection.close()
+
+
+def session():
+    session = requests.Session()
+    session.mount('http://', app.CancellableHTTPAdapter())
+    return session
+
+
+def test_cancel_aborts_request_waiting_for_headers(stalled_server):
+    cancellation = app.RequestCancellation()
+    threading.Timer(0.2, cancellation.set).start()
+    
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        with cancellation.track():
+            session().post(stalled_server, data=b'{}', timeout=30)
+    assert time.monotonic() - start < 5
+    assert cancellation.connections == {}
+
@@ -0,0 +1,38 @@
+import deepseek_python_20251127_e330aa as app
+
+
+def analyze(html='', css='', js=''):
+    return app.CodeFeatures.analyze({'html': html, 'css': css, 'js': js})
+
+
+def test_js_features_in_code():
+    features = analyze(js='try { run(); } catch (e) {}\nbutton.addEventListener("click", run);')
+    
+    assert features.error_handling and features.listener
+
+
+def test_js_comments_are_ignored():
+    js = '// try { run(); } catch (e) {}\n/* el.addEventListener("x", f);\n */ run();'
+    features = analyze(js=js)
+    
+    assert not features.try_block and not features.catch_block and not features.listener
+
+
+def test_js_strings_are_not_code_or_comments():
+    features = analyze(js='const hint = "try { it }";\nfetch("https://example.com"); try { go(); } catch (e) {}')
+    
+    assert features.error_handling
+    assert analyze(js='log(`catch (later)`, "try {");').error_handling is False
+
+
+def test_css_comments_are_ignored():
+    features = analyze(css='/* @media (max-width: 600px) { display: flex; } */ body { color: red; }')
+    
+    assert not features.media_queries and not features.layout
+    assert analyze(css='/* grid */ @media (max-width: 600px) {}').media_queries
+
+
+def test_html_comments_are_ignored():
+    features = analyze(html='<html><!-- <meta name="viewport"> <header></header> --><body></body></html>')
+    
+    assert not features.viewport and not features.semantic_tags
@@ -0,0 +1,61 @@
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = app.DatabaseManager(str(tmp_path / 'test.db'))
+    yield manager
+    manager.writer.close()
+
+
+def save(db, user_id, project_data, project_type='landing'):
+    db.save_project(user_id, project_type, 'وصف المشروع', project_data, 'completed', 80)
+
+
+def test_codec_round_trip():
+    project = {'html': '<p>مرحبا</p>', 'css': 'p {}'}
+    blob_hash, codec, data, _ = app.DatabaseManager.encode_project(project)
+    
+    assert app.DatabaseManager.decode_project(codec, data) == project
+    # تسلسل ثابت: ترتيب المفاتيح لا يغير البصمة
+    assert app.DatabaseManager.encode_project({'css': 'p {}', 'html': '<p>مرحبا</p>'})[0] == blob_hash
+
+
+def test_identical_projects_share_one_blob(db):
+    project = {'html': 'a', 'css': 'b'}
+    save(db, 1, project)
+    save(db, 2, project)
+    save(db, 1, {'html': 'other', 'css': 'b'})
+    assert db.writer.flush(5)
+    
+    assert db.fetch_one('SELECT COUNT(*) FROM projects')[0] == 3
+    assert db.fetch_one('SELECT COUNT(*) FROM project_blobs')[0] == 2
+
+
+def test_load_project_is_scoped_to_owner(db):
+    save(db, 1, {'html': 'a', 'css': 'b'})
+    assert db.writer.flush(5)
+    project_id = db.list_projects(1)[0][0]
+    
+    meta, project = db.load_project(1, project_id)
+    assert project == {'html': 'a', 'css': 'b'}
+    assert meta['quality_score'] == 80
+    assert db.load_project(2, project_id) is None
+
+
+def test_keyset_pagination(db):
+    for i in range(5):
+        save(db, 1, {'html': str(i), 'css': ''})
+    save(db, 2, {'html': 'x', 'css': ''})
+    assert db.writer.flush(5)
+    
+    first = db.list_projects(1, limit=2)
+    second = db.list_projects(1, before_id=first[-1][0], limit=2)
+    third = db.list_projects(1, before_id=second[-1][0], limit=2)
+    
+    ids = [row[0] for row in first + second + third]
+    assert len(ids) == 5
+    assert ids == sorted(ids, reverse=True)
+    assert db.list_projects(1, before_id=ids[-1], limit=2) == []
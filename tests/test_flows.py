@@ -0,0 +1,38 @@
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+USER_ID = 7001
+
+
+@pytest.fixture
+def user_state():
+    state = {
+        'action': 'awaiting_quality',
+        'project_type': 'landing',
+        'type_name': 'صفحة هبوط',
+        'description': 'صفحة هبوط لتطبيق توصيل طعام مع قسم للأسعار'
+    }
+    app.state_manager.set_user_state(USER_ID, state)
+    yield state
+    app.state_manager.clear_user_state(USER_ID)
+
+
+def test_select_quality_starts_generation_once(user_state):
+    selected = app.select_quality(USER_ID, 'pro')
+    
+    assert selected['quality'] == 'pro'
+    assert app.state_manager.get_user_state(USER_ID)['action'] == 'generating'
+    # الضغطة المكررة لا تعيد احتساب الطلب
+    assert app.select_quality(USER_ID, 'pro') is None
+
+
+def test_select_quality_ignores_stale_keyboard(user_state):
+    app.state_manager.set_user_state(USER_ID, {'action': 'awaiting_description', 'project_type': 'landing'})
+    
+    assert app.select_quality(USER_ID, 'basic') is None
+    assert app.state_manager.get_user_state(USER_ID)['action'] == 'awaiting_description'
+
+
+def test_select_quality_without_session():
+    assert app.select_quality(USER_ID + 1, 'basic') is None
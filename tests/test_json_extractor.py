@@ -0,0 +1,61 @@
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+
+@pytest.fixture
+def extractor():
+    return app.ProjectJSONExtractor()
+
+
+def test_direct_json(extractor):
+    project = extractor.extract('{"html": "<p>hi</p>", "css": "p {}", "extra": 1}')
+    
+    assert project == {'html': '<p>hi</p>', 'css': 'p {}'}
+    assert extractor.get_stats()['direct'] == 1
+
+
+def test_fenced_block_with_surrounding_text(extractor):
+    content = 'Here is the project:\n```json\n{"html": "a", "css": "b", "js": "c"}\n```\nEnjoy {not json}'
+    
+    assert extractor.extract(content) == {'html': 'a', 'css': 'b', 'js': 'c'}
+
+
+def test_skips_objects_that_fail_schema(extractor):
+    content = '{"note": 1} then {"html": "a", "css": "b"}'
+    
+    assert extractor.extract(content) == {'html': 'a', 'css': 'b'}
+
+
+def test_single_wrapper_object(extractor):
+    assert extractor.extract('{"project": {"html": "a", "css": "b"}}') == {'html': 'a', 'css': 'b'}
+
+
+def test_repairs_raw_newlines_and_trailing_commas(extractor):
+    content = '```json\n{"html": "<div>\n</div>", "css": "b",}\n```'
+    
+    assert extractor.extract(content) == {'html': '<div>\n</div>', 'css': 'b'}
+    assert extractor.get_stats()['repaired'] == 1
+
+
+def test_repairs_truncated_output(extractor):
+    content = '{"html": "a", "css": "b", "js": "unfinished'
+    
+    assert extractor.extract(content) == {'html': 'a', 'css': 'b', 'js': 'unfinished'}
+
+
+def test_truncated_key_falls_back_to_last_complete_value():
+    repaired = app.ProjectJSONExtractor.repair('{"html": "a", "css": "b", "js"')
+    
+    assert repaired == '{"html": "a", "css": "b"}'
+
+
+def test_missing_required_key(extractor):
+    with pytest.raises(app.JSONValidationError):
+        extractor.extract('{"html": "a"}')
+
+
+def test_no_json(extractor):
+    with pytest.raises(app.JSONExtractionError):
+        extractor.extract('sorry, no project today')
+    assert extractor.get_stats()['failed'] == 1
@@ -0,0 +1,89 @@
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+
+def test_token_bucket_allows_burst_then_refills(clock):
+    limiter = app.TokenBucketLimiter(3, 1, clock)
+    
+    assert [limiter.try_acquire('u') for _ in range(4)] == [True, True, True, False]
+    assert limiter.time_until('u') == pytest.approx(1.0)
+    
+    clock.advance(0.5)
+    assert not limiter.try_acquire('u')
+    clock.advance(0.5)
+    assert limiter.try_acquire('u')
+
+
+def test_token_bucket_keys_are_independent(clock):
+    limiter = app.TokenBucketLimiter(1, 1, clock)
+    
+    assert limiter.try_acquire('a')
+    assert not limiter.try_acquire('a')
+    assert limiter.try_acquire('b')
+
+
+def test_token_bucket_refill_is_capped(clock):
+    limiter = app.TokenBucketLimiter(2, 1, clock)
+    limiter.try_acquire('u')
+    
+    clock.advance(100)
+    assert limiter.peek('u') == 2
+    assert limiter.try_acquire('u', cost=2)
+    assert not limiter.try_acquire('u')
+
+
+def test_token_bucket_consume_can_go_negative(clock):
+    limiter = app.TokenBucketLimiter(10, 2, clock)
+    limiter.consume('u', 14)
+    
+    assert limiter.peek('u') == -4
+    assert limiter.time_until('u') == pytest.approx(2.5)
+
+
+def test_token_bucket_seed_and_prune(clock):
+    limiter = app.TokenBucketLimiter(5, 1, clock)
+    limiter.seed('u', 2)
+    limiter.seed('u', 5)  # السجل الموجود لا يُستبدل
+    
+    assert limiter.peek('u') == 2
+    assert limiter.prune() == 0
+    clock.advance(3)
+    assert limiter.prune() == 1
+    assert limiter.peek('u') is None
+
+
+def test_upstream_limiter_requests_per_minute(clock):
+    limiter = app.UpstreamKeyLimiter(requests_per_min=2, tokens_per_min=10000, clock=clock)
+    
+    assert limiter.try_acquire('key', 10)
+    assert limiter.try_acquire('key', 10)
+    assert not limiter.try_acquire('key', 10)
+    assert limiter.time_until('key', 10) == pytest.approx(30.0)
+    
+    clock.advance(30)
+    assert limiter.try_acquire('key', 10)
+
+
+def test_upstream_limiter_tokens_per_minute(clock):
+    limiter = app.UpstreamKeyLimiter(requests_per_min=100, tokens_per_min=600, clock=clock)
+    
+    assert limiter.try_acquire('key', 500)
+    assert not limiter.try_acquire('key', 200)
+    # الرفض لا يستهلك طلباً ولا رموزاً
+    assert limiter.requests.peek('key') == 99
+    assert limiter.time_until('key', 200) == pytest.approx(10.0)
+    
+    clock.advance(10)
+    assert limiter.try_acquire('key', 200)
+
+
+def test_refund_returns_reservation_up_to_capacity(clock):
+    limiter = app.UpstreamKeyLimiter(requests_per_min=2, tokens_per_min=600, clock=clock)
+    assert limiter.try_acquire('key', 500)
+    
+    limiter.refund('key', 500)
+    assert limiter.requests.peek('key') == 2
+    assert limiter.tokens.peek('key') == 600
+    limiter.refund('key', 500)
+    assert limiter.tokens.peek('key') == 600
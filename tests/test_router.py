@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+
+def message(text, user_id=42):
+    return SimpleNamespace(text=text, from_user=SimpleNamespace(id=user_id))
+
+
+@pytest.fixture
+def router():
+    router = app.ConversationRouter()
+    router.command('start', 'help')(lambda message: 'start')
+    router.menu_item('📂 مشاريعي')(lambda message: 'menu')
+    router.callback('type')(lambda call: call.data)
+    router.state('awaiting_description')(lambda message, user_state: user_state['project_type'])
+    return router
+
+
+def test_commands_with_arguments_and_bot_mention(router):
+    assert router.dispatch_message(message('/start')) == 'start'
+    assert router.dispatch_message(message('/help@some_bot extra')) == 'start'
+    assert router.dispatch_message(message('/unknown')) is None
+    assert router.dispatch_message(message('/')) is None
+
+
+def test_menu_item(router):
+    assert router.dispatch_message(message('📂 مشاريعي')) == 'menu'
+
+
+def test_state_handler_receives_user_state(router):
+    app.state_manager.set_user_state(42, {'action': 'awaiting_description', 'project_type': 'landing'})
+    try:
+        assert router.dispatch_message(message('متجر إلكتروني')) == 'landing'
+        assert router.dispatch_message(message('متجر', user_id=43)) is None
+    finally:
+        app.state_manager.clear_user_state(42)
+
+
+def test_callback_prefix(router):
+    call = SimpleNamespace(data='type_landing')
+    
+    assert router.dispatch_callback(call) == 'type_landing'
+    assert router.dispatch_callback(SimpleNamespace(data='other_x')) is None
+    assert router.dispatch_callback(SimpleNamespace(data=None)) is None
+
+
+def test_duplicate_route_is_rejected(router):
+    with pytest.raises(ValueError):
+        router.command('start')(lambda message: None)
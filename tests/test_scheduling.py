@@ -0,0 +1,106 @@
+import deepseek_python_20251127_e330aa as app
+
+
+def make_job(user_id, cancelled=None):
+    return app.GenerationJob(user_id, lambda: None, on_cancel=cancelled.append if cancelled is not None else None)
+
+
+def test_fair_queue_round_robin_between_users():
+    jobs = app.FairJobQueue(max_queued=10, max_queued_per_user=3)
+    a1, a2, a3, b1 = make_job('a'), make_job('a'), make_job('a'), make_job('b')
+    for job in (a1, a2, a3, b1):
+        jobs._enqueue(job)
+    
+    # b دخل الدور بعد مهام a لكنه يسبق مهمتها الثانية
+    assert [a1.position, b1.position, a2.position, a3.position] == [1, 2, 3, 4]
+    assert [jobs._next_job() for _ in range(4)] == [a1, b1, a2, a3]
+    assert jobs.queued_count == 0
+
+
+def test_fair_queue_limits():
+    jobs = app.FairJobQueue(max_queued=3, max_queued_per_user=2)
+    
+    assert jobs._enqueue(make_job('a')) is not None
+    assert jobs._enqueue(make_job('a')) is not None
+    assert jobs._enqueue(make_job('a')) is None  # حد المستخدم
+    assert jobs._enqueue(make_job('b')) is not None
+    assert jobs._enqueue(make_job('c')) is None  # حد الطابور
+
+
+def test_fair_queue_cancel_user_moves_others_up():
+    jobs = app.FairJobQueue(max_queued=10, max_queued_per_user=2)
+    a1, b1, a2 = make_job('a'), make_job('b'), make_job('a')
+    for job in (a1, b1, a2):
+        jobs._enqueue(job)
+    
+    cancelled, changed = jobs._dequeue_user('a')
+    
+    assert cancelled == [a1, a2]
+    assert {job.status for job in cancelled} == {'cancelled'}
+    assert changed == [b1] and b1.position == 1
+    assert jobs._next_job() is b1
+
+
+def test_scheduler_cancel_user_notifies_only_queued_jobs():
+    cancelled = []
+    scheduler = app.JobScheduler(0, max_queued=10, max_queued_per_user=2)
+    job = make_job('a', cancelled)
+    
+    assert scheduler.submit(job) == 1
+    assert scheduler.cancel_user('a') == [job]
+    assert cancelled == [job]
+    assert scheduler.cancel_user('a') == []
+    assert scheduler.queue_depth() == 0
+
+
+def waiter(user_id, chat_id=None):
+    return (user_id, {'action': 'generating'}, chat_id or user_id, 1)
+
+
+def test_single_flight_coalesces_and_ignores_duplicate_chat():
+    flights = app.SingleFlight()
+    leader, follower = waiter(1), waiter(2)
+    
+    flight, is_leader, _ = flights.join('key', leader)
+    assert is_leader
+    assert flights.join('key', follower) == (flight, False, False)
+    assert flights.join('key', waiter(1)) == (flight, False, True)
+    assert flights.complete(flight) == [leader, follower]
+    assert len(flights) == 0
+
+
+def test_single_flight_leader_handoff_on_cancel():
+    flights = app.SingleFlight()
+    leader, follower = waiter(1), waiter(2)
+    flight, _, _ = flights.join('key', leader)
+    flights.join('key', follower)
+    
+    assert flights.leave(flight, leader) is follower
+    assert flight.waiters == [follower] and not flight.done
+    assert flights.leave(flight, follower) is None
+    assert flight.done and len(flights) == 0
+    
+    # بعد الإغلاق يبدأ الطلب المطابق طلباً جديداً
+    _, is_leader, _ = flights.join('key', waiter(3))
+    assert is_leader
+
+
+def test_single_flight_leave_compares_waiters_by_identity():
+    flights = app.SingleFlight()
+    leader = waiter(1)
+    flight, _, _ = flights.join('key', leader)
+    flights.join('key', waiter(2))
+    
+    assert flights.leave(flight, waiter(1)) is leader  # نسخة مساوية ليست نفس المنتظر
+    assert len(flight.waiters) == 2
+
+
+def test_single_flight_cancel_user_keeps_leader():
+    flights = app.SingleFlight()
+    leader, follower = waiter(1), waiter(2)
+    flight, _, _ = flights.join('key', leader)
+    flights.join('key', follower)
+    
+    assert flights.cancel_user(1) == []
+    assert flights.cancel_user(2) == [follower]
+    assert flight.waiters == [leader]
@@ -0,0 +1,53 @@
+import deepseek_python_20251127_e330aa as app
+
+
+def make_map(clock, ttl=10, max_entries=2):
+    return app.StripedTTLMap(ttl, max_entries, stripes=1, clock=clock)
+
+
+def test_get_expires_idle_entries(clock):
+    sessions = make_map(clock)
+    sessions.set('a', 1)
+    
+    clock.advance(9)
+    assert sessions.get('a') == 1
+    clock.advance(9)  # الوصول السابق جدد الصلاحية
+    assert sessions.get('a') == 1
+    clock.advance(10)
+    assert sessions.get('a') is None
+    assert sessions.metrics()['expired'] == 1
+
+
+def test_peek_does_not_refresh(clock):
+    sessions = make_map(clock)
+    sessions.set('a', 1)
+    
+    clock.advance(6)
+    assert sessions.peek('a') == (1, 4)
+    clock.advance(4)
+    assert sessions.peek('a') is None
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    sessions = make_map(clock)
+    sessions.set('a', 1)
+    sessions.set('b', 2)
+    sessions.get('a')
+    sessions.set('c', 3)
+    
+    assert sessions.get('b') is None
+    assert sessions.get('a') == 1
+    assert sessions.get('c') == 3
+    assert sessions.metrics()['evicted'] == 1
+
+
+def test_sweep_removes_only_expired(clock):
+    sessions = make_map(clock, max_entries=10)
+    sessions.set('short', 1, ttl=1)
+    sessions.set('long', 2)
+    
+    clock.advance(5)
+    assert sessions.sweep() == 1
+    assert len(sessions) == 1
+    assert sessions.pop('long') == 2
+    assert len(sessions) == 0
@@ -0,0 +1,72 @@
+import http.client
+import json
+import time
+
+import pytest
+
+import deepseek_python_20251127_e330aa as app
+
+SECRET = 'test-secret'
+
+
+class RecordingBot:
+    def __init__(self):
+        self.updates = []
+    
+    def process_new_updates(self, updates):
+        self.updates.extend(updates)
+
+
+@pytest.fixture
+def webhook():
+    bot = RecordingBot()
+    server = app.WebhookServer(bot, '127.0.0.1', 0, '/hook', secret=SECRET)
+    server.start()
+    yield server, bot
+    server.shutdown()
+
+
+def post(server, payload):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    connection.request('POST', '/hook', payload, {'X-Telegram-Bot-Api-Secret-Token': SECRET})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+def wait_for(predicate, timeout=5):
+    """الخادم يرد قبل توزيع التحديث: انتظار نتيجة التوزيع"""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.mark.parametrize('payload', [
+    b'not json',
+    b'\xff\xfe',
+    b'[]',
+    json.dumps({'message': {'text': 'no update_id'}}).encode(),
+    json.dumps({'update_id': 1, 'message': {'chat': 5}}).encode(),
+])
+def test_malformed_update_is_acknowledged(webhook, payload):
+    server, bot = webhook
+    
+    assert post(server, payload) == 200
+    assert wait_for(lambda: server.stats['invalid'] == 1)
+    assert bot.updates == []
+
+
+def test_valid_update_is_dispatched(webhook):
+    server, bot = webhook
+    update = {'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'text': '/start',
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'a'}
+    }}
+    
+    assert post(server, json.dumps(update).encode()) == 200
+    assert wait_for(lambda: bot.updates)
+    assert [u.update_id for u in bot.updates] == [1]
+    assert server.stats['invalid'] == 0